@@ -1,125 +1,138 @@
-import os
-from click import prompt
-from fastapi import APIRouter, HTTPException
+import json
+from typing import AsyncIterator
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
+from app.http_clients import groq_client
+from app.Services import llmService
+from app.Schemas.LlmSchemas import DescriptionResponse, CacheInvalidationResponse
 import httpx
 
 router = APIRouter(prefix="/api/llm", tags=["LLM"])
 load_dotenv()
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-@router.post("/desc_climate")
-async def desc_climate(
-    city: str, 
-    country: str,
-    state: str | None = None
-    ):
-    
-    
-    if not GROQ_API_KEY:
-        raise HTTPException(500, "Groq API key not configured")
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {GROQ_API_KEY}"
+async def _sse_events(tokens: llmService.TokenStream, cached: bool, city: str, country: str) -> AsyncIterator[str]:
+    """
+    Server-Sent Events: one "data: {"delta": ...}" event per token, then a
+    "done" event carrying the same body as the non streaming endpoint.
+    """
+
+    parts = []
+    try:
+        async for token in tokens:
+            parts.append(token)
+            yield f"data: {json.dumps({'delta': token})}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        return
+    finally:
+        await tokens.aclose()
+
+    done = {
+        "city": city,
+        "country": country,
+        "climate_description": "".join(parts).strip(),
+        "provider": "groq",
+        "cached": cached
     }
+    yield f"event: done\ndata: {json.dumps(done)}\n\n"
 
-    payload = {
-        "messages": [
-            {
-                "role": "system",
-                "content": "You are a climate expert. Provide short, factual descriptions."
-            },
-            {
-                "role": "user",
-                "content": f"Describe the climate of {city}, {country} ,{state if state else ''} in under 3 sentences."
-            }
-        ],
-        "model": "llama-3.3-70b-versatile", 
-        "temperature": 0.7,
-        "max_tokens": 150
-    }
 
-    async with httpx.AsyncClient(timeout=30, verify=False) as client:
-        response = await client.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
+async def _stream_response(client: httpx.AsyncClient, kind: str, city: str, country: str, state: str | None) -> StreamingResponse:
+    tokens, cached = await llmService.stream_description(client, kind, city, country, state)
+
+    return StreamingResponse(
+        _sse_events(tokens, cached, city, country),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # also runs when the body was never iterated
+        background=BackgroundTask(tokens.aclose)
+    )
 
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Groq error: {response.text}"
-            )
 
-        data = response.json()
-        description = data["choices"][0]["message"]["content"].strip()
+@router.post("/desc_climate", response_model=DescriptionResponse)
+async def desc_climate(
+    city: str,
+    country: str,
+    state: str | None = None,
+    stream: bool = False,
+    client: httpx.AsyncClient = Depends(groq_client)
+    ):
+    """
+    Exemple:
+    /api/llm/desc_climate?city=Paris&country=FR&stream=true   -> text/event-stream
+    """
+
+    if stream:
+        return await _stream_response(client, "climate", city, country, state)
+
+    description, cached = await llmService.describe(client, "climate", city, country, state)
+
+    return {
+        "city": city,
+        "country": country,
+        "climate_description": description,
+        "provider": "groq",
+        "cached": cached
+    }
 
-        return {
-            "city": city,
-            "country": country,
-            "climate_description": description,
-            "provider": "groq"
-        }
-    
 
 
 
 
 
-@router.post("/desc_locations")
+@router.post("/desc_locations", response_model=DescriptionResponse)
 async def desc_locations(
-    city: str, 
+    city: str,
     country: str,
-    state: str | None = None
+    state: str | None = None,
+    stream: bool = False,
+    client: httpx.AsyncClient = Depends(groq_client)
     ):
-    
-    
-    if not GROQ_API_KEY:
-        raise HTTPException(500, "Groq API key not configured")
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {GROQ_API_KEY}"
-    }
 
-    payload = {
-        "messages": [
-            {
-                "role": "system",
-                "content": "You are a places expert. Provide short, factual descriptions."
-            },
-            {
-                "role": "user",
-                "content": f"Describe the places of interest in {city}, {country} ,{state if state else ''} in under 3 sentences."
-            }
-        ],
-        "model": "llama-3.3-70b-versatile", 
-        "temperature": 0.7,
-        "max_tokens": 150
+    if stream:
+        return await _stream_response(client, "locations", city, country, state)
+
+    description, cached = await llmService.describe(client, "locations", city, country, state)
+
+    return {
+        "city": city,
+        "country": country,
+        "climate_description": description,
+        "provider": "groq",
+        "cached": cached
     }
 
-    async with httpx.AsyncClient(timeout=30, verify=False) as client:
-        response = await client.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
-
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Groq error: {response.text}"
-            )
-
-        data = response.json()
-        description = data["choices"][0]["message"]["content"].strip()
-
-        return {
-            "city": city,
-            "country": country,
-            "climate_description": description,
-            "provider": "groq"
-        }
\ No newline at end of file
+
+
+
+@router.delete("/cache", response_model=CacheInvalidationResponse)
+async def invalidate_cache(
+    city: str | None = None,
+    country: str | None = None,
+    state: str | None = None,
+    kind: str | None = None
+    ):
+    """
+    Exemple:
+    /api/llm/cache?city=Paris&country=FR    -> drop both descriptions of Paris
+    /api/llm/cache                          -> drop everything
+    """
+
+    if kind is not None and kind not in llmService.PROMPTS:
+        raise HTTPException(400, f"kind must be one of: {', '.join(llmService.PROMPTS)}")
+
+    if city is not None and country is None:
+        raise HTTPException(400, "country is required with city")
+
+    try:
+        deleted = await llmService.invalidate(city, country, state, kind)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    return {
+        "message": "LLM cache invalidated",
+        "deleted": deleted
+    }
@@ -1,53 +1,76 @@
-import os
 import httpx
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Query
 from dotenv import load_dotenv
+from app.http_clients import openweather_client
+from app.Services.geocodingService import geocode, suggest
+from app.Schemas.MapSchemas import CityCoordinates, CityAutocomplete
 
 
 load_dotenv()
 
 router = APIRouter(prefix="/api/map", tags=["Map"])
 
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
-
-
-@router.get("/search/coords/by-city")
+@router.get("/search/coords/by-city", response_model=CityCoordinates)
 async def get_coords_by_city(
     city: str,
     country: str,
-    state: str | None = None
+    state: str | None = None,
+    client: httpx.AsyncClient = Depends(openweather_client)
+):
+
+    geo = await geocode(client, city, country, state)
+
+    if not geo:
+        raise HTTPException(status_code=404, detail="City not found")
+    
+
+    return {
+        "city": geo["name"],
+        "state": geo.get("state"),
+        "country": geo["country"],
+        "lat": geo["lat"],
+        "lon": geo["lon"],
+    }
+
+
+
+@router.get("/autocomplete", response_model=CityAutocomplete, response_model_exclude_unset=True)
+async def autocomplete(
+    q: str = Query(..., min_length=2, description="Start of a city name"),
+    country: str | None = None,
+    limit: int = Query(10, ge=1, le=50),
+    client: httpx.AsyncClient = Depends(openweather_client)
 ):
+    """
+    City suggestions, from the local gazetteer (prefix match, most
+    populated first) or from OpenWeather (exact name, 5 at most)
 
-    if state:
-        query = f"{city},{state},{country}"
-    else:
-        query = f"{city},{country}"
-
-    url = (
-        "https://api.openweathermap.org/geo/1.0/direct"
-        f"?q={query}&limit=1&appid={OPENWEATHER_API_KEY}"
-    )
-
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.get(url)
-
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail="Geocoding API error"
-            )
-
-        data = response.json()
-
-        if not data:
-            raise HTTPException(status_code=404, detail="City not found")
-        
-
-        return {
-            "city": data[0]["name"],
-            "state": data[0].get("state"),
-            "country": data[0]["country"],
-            "lat": data[0]["lat"],
-            "lon": data[0]["lon"],
+    Exemple:
+    /api/map/autocomplete?q=sain&country=FR&limit=5
+    """
+
+    try:
+        places, source = await suggest(client, q, country, limit)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Geocoding API unreachable: {str(e)}")
+
+    results = []
+    for place in places:
+        result = {
+            "city": place["name"],
+            "state": place.get("state"),
+            "country": place["country"],
+            "lat": place["lat"],
+            "lon": place["lon"],
         }
+        if "population" in place:
+            result["population"] = place["population"]
+        results.append(result)
+
+    return {
+        "query": q,
+        "source": source,
+        "total": len(results),
+        "results": results
+    }
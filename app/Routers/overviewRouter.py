@@ -0,0 +1,232 @@
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Callable
+import httpx
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from app import config
+from app.responses import dumps
+from app.http_clients import openweather_client, groq_client, youtube_client
+from app.Services import weatherService, historyService, llmService, youtubeService
+from app.Services.geocodingService import geocode
+from app.Schemas.OverviewSchemas import OverviewResponse
+
+router = APIRouter(prefix="/api", tags=["Overview"])
+
+SECTIONS = ("current", "forecast", "climate", "places", "videos")
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _weather(data: dict) -> dict:
+    return {
+        "temp": data["main"]["temp"],
+        "feels_like": data["main"]["feels_like"],
+        "humidity": data["main"]["humidity"],
+        "description": data["weather"][0]["description"],
+        "wind_speed": data["wind"]["speed"]
+    }
+
+
+# ==================== SECTIONS ====================
+async def _current(client: httpx.AsyncClient, geo: dict) -> dict:
+    """Current weather, saved in the history like /api/weather/search/by-city"""
+
+    weather = await weatherService.current_weather(client, geo["lat"], geo["lon"])
+    searched_at = datetime.now(timezone.utc).isoformat()
+
+    search_id = await historyService.save(
+        {
+            "city": geo["name"],
+            "state": geo.get("state"),
+            "country": geo["country"],
+            "lat": geo["lat"],
+            "lon": geo["lon"],
+            "created_at": searched_at,
+            "start_date": searched_at,
+            "end_date": searched_at
+        },
+        [{"forecast_datetime": searched_at, **_weather(weather)}]
+    )
+
+    return {"search_id": search_id, "stale": weather.get("stale", False), "weather": _weather(weather)}
+
+
+async def _forecast(client: httpx.AsyncClient, geo: dict, granularity: str) -> dict:
+    """Next 5 days, 3-hourly or aggregated per day (not saved in the history)"""
+
+    forecast_data = await weatherService.forecast(client, geo["lat"], geo["lon"])
+
+    start = datetime.utcnow().date()
+    end = start + timedelta(days=5)
+    days, items = [], []
+    for item in forecast_data["list"]:
+        item_date = datetime.fromtimestamp(item["dt"]).date()
+        if start <= item_date <= end:
+            days.append(item_date)
+            items.append(item)
+
+    if granularity == "daily":
+        results = weatherService.aggregate_daily(days, items)
+    else:
+        results = [{"datetime": item["dt_txt"], **_weather(item)} for item in items]
+
+    return {
+        "granularity": granularity,
+        "count": len(results),
+        "stale": forecast_data.get("stale", False),
+        "data": results
+    }
+
+
+async def _description(client: httpx.AsyncClient, kind: str, city: str, country: str, state: str | None) -> dict:
+    description, cached = await llmService.describe(client, kind, city, country, state)
+    return {"description": description, "provider": "groq", "cached": cached}
+
+
+async def _videos(client: httpx.AsyncClient, city: str) -> dict:
+    videos, cached = await youtubeService.search(client, "locations", city, config.OVERVIEW_VIDEOS)
+    return {"total_results": len(videos), "cached": cached, "videos": videos}
+
+
+async def _run(name: str, work: Callable[[], Awaitable[dict]], timeout: float) -> tuple[str, dict]:
+    """
+    (name, section) where section reports the outcome instead of raising.
+    work() is only called here, so a section cancelled before it starts
+    leaves no coroutine behind.
+    """
+
+    started = time.perf_counter()
+    try:
+        data = await asyncio.wait_for(work(), max(0.0, timeout))
+    except asyncio.TimeoutError:
+        return name, {"status": "timeout", "elapsed_ms": _elapsed_ms(started)}
+    except HTTPException as e:
+        error = {"status_code": e.status_code, "detail": e.detail}
+        return name, {"status": "error", "elapsed_ms": _elapsed_ms(started), "error": error}
+    except Exception as e:
+        error = {"status_code": 500, "detail": str(e)}
+        return name, {"status": "error", "elapsed_ms": _elapsed_ms(started), "error": error}
+
+    return name, {"status": "ok", "elapsed_ms": _elapsed_ms(started), "data": data}
+
+
+def _parse_sections(sections: str | None) -> list[str]:
+    if not sections:
+        return list(SECTIONS)
+
+    names = [name.strip() for name in sections.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SECTIONS]
+    if unknown:
+        raise HTTPException(400, f"Unknown sections: {', '.join(unknown)} (known: {', '.join(SECTIONS)})")
+    return list(dict.fromkeys(names))
+
+
+# ==================== STREAMING ====================
+async def _sse_events(location: dict, tasks: list[asyncio.Task], started: float) -> AsyncIterator[str]:
+    """
+    Server-Sent Events: "location" first, then one event per section named
+    after it, in completion order, then "done" with the total time.
+    """
+
+    try:
+        yield f"event: location\ndata: {dumps(location).decode()}\n\n"
+        for next_done in asyncio.as_completed(tasks):
+            name, section = await next_done
+            yield f"event: {name}\ndata: {dumps(section).decode()}\n\n"
+        yield f"event: done\ndata: {dumps({'elapsed_ms': _elapsed_ms(started)}).decode()}\n\n"
+    finally:
+        # client went away
+        for task in tasks:
+            task.cancel()
+
+
+@router.get("/overview", response_model=OverviewResponse, response_model_exclude_unset=True)
+async def city_overview(
+    city: str,
+    country: str,
+    state: str | None = None,
+    sections: str | None = Query(None, description="Comma separated subset of current,forecast,climate,places,videos (default all)"),
+    granularity: str = Query("daily", pattern="^(3h|daily)$", description="Forecast section: 3h items or one row per day"),
+    budget: float | None = Query(None, gt=0, le=30, description="Seconds before unfinished sections are reported as timeout"),
+    stream: bool = False,
+    weather_client: httpx.AsyncClient = Depends(openweather_client),
+    llm_client: httpx.AsyncClient = Depends(groq_client),
+    video_client: httpx.AsyncClient = Depends(youtube_client)
+):
+    """
+    Everything a city page shows in one call: geocodes once, then runs the
+    sections concurrently. Sections that failed or did not finish within
+    their timeout or the budget come back with their status instead of
+    failing the whole response. With stream=true each section is sent as
+    an SSE event as soon as it is done.
+
+    Exemple:
+    /api/overview?city=Paris&country=FR
+    /api/overview?city=Paris&country=FR&sections=current,forecast&budget=1.5&stream=true
+    """
+
+    names = _parse_sections(sections)
+    started = time.perf_counter()
+    deadline = started + (budget or config.OVERVIEW_BUDGET)
+
+    def timeout(name: str) -> float:
+        return min(config.OVERVIEW_TIMEOUTS[name], deadline - time.perf_counter())
+
+    def section(name: str, work: Callable[[], Awaitable[dict]]) -> asyncio.Task:
+        return asyncio.ensure_future(_run(name, work, timeout(name)))
+
+    # LLM and YouTube only need the names, they start while geocoding runs
+    tasks = {}
+    if "climate" in names:
+        tasks["climate"] = section("climate", lambda: _description(llm_client, "climate", city, country, state))
+    if "places" in names:
+        tasks["places"] = section("places", lambda: _description(llm_client, "locations", city, country, state))
+    if "videos" in names:
+        tasks["videos"] = section("videos", lambda: _videos(video_client, city))
+
+    try:
+        geo = await asyncio.wait_for(geocode(weather_client, city, country, state), deadline - time.perf_counter())
+    except asyncio.TimeoutError:
+        geo = None
+        error = HTTPException(504, "Geocoding timed out")
+    except HTTPException as e:
+        geo = None
+        error = e
+    except httpx.HTTPError as e:
+        geo = None
+        error = HTTPException(502, f"Geocoding API unreachable: {str(e)}")
+    else:
+        error = HTTPException(404, "City not found") if not geo else None
+
+    if error is not None:
+        for task in tasks.values():
+            task.cancel()
+        raise error
+
+    if "current" in names:
+        tasks["current"] = section("current", lambda: _current(weather_client, geo))
+    if "forecast" in names:
+        tasks["forecast"] = section("forecast", lambda: _forecast(weather_client, geo, granularity))
+
+    location = {
+        "city": geo["name"],
+        "state": geo.get("state"),
+        "country": geo["country"],
+        "lat": geo["lat"],
+        "lon": geo["lon"]
+    }
+    ordered = [tasks[name] for name in names]
+
+    if stream:
+        return StreamingResponse(
+            _sse_events(location, ordered, started),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    results = dict(await asyncio.gather(*ordered))
+    return {"location": location, "elapsed_ms": _elapsed_ms(started), **results}
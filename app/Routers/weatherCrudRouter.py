@@ -1,64 +1,454 @@
 import os
-from fastapi import APIRouter, HTTPException , Query
+import io
+import csv
+import json
+import base64
+import logging
+from typing import AsyncIterator
+from fastapi import APIRouter, HTTPException , Query, Depends
+from fastapi.responses import StreamingResponse
 from app.supabase import supabase
+from app.repository import execute
+from app.responses import dumps, TimedJSONResponse
+from app.Services import nearbyService
+from app.Schemas.HistorySchemas import (
+    HistoryPage, FilteredHistoryPage, RankedHistoryPage, NearbyHistoryPage, HistorySearch, DeleteHistoryResponse,
+    MessageResponse, UpdateHistoryResponse
+)
 from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/weather/crud", tags=["Weather Crud"])
 
+# PostgREST puts in_() filters in the query string, keep each IN list short enough
+RESULTS_BATCH_SIZE = 200
+# rows per weather_results page; must not exceed PostgREST db-max-rows (1000 by
+# default), a shorter page is taken as the last one
+RESULTS_PAGE_SIZE = 1000
+
+
+async def _load_results(search_ids: list[int]) -> dict[int, list]:
+    """
+    Fetch the weather_results of many searches, grouped by search_id. A batch
+    of searches can have more result rows than one page, so each batch is
+    read in (search_id, id) keyset pages.
+    """
+
+    grouped = {search_id: [] for search_id in search_ids}
+
+    for i in range(0, len(search_ids), RESULTS_BATCH_SIZE):
+        batch = search_ids[i:i + RESULTS_BATCH_SIZE]
+        last = None
+        while True:
+            query = (
+                supabase
+                .table("weather_results")
+                .select("*")
+                .in_("search_id", batch)
+            )
+            if last is not None:
+                search_id, result_id = last
+                query = (
+                    query
+                    .gte("search_id", search_id)
+                    .or_(f"search_id.gt.{search_id},and(search_id.eq.{search_id},id.gt.{result_id})")
+                )
+
+            results_response = await execute(query.order("search_id").order("id").limit(RESULTS_PAGE_SIZE))
+            rows = results_response.data
+            for row in rows:
+                grouped[row["search_id"]].append(row)
+
+            if len(rows) < RESULTS_PAGE_SIZE:
+                break
+            last = (rows[-1]["search_id"], rows[-1]["id"])
+
+    return grouped
+
+
+def _format_search(search: dict, weather_data: list | None, with_zip_code: bool = False) -> dict:
+    """Shape a weather_searches row, skipping the columns left out by a fields= projection"""
+
+    formatted = {"id": search["id"]}
+    for column in ("city", "state", "country"):
+        if column in search:
+            formatted[column] = search[column]
+    if with_zip_code and "zip_code" in search:
+        formatted["zip_code"] = search["zip_code"]
+    if "lat" in search or "lon" in search:
+        formatted["coordinates"] = {
+            "lat": search.get("lat"),
+            "lon": search.get("lon")
+        }
+    for column in ("start_date", "end_date", "created_at", "granularity"):
+        if column in search:
+            formatted[column] = search[column]
+    if weather_data is not None:
+        formatted["weather_data"] = weather_data
+    return formatted
+
 
+async def _build_history(searches: list[dict], with_zip_code: bool = False, include_results: bool = True) -> list[dict]:
+    if not include_results:
+        return [_format_search(search, None, with_zip_code) for search in searches]
 
+    results_by_search = await _load_results([search["id"] for search in searches])
+    return [
+        _format_search(search, results_by_search[search["id"]], with_zip_code)
+        for search in searches
+    ]
 
 
-@router.get("/history")
-async def get_all_history():
+# ==================== PAGINATION ====================
+SEARCH_COLUMNS = ("id", "city", "state", "country", "zip_code", "lat", "lon", "start_date", "end_date", "created_at", "granularity")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _encode_cursor(search: dict, key: str = "created_at") -> str:
+    raw = json.dumps([search[key], search["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        created_at, search_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), int(search_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _parse_fields(fields: str | None) -> list[str]:
+    if not fields:
+        return list(SEARCH_COLUMNS)
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in SEARCH_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    # id and created_at are the keyset, always select them
+    return ["id", "created_at"] + [f for f in requested if f not in ("id", "created_at")]
+
+
+def history_page(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    fields: str | None = Query(None, description="Comma separated weather_searches columns to return"),
+    include_results: bool = Query(True, description="Embed weather_data rows in each search")
+) -> dict:
+    return {
+        "limit": limit,
+        "cursor": _decode_cursor(cursor) if cursor else None,
+        "columns": _parse_fields(fields),
+        "include_results": include_results
+    }
+
+
+def _searches_query(page: dict):
+    """weather_searches select for one page, newest first, keyset on (created_at, id)"""
+
+    query = (
+        supabase
+        .table("weather_searches")
+        .select(",".join(page["columns"]))
+    )
+
+    if page["cursor"]:
+        created_at, search_id = page["cursor"]
+        # lte is the index bound (Postgres cannot seek on the OR), the OR breaks created_at ties
+        query = (
+            query
+            .lte("created_at", created_at)
+            .or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{search_id})')
+        )
+
+    # one extra row tells us whether there is a next page
+    return (
+        query
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(page["limit"] + 1)
+    )
+
+
+# Page endpoints return their body as a TimedJSONResponse: it is built from
+# DB rows in the response_model shape already, and skipping the validation
+# avoids one model object per row (response_model stays for the OpenAPI schema).
+async def _history_page(rows: list[dict], page: dict, with_zip_code: bool = False) -> dict:
+    has_more = len(rows) > page["limit"]
+    rows = rows[:page["limit"]]
+
+    result = await _build_history(rows, with_zip_code, page["include_results"])
+
+    return {
+        "total": len(result),
+        "next_cursor": _encode_cursor(rows[-1]) if has_more else None,
+        "searches": result
+    }
+
+
+@router.get("/history", response_model=HistoryPage, response_model_exclude_unset=True)
+async def get_all_history(page: dict = Depends(history_page)):
 
     try:
         
-        searches_response = supabase.table("weather_searches").select("*").execute()
-        
-        if not searches_response.data:
-            return {
-                "total": 0,
-                "searches": []
-            }
-        
+        searches_response = await execute(_searches_query(page))
         
-        result = []
-        for search in searches_response.data:
-            
-            results_response = supabase.table("weather_results").select("*").eq("search_id", search["id"]).execute()
-            
-            result.append({
-                "id": search["id"],
-                "city": search["city"],
-                "state": search["state"],
-                "country": search["country"],
-                "coordinates": {
-                    "lat": search["lat"],
-                    "lon": search["lon"]
-                },
-                "start_date": search["start_date"],
-                "end_date": search["end_date"],
-                "created_at": search["created_at"],
-                "weather_data": results_response.data
+        return TimedJSONResponse(await _history_page(searches_response.data, page))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+
+
+# ==================== EXPORT ====================
+EXPORT_PAGE_SIZE = 500
+RESULT_COLUMNS = (
+    "id", "forecast_datetime", "temp", "feels_like", "humidity", "description", "wind_speed",
+    "temp_min", "temp_max", "humidity_min", "humidity_max"
+)
+CSV_HEADER = list(SEARCH_COLUMNS) + [f"result_{column}" for column in RESULT_COLUMNS]
+
+
+async def _export_pages(page: dict, filters) -> AsyncIterator[list[tuple[dict, list]]]:
+    """
+    Yield the export one keyset page at a time as (search, results) pairs, so
+    only EXPORT_PAGE_SIZE searches and their results are in memory at once.
+    """
+
+    while True:
+        searches_response = await execute(filters(_searches_query(page)))
+        rows = searches_response.data
+        has_more = len(rows) > page["limit"]
+        rows = rows[:page["limit"]]
+
+        if not rows:
+            return
+
+        results_by_search = await _load_results([search["id"] for search in rows])
+        yield [(search, results_by_search[search["id"]]) for search in rows]
+
+        if not has_more:
+            return
+        page = {**page, "cursor": (rows[-1]["created_at"], rows[-1]["id"])}
+
+
+def _ndjson_lines(pairs: list[tuple[dict, list]]) -> bytes:
+    return b"".join(
+        dumps(_format_search(search, results, with_zip_code=True)) + b"\n"
+        for search, results in pairs
+    )
+
+
+def _csv_lines(pairs: list[tuple[dict, list]], header: bool = False) -> str:
+    """One CSV line per weather_results row, searches without results get one line with empty result columns"""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_HEADER)
+
+    for search, results in pairs:
+        search_values = [search.get(column) for column in SEARCH_COLUMNS]
+        for result in results or [{}]:
+            writer.writerow(search_values + [result.get(column) for column in RESULT_COLUMNS])
+
+    return buffer.getvalue()
+
+
+async def _export_body(pages: AsyncIterator, first: list | None, format: str) -> AsyncIterator:
+    """
+    Encode pages as they are fetched. A failure after the first page cannot
+    change the status code any more: NDJSON ends with an {"error": ...} line,
+    CSV is truncated.
+    """
+
+    try:
+        if format == "csv":
+            yield _csv_lines(first or [], header=True)
+            async for pairs in pages:
+                yield _csv_lines(pairs)
+        else:
+            if first:
+                yield _ndjson_lines(first)
+            async for pairs in pages:
+                yield _ndjson_lines(pairs)
+
+    except Exception as e:
+        logger.warning("History export aborted: %s", e)
+        if format == "ndjson":
+            yield dumps({"error": f"Database error: {str(e)}"}) + b"\n"
+
+
+@router.get("/history/export")
+async def export_history(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson (one search per line) or csv (one result per line)"),
+    created_from: datetime | None = Query(None, description="Only searches created at or after this time"),
+    created_to: datetime | None = Query(None, description="Only searches created before this time"),
+    country: str | None = Query(None, min_length=1, description="Only searches of this country (case insensitive)")
+):
+    """
+    Stream the whole history, newest first, in constant memory.
+
+    Exemple:
+    /api/weather/crud/history/export?created_from=2026-01-01&country=FR
+    /api/weather/crud/history/export?format=csv
+    """
+
+    def filters(query):
+        if created_from is not None:
+            query = query.gte("created_at", created_from.isoformat())
+        if created_to is not None:
+            query = query.lt("created_at", created_to.isoformat())
+        if country is not None:
+            query = query.ilike("country", country)
+        return query
+
+    page = {"limit": EXPORT_PAGE_SIZE, "cursor": None, "columns": list(SEARCH_COLUMNS), "include_results": True}
+    pages = _export_pages(page, filters)
+
+    # fetch the first page before answering so that a database error is still a 500
+    try:
+        first = await anext(pages, None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_body(pages, first, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="weather_history.{format}"'}
+    )
+
+
+
+
+# ==================== SEARCH ====================
+@router.get("/history/search", response_model=RankedHistoryPage, response_model_exclude_unset=True)
+async def search_history(
+    q: str | None = Query(None, min_length=1, description="Free text matched against city, state, country and zip code"),
+    city: str | None = Query(None, min_length=1),
+    state: str | None = Query(None, min_length=1),
+    country: str | None = Query(None, min_length=1, description="Country code, exact match"),
+    zip_code: str | None = Query(None, min_length=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    include_results: bool = Query(True, description="Embed weather_data rows in each search")
+):
+    """
+    Fuzzy search on several fields at once, best matches first. Typos are
+    tolerated (trigram similarity), every given term must match. Served by
+    the search_weather_history function and its trigram indexes.
+
+    Exemple:
+    /api/weather/crud/history/search?q=paris
+    /api/weather/crud/history/search?city=sant&country=CL&limit=20
+    """
+
+    terms = {"q": q, "city": city, "state": state, "country": country, "zip_code": zip_code}
+    terms = {name: term for name, term in terms.items() if term is not None}
+    if not terms:
+        raise HTTPException(status_code=400, detail="At least one of q, city, state, country, zip_code is required")
+
+    after_rank, after_id = None, None
+    if cursor:
+        after_rank, after_id = _decode_cursor(cursor)
+        try:
+            after_rank = float(after_rank)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    try:
+        searches_response = await execute(
+            supabase.rpc("search_weather_history", {
+                "q": q,
+                "city_term": city,
+                "state_term": state,
+                "country_term": country,
+                "zip_term": zip_code,
+                # one extra row tells us whether there is a next page
+                "page_size": limit + 1,
+                "after_rank": after_rank,
+                "after_id": after_id
             })
-        
-        return {
+        )
+
+        rows = searches_response.data
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        result = await _build_history(rows, with_zip_code=True, include_results=include_results)
+        for search, row in zip(result, rows):
+            search["rank"] = row["rank"]
+
+        return TimedJSONResponse({
+            "filter": terms,
             "total": len(result),
+            "next_cursor": _encode_cursor(rows[-1], key="rank") if has_more else None,
             "searches": result
-        }
-    
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+
+
+# ==================== NEARBY ====================
+@router.get("/history/nearby", response_model=NearbyHistoryPage, response_model_exclude_unset=True)
+async def nearby_history(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float | None = Query(None, gt=0, le=20038, description="Only searches within this distance"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="k nearest searches"),
+    include_results: bool = Query(True, description="Embed weather_data rows in each search")
+):
+    """
+    Searches made closest to a point, closest first: the k nearest, or
+    those within radius_km. Served by the in-process KD-tree when it is
+    loaded, else by the nearby_weather_searches function (earthdistance index).
+
+    Exemple:
+    /api/weather/crud/history/nearby?lat=48.8566&lon=2.3522&radius_km=25
+    /api/weather/crud/history/nearby?lat=48.8566&lon=2.3522&limit=10&include_results=false
+    """
+
+    try:
+        rows, source = await nearbyService.nearby(lat, lon, radius_km, limit, list(SEARCH_COLUMNS))
+
+        result = await _build_history(rows, with_zip_code=True, include_results=include_results)
+        for search, row in zip(result, rows):
+            search["distance_km"] = round(row["distance_km"], 3)
+
+        return TimedJSONResponse({
+            "center": {"lat": lat, "lon": lon},
+            "radius_km": radius_km,
+            "source": source,
+            "total": len(result),
+            "searches": result
+        })
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 
 
-@router.get("/history/{search_id}")
+@router.get("/history/{search_id}", response_model=HistorySearch, response_model_exclude_unset=True)
 async def get_history_by_id(search_id: int):
 
     try:
        
-        search_response = supabase.table("weather_searches").select("*").eq("id", search_id).execute()
+        search_response = await execute(supabase.table("weather_searches").select("*").eq("id", search_id))
         
         if not search_response.data:
             raise HTTPException(status_code=404, detail=f"Search with id {search_id} not found")
@@ -66,7 +456,7 @@ async def get_history_by_id(search_id: int):
         search = search_response.data[0]
         
         
-        results_response = supabase.table("weather_results").select("*").eq("search_id", search_id).execute()
+        results_response = await execute(supabase.table("weather_results").select("*").eq("search_id", search_id))
         
         return {
             "id": search["id"],
@@ -91,12 +481,12 @@ async def get_history_by_id(search_id: int):
 
 
 
-@router.delete("/history/{search_id}")
+@router.delete("/history/{search_id}", response_model=DeleteHistoryResponse)
 async def delete_history(search_id: int):
 
     try:
        
-        search_response = supabase.table("weather_searches").select("*").eq("id", search_id).execute()
+        search_response = await execute(supabase.table("weather_searches").select("*").eq("id", search_id))
         
         if not search_response.data:
             raise HTTPException(status_code=404, detail=f"Search with id {search_id} not found")
@@ -104,10 +494,10 @@ async def delete_history(search_id: int):
         search = search_response.data[0]
         
        
-        supabase.table("weather_results").delete().eq("search_id", search_id).execute()
+        await execute(supabase.table("weather_results").delete().eq("search_id", search_id))
         
         
-        supabase.table("weather_searches").delete().eq("id", search_id).execute()
+        await execute(supabase.table("weather_searches").delete().eq("id", search_id))
         
         return {
             "message": "Search deleted successfully",
@@ -124,14 +514,14 @@ async def delete_history(search_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
-@router.delete("/history/all")
+@router.delete("/history/all", response_model=MessageResponse)
 async def delete_all_history():
 
     try:
         
-        supabase.table("weather_results").delete().neq("search_id", -1).execute()
+        await execute(supabase.table("weather_results").delete().neq("search_id", -1))
         
-        supabase.table("weather_searches").delete().neq("id", -1).execute()
+        await execute(supabase.table("weather_searches").delete().neq("id", -1))
 
         return {
             "message": "All searches and results deleted successfully"
@@ -141,127 +531,62 @@ async def delete_all_history():
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@router.get("/history/search/country")
+@router.get("/history/search/country", response_model=FilteredHistoryPage, response_model_exclude_unset=True)
 async def search_history_by_country(
-    country: str = Query(..., min_length=1, description="Country name to search for")
+    country: str = Query(..., min_length=1, description="Country name to search for"),
+    page: dict = Depends(history_page)
 ):
     """Search weather history by country"""
     
     print(f"Searching history by country: {country}")
     
     try:
-        searches_response = (
-            supabase
-            .table("weather_searches")
-            .select("*")
+        searches_response = await execute(
+            _searches_query(page)
             .ilike("country", f"%{country}%")
-            .execute()
         )
 
-        if not searches_response.data:
-            return {
-                "total": 0,
-                "filter": {"country": country},
-                "searches": []
-            }
-
-        result = []
-        for search in searches_response.data:
-            results_response = (
-                supabase
-                .table("weather_results")
-                .select("*")
-                .eq("search_id", search["id"])
-                .execute()
-            )
-
-            result.append({
-                "id": search["id"],
-                "city": search["city"],
-                "state": search["state"],
-                "country": search["country"],
-                "coordinates": {
-                    "lat": search["lat"],
-                    "lon": search["lon"]
-                },
-                "start_date": search["start_date"],
-                "end_date": search["end_date"],
-                "created_at": search["created_at"],
-                "weather_data": results_response.data
-            })
-
-        return {
-            "total": len(result),
+        return TimedJSONResponse({
             "filter": {"country": country},
-            "searches": result
-        }
+            **await _history_page(searches_response.data, page)
+        })
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@router.get("/history/search/city")
+@router.get("/history/search/city", response_model=FilteredHistoryPage, response_model_exclude_unset=True)
 async def search_history_by_city(
-    city: str = Query(..., min_length=1, description="City name to search for")
+    city: str = Query(..., min_length=1, description="City name to search for"),
+    page: dict = Depends(history_page)
 ):
     """Search weather history by city"""
     
     print(f"Searching history by city: {city}")
     
     try:
-        searches_response = (
-            supabase
-            .table("weather_searches")
-            .select("*")
+        searches_response = await execute(
+            _searches_query(page)
             .ilike("city", f"%{city}%")
-            .execute()
         )
 
-        if not searches_response.data:
-            return {
-                "total": 0,
-                "filter": {"city": city},
-                "searches": []
-            }
-
-        result = []
-        for search in searches_response.data:
-            results_response = (
-                supabase
-                .table("weather_results")
-                .select("*")
-                .eq("search_id", search["id"])
-                .execute()
-            )
-
-            result.append({
-                "id": search["id"],
-                "city": search["city"],
-                "state": search["state"],
-                "country": search["country"],
-                "coordinates": {
-                    "lat": search["lat"],
-                    "lon": search["lon"]
-                },
-                "start_date": search["start_date"],
-                "end_date": search["end_date"],
-                "created_at": search["created_at"],
-                "weather_data": results_response.data
-            })
-
-        return {
-            "total": len(result),
+        return TimedJSONResponse({
             "filter": {"city": city},
-            "searches": result
-        }
+            **await _history_page(searches_response.data, page)
+        })
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@router.get("/history/search/state")
+@router.get("/history/search/state", response_model=FilteredHistoryPage, response_model_exclude_unset=True)
 async def search_history_by_state(
-    state: str = Query(..., min_length=1, description="State name to search for")
+    state: str = Query(..., min_length=1, description="State name to search for"),
+    page: dict = Depends(history_page)
 ):
     """Search weather history by state"""
     
@@ -270,120 +595,49 @@ async def search_history_by_state(
     try:
         # Handle null/none case
         if state.lower() in ("null", "none"):
-            searches_response = (
-                supabase
-                .table("weather_searches")
-                .select("*")
+            searches_response = await execute(
+                _searches_query(page)
                 .is_("state", None)
-                .execute()
             )
         else:
-            searches_response = (
-                supabase
-                .table("weather_searches")
-                .select("*")
+            searches_response = await execute(
+                _searches_query(page)
                 .ilike("state", f"%{state}%")
-                .execute()
-            )
-
-        if not searches_response.data:
-            return {
-                "total": 0,
-                "filter": {"state": state},
-                "searches": []
-            }
-
-        result = []
-        for search in searches_response.data:
-            results_response = (
-                supabase
-                .table("weather_results")
-                .select("*")
-                .eq("search_id", search["id"])
-                .execute()
             )
 
-            result.append({
-                "id": search["id"],
-                "city": search["city"],
-                "state": search["state"],
-                "country": search["country"],
-                "coordinates": {
-                    "lat": search["lat"],
-                    "lon": search["lon"]
-                },
-                "start_date": search["start_date"],
-                "end_date": search["end_date"],
-                "created_at": search["created_at"],
-                "weather_data": results_response.data
-            })
-
-        return {
-            "total": len(result),
+        return TimedJSONResponse({
             "filter": {"state": state},
-            "searches": result
-        }
+            **await _history_page(searches_response.data, page)
+        })
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@router.get("/history/search/zipcode")
+@router.get("/history/search/zipcode", response_model=FilteredHistoryPage, response_model_exclude_unset=True)
 async def search_history_by_zipcode(
-    zipcode: str = Query(..., min_length=1, description="Zipcode to search for")
+    zipcode: str = Query(..., min_length=1, description="Zipcode to search for"),
+    page: dict = Depends(history_page)
 ):
     """Search weather history by zipcode"""
     
     print(f"Searching history by zipcode: {zipcode}")
     
     try:
-        searches_response = (
-            supabase
-            .table("weather_searches")
-            .select("*")
+        searches_response = await execute(
+            _searches_query(page)
             .ilike("zip_code", f"%{zipcode}%")
-            .execute()
         )
 
-        if not searches_response.data:
-            return {
-                "total": 0,
-                "filter": {"zip_code": zipcode},
-                "searches": []
-            }
-
-        result = []
-        for search in searches_response.data:
-            results_response = (
-                supabase
-                .table("weather_results")
-                .select("*")
-                .eq("search_id", search["id"])
-                .execute()
-            )
-
-            result.append({
-                "id": search["id"],
-                "city": search["city"],
-                "state": search["state"],
-                "country": search["country"],
-                "zip_code": search.get("zip_code"),
-                "coordinates": {
-                    "lat": search["lat"],
-                    "lon": search["lon"]
-                },
-                "start_date": search["start_date"],
-                "end_date": search["end_date"],
-                "created_at": search["created_at"],
-                "weather_data": results_response.data
-            })
-
-        return {
-            "total": len(result),
+        return TimedJSONResponse({
             "filter": {"zipcode": zipcode},
-            "searches": result
-        }
+            **await _history_page(searches_response.data, page, with_zip_code=True)
+        })
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
@@ -400,11 +654,11 @@ async def search_history_by_zipcode(
 
 # ==================== UPDATE ENDPOINT ====================
 from app.Schemas.WeatherSchemas import WeatherSearchUpdate
-@router.put("/history/{search_id}")
+@router.put("/history/{search_id}", response_model=UpdateHistoryResponse)
 async def update_history(search_id: int, updates: WeatherSearchUpdate):
     try:
         
-        search_response = supabase.table("weather_searches").select("*").eq("id", search_id).execute()
+        search_response = await execute(supabase.table("weather_searches").select("*").eq("id", search_id))
         if not search_response.data:
             raise HTTPException(status_code=404, detail=f"Search with id {search_id} not found")
 
@@ -451,7 +705,7 @@ async def update_history(search_id: int, updates: WeatherSearchUpdate):
             raise HTTPException(status_code=400, detail="No fields to update")
 
         
-        updated_response = supabase.table("weather_searches").update(update_data).eq("id", search_id).execute()
+        updated_response = await execute(supabase.table("weather_searches").update(update_data).eq("id", search_id))
         if not updated_response.data:
             raise HTTPException(status_code=500, detail="Update failed")
 
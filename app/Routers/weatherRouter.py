@@ -1,119 +1,76 @@
-import os
-from tracemalloc import start
+import asyncio
 import httpx
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Query
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, timezone
-from app.supabase import supabase
+from app.http_clients import openweather_client
+from app.Services import weatherService, historyService
+from app.Schemas.WeatherSchemas import (
+    BatchLocationQuery, WeatherBatchRequest, CurrentWeatherResponse, ForecastRangeResponse, WeatherBatchResponse
+)
+from app import config, ratelimit
 
 load_dotenv()
 
 router = APIRouter(prefix="/api/weather", tags=["Weather"])
 
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
 
-@router.get("/search/by-city")
+@router.get("/search/by-city", response_model=CurrentWeatherResponse)
 async def search_by_city(
     city: str,
     country: str,
-    state: str | None = None
+    state: str | None = None,
+    client: httpx.AsyncClient = Depends(openweather_client)
 ):
-    geo_query = f"{city},{state},{country}" if state else f"{city},{country}"
-
-    geo_url = (
-        "https://api.openweathermap.org/geo/1.0/direct"
-        f"?q={geo_query}&limit=1&appid={OPENWEATHER_API_KEY}"
-    )
-
-    search_id = None
-
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            #GEO 
-            geo_response = await client.get(geo_url)
-            if geo_response.status_code != 200:
-                raise HTTPException(
-                    status_code=geo_response.status_code,
-                    detail="Geocoding API error"
-                )
-
-            geo_data = geo_response.json()
-            if not geo_data:
-                raise HTTPException(status_code=404, detail="City not found")
-
-            geo = geo_data[0]
-            lat = geo["lat"]
-            lon = geo["lon"]
-
-            #WEATHER
-            weather_url = (
-                "https://api.openweathermap.org/data/2.5/weather"
-                f"?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-            )
-
-            weather_response = await client.get(weather_url)
-            if weather_response.status_code != 200:
-                raise HTTPException(
-                    status_code=weather_response.status_code,
-                    detail="Weather API error"
-                )
-
-            weather = weather_response.json()
+        #GEO + WEATHER
+        geo, weather = await weatherService.for_city(client, city, country, state, weatherService.current_weather)
+        if not geo:
+            raise HTTPException(status_code=404, detail="City not found")
 
-        searched_at = datetime.now(timezone.utc).isoformat()
+        lat = geo["lat"]
+        lon = geo["lon"]
 
-        # -------- INSERT SEARCH --------
-        search_insert = supabase.table("weather_searches").insert({
-            "city": geo["name"],
-            "state": geo.get("state"),
-            "country": geo["country"],
-            "lat": lat,
-            "lon": lon,
-            "created_at": searched_at,
-            "start_date": searched_at,
-            "end_date": searched_at
-        }).execute()
-
-        search_id = search_insert.data[0]["id"]
+        searched_at = datetime.now(timezone.utc).isoformat()
 
-        # -------- INSERT RESULT --------
-        supabase.table("weather_results").insert({
-            "search_id": search_id,
-            "forecast_datetime": searched_at,
-            "temp": weather["main"]["temp"],
-            "feels_like": weather["main"]["feels_like"],
-            "humidity": weather["main"]["humidity"],
-            "description": weather["weather"][0]["description"],
-            "wind_speed": weather["wind"]["speed"]
-        }).execute()
+        # -------- SAVE HISTORY --------
+        search_id = await historyService.save(
+            {
+                "city": geo["name"],
+                "state": geo.get("state"),
+                "country": geo["country"],
+                "lat": lat,
+                "lon": lon,
+                "created_at": searched_at,
+                "start_date": searched_at,
+                "end_date": searched_at
+            },
+            [{
+                "forecast_datetime": searched_at,
+                "temp": weather["main"]["temp"],
+                "feels_like": weather["main"]["feels_like"],
+                "humidity": weather["main"]["humidity"],
+                "description": weather["weather"][0]["description"],
+                "wind_speed": weather["wind"]["speed"]
+            }]
+        )
 
     #HTTP ERRORS 
     except HTTPException:
-        
-        if search_id:
-            supabase.table("weather_searches") \
-                .delete() \
-                .eq("id", search_id) \
-                .execute()
         raise
 
     #UNEXPECTED ERRORS 
     except Exception as e:
-        if search_id:
-            supabase.table("weather_searches") \
-                .delete() \
-                .eq("id", search_id) \
-                .execute()
-
         raise HTTPException(
             status_code=500,
-            detail=f"Transaction failed, rolled back: {str(e)}"
+            detail=f"Failed to save history: {str(e)}"
         )
 
     
     return {
         "search_id": search_id,
+        "stale": weather.get("stale", False),
         "location": {
             "city": geo["name"],
             "state": geo.get("state"),
@@ -139,86 +96,61 @@ async def search_by_city(
 
 
 
-@router.get("/search/by-zip")
-async def search_by_zip(zip_code: str, country: str):
+@router.get("/search/by-zip", response_model=CurrentWeatherResponse)
+async def search_by_zip(
+    zip_code: str,
+    country: str,
+    client: httpx.AsyncClient = Depends(openweather_client)
+):
     """
     Exemple:
     /api/weather/search/by-zip?zip_code=75001&country=FR
     """
 
-    search_id = None
-
-    url = (
-        "https://api.openweathermap.org/data/2.5/weather"
-        f"?zip={zip_code},{country}&appid={OPENWEATHER_API_KEY}&units=metric"
-    )
-
     try:
         # WEATHER API
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(url)
-
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail="Weather API error"
-                )
-
-            data = response.json()
+        data = await weatherService.current_weather_by_zip(client, zip_code, country)
 
         searched_at = datetime.now(timezone.utc).isoformat()
 
         
-        search_insert = supabase.table("weather_searches").insert({
-            "city": data.get("name"),
-            "state": data.get("state") if "state" in data else None,
-            "country": data["sys"]["country"],
-            "zip_code": zip_code,
-            "lat": data["coord"]["lat"],
-            "lon": data["coord"]["lon"],
-            "created_at": searched_at,
-            "start_date": searched_at,
-            "end_date": searched_at
-        }).execute()
-
-        search_id = search_insert.data[0]["id"]
-
-       
-        supabase.table("weather_results").insert({
-            "search_id": search_id,
-            "forecast_datetime": searched_at,
-            "temp": data["main"]["temp"],
-            "feels_like": data["main"]["feels_like"],
-            "humidity": data["main"]["humidity"],
-            "description": data["weather"][0]["description"],
-            "wind_speed": data["wind"]["speed"]
-        }).execute()
+        search_id = await historyService.save(
+            {
+                "city": data.get("name"),
+                "state": data.get("state") if "state" in data else None,
+                "country": data["sys"]["country"],
+                "zip_code": zip_code,
+                "lat": data["coord"]["lat"],
+                "lon": data["coord"]["lon"],
+                "created_at": searched_at,
+                "start_date": searched_at,
+                "end_date": searched_at
+            },
+            [{
+                "forecast_datetime": searched_at,
+                "temp": data["main"]["temp"],
+                "feels_like": data["main"]["feels_like"],
+                "humidity": data["main"]["humidity"],
+                "description": data["weather"][0]["description"],
+                "wind_speed": data["wind"]["speed"]
+            }]
+        )
 
     
     except HTTPException:
-        if search_id:
-            supabase.table("weather_searches") \
-                .delete() \
-                .eq("id", search_id) \
-                .execute()
         raise
 
     
     except Exception as e:
-        if search_id:
-            supabase.table("weather_searches") \
-                .delete() \
-                .eq("id", search_id) \
-                .execute()
-
         raise HTTPException(
             status_code=500,
-            detail=f"Transaction failed, rolled back: {str(e)}"
+            detail=f"Failed to save history: {str(e)}"
         )
 
    
     return {
         "search_id": search_id,
+        "stale": data.get("stale", False),
         "location": {
             "city": data.get("name"),
             "country": data["sys"]["country"],
@@ -238,85 +170,60 @@ async def search_by_zip(zip_code: str, country: str):
 #===============================================================================================================================================================
 
 
-@router.get("/search/by-coords")
-async def search_by_coords(lat: float, lon: float):
+@router.get("/search/by-coords", response_model=CurrentWeatherResponse)
+async def search_by_coords(
+    lat: float,
+    lon: float,
+    client: httpx.AsyncClient = Depends(openweather_client)
+):
     """
     Exemple:
     /api/weather/search/by-coords?lat=48.8566&lon=2.3522
     """
 
-    search_id = None
-
-    url = (
-        "https://api.openweathermap.org/data/2.5/weather"
-        f"?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-    )
-
     try:
         #WEATHER
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(url)
-
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail="Weather API error"
-                )
-
-            data = response.json()
+        data = await weatherService.current_weather(client, lat, lon)
 
         searched_at = datetime.now(timezone.utc).isoformat()
 
         
-        search_insert = supabase.table("weather_searches").insert({
-            "city": data.get("name"),
-            "state": data.get("state") if "state" in data else None,
-            "country": data["sys"]["country"],
-            "lat": lat,
-            "lon": lon,
-            "created_at": searched_at,
-            "start_date": searched_at,
-            "end_date": searched_at
-        }).execute()
-
-        search_id = search_insert.data[0]["id"]
-
-        
-        supabase.table("weather_results").insert({
-            "search_id": search_id,
-            "forecast_datetime": searched_at,
-            "temp": data["main"]["temp"],
-            "feels_like": data["main"]["feels_like"],
-            "humidity": data["main"]["humidity"],
-            "description": data["weather"][0]["description"],
-            "wind_speed": data["wind"]["speed"]
-        }).execute()
+        search_id = await historyService.save(
+            {
+                "city": data.get("name"),
+                "state": data.get("state") if "state" in data else None,
+                "country": data["sys"]["country"],
+                "lat": lat,
+                "lon": lon,
+                "created_at": searched_at,
+                "start_date": searched_at,
+                "end_date": searched_at
+            },
+            [{
+                "forecast_datetime": searched_at,
+                "temp": data["main"]["temp"],
+                "feels_like": data["main"]["feels_like"],
+                "humidity": data["main"]["humidity"],
+                "description": data["weather"][0]["description"],
+                "wind_speed": data["wind"]["speed"]
+            }]
+        )
 
     #HTTP ERRORS
     except HTTPException:
-        if search_id:
-            supabase.table("weather_searches") \
-                .delete() \
-                .eq("id", search_id) \
-                .execute()
         raise
 
     #UNEXPECTED ERRORS
     except Exception as e:
-        if search_id:
-            supabase.table("weather_searches") \
-                .delete() \
-                .eq("id", search_id) \
-                .execute()
-
         raise HTTPException(
             status_code=500,
-            detail=f"Transaction failed, rolled back: {str(e)}"
+            detail=f"Failed to save history: {str(e)}"
         )
 
     
     return {
         "search_id": search_id,
+        "stale": data.get("stale", False),
         "location": {
             "city": data.get("name"),
             "country": data["sys"]["country"],
@@ -341,15 +248,21 @@ async def search_by_coords(lat: float, lon: float):
 #===============================================================================================================================================================
 
 
-@router.get("/weather/by-city-range")
+@router.get("/weather/by-city-range", response_model=ForecastRangeResponse)
 async def weather_by_city_range(
     city: str,
     country: str,
     state: str | None = None,
     start_date: str | None = None,
-    end_date: str | None = None
+    end_date: str | None = None,
+    granularity: str = Query("3h", pattern="^(3h|daily)$", description="3h: raw forecast items, daily: one aggregated row per day"),
+    store_daily: bool = Query(False, description="Save one aggregated row per day in the history instead of every 3h item"),
+    client: httpx.AsyncClient = Depends(openweather_client)
 ):
-    search_id = None 
+    """
+    Exemple:
+    /api/weather/weather/by-city-range?city=Paris&country=FR&granularity=daily&store_daily=true
+    """
 
     try:
        
@@ -368,70 +281,35 @@ async def weather_by_city_range(
             raise HTTPException(400, "Range limited to 5 days max")
 
         
-        #GEO CODING
+        #GEO CODING + WEATHER FORECAST
         
-        geo_query = f"{city},{state},{country}" if state else f"{city},{country}"
-
-        geo_url = (
-            f"https://api.openweathermap.org/geo/1.0/direct"
-            f"?q={geo_query}&limit=1&appid={OPENWEATHER_API_KEY}"
-        )
-
-        async with httpx.AsyncClient(timeout=30) as client:
-            geo_resp = await client.get(geo_url)
+        geo, forecast_data = await weatherService.for_city(client, city, country, state, weatherService.forecast)
 
-            if geo_resp.status_code != 200 or not geo_resp.json():
-                raise HTTPException(404, "City not found")
+        if not geo:
+            raise HTTPException(404, "City not found")
 
-            geo = geo_resp.json()[0]
-            lat = geo["lat"]
-            lon = geo["lon"]
+        lat = geo["lat"]
+        lon = geo["lon"]
+        forecast = forecast_data["list"]
 
-            
-            #WEATHER FORECAST
-            
-            weather_url = (
-                f"https://api.openweathermap.org/data/2.5/forecast"
-                f"?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-            )
-
-            weather_resp = await client.get(weather_url)
-
-            if weather_resp.status_code != 200:
-                raise HTTPException(500, "Weather API error")
-
-            forecast = weather_resp.json()["list"]
 
-        
-        #INSERT search in history
-       
-        search_insert = supabase.table("weather_searches").insert({
-            "city": geo["name"],
-            "state": geo.get("state"),
-            "country": geo["country"],
-            "lat": lat,
-            "lon": lon,
-            "start_date": start.isoformat(),
-            "end_date": end.isoformat() ,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }).execute()
-
-        search_id = search_insert.data[0]["id"]
-
-        
-        #FILTER + INSERT RESULTS
+        #FILTER RESULTS
         
         results = []
         weather_rows = []
+        days = []
+        items = []
 
         for item in forecast:
             item_date = datetime.fromtimestamp(item["dt"]).date()
 
             if not (start <= item_date <= end):
                 continue
-            
+
+            days.append(item_date)
+            items.append(item)
+
             row = {
-                "search_id": search_id,
                 "forecast_datetime": item["dt_txt"],
                 "temp": item["main"]["temp"],
                 "feels_like": item["main"]["feels_like"],
@@ -451,9 +329,34 @@ async def weather_by_city_range(
                 "wind_speed": item["wind"]["speed"]
             })
 
-    
-        if weather_rows:
-            supabase.table("weather_results").insert(weather_rows).execute()
+
+        #DAILY AGGREGATES
+
+        if granularity == "daily" or store_daily:
+            daily = weatherService.aggregate_daily(days, items)
+
+            if granularity == "daily":
+                results = daily
+            if store_daily:
+                weather_rows = [weatherService.daily_history_row(day) for day in daily]
+
+
+        #SAVE search + results in history
+
+        await historyService.save(
+            {
+                "city": geo["name"],
+                "state": geo.get("state"),
+                "country": geo["country"],
+                "lat": lat,
+                "lon": lon,
+                "start_date": start.isoformat(),
+                "end_date": end.isoformat() ,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "granularity": "daily" if store_daily else "3h"
+            },
+            weather_rows
+        )
 
         return {
             "city": geo["name"],
@@ -461,19 +364,141 @@ async def weather_by_city_range(
             "country": geo["country"],
             "lat": lat,
             "lon": lon,
+            "granularity": granularity,
             "count": len(results),
+            "stale": forecast_data.get("stale", False),
             "data": results
         }
 
+    except HTTPException:
+        raise
+
     except Exception as e:
-        
-        #    rollback
-        
-        if search_id:
-            supabase.table("weather_results").delete().eq("search_id", search_id).execute()
-            supabase.table("weather_searches").delete().eq("id", search_id).execute()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to save history: {str(e)}"
+        )
+
+
+
+
+
+
+
+#===============================================================================================================================================================
+
+
+async def _resolve_current(client: httpx.AsyncClient, query: BatchLocationQuery) -> dict:
+    """Current weather + location for one batch query, same lookups as the /search/* endpoints"""
+
+    if query.lat is not None and query.lon is not None:
+        data = await weatherService.current_weather(client, query.lat, query.lon)
+        location = {
+            "city": data.get("name"),
+            "state": None,
+            "country": data["sys"]["country"],
+            "lat": query.lat,
+            "lon": query.lon
+        }
+    elif query.zip_code:
+        data = await weatherService.current_weather_by_zip(client, query.zip_code, query.country)
+        location = {
+            "city": data.get("name"),
+            "state": None,
+            "country": data["sys"]["country"],
+            "lat": data["coord"]["lat"],
+            "lon": data["coord"]["lon"]
+        }
+    else:
+        geo, data = await weatherService.for_city(
+            client, query.city, query.country, query.state, weatherService.current_weather
+        )
+        if not geo:
+            raise HTTPException(status_code=404, detail="City not found")
+        location = {
+            "city": geo["name"],
+            "state": geo.get("state"),
+            "country": geo["country"],
+            "lat": geo["lat"],
+            "lon": geo["lon"]
+        }
+
+    return {
+        "location": location,
+        "stale": data.get("stale", False),
+        "weather": {
+            "temp": data["main"]["temp"],
+            "feels_like": data["main"]["feels_like"],
+            "humidity": data["main"]["humidity"],
+            "description": data["weather"][0]["description"],
+            "wind_speed": data["wind"]["speed"]
+        }
+    }
+
+
+@router.post("/batch", response_model=WeatherBatchResponse, response_model_exclude_unset=True)
+async def weather_batch(
+    body: WeatherBatchRequest,
+    client: httpx.AsyncClient = Depends(openweather_client)
+):
+    """
+    Current weather for many locations at once, resolved concurrently
+    (WEATHER_BATCH_CONCURRENCY at a time). Failed items carry an error instead
+    of failing the whole batch; successful ones are saved with one bulk insert
+    (or queued for the history writer).
+
+    Exemple body:
+    {"queries": [{"city": "Paris", "country": "FR"}, {"zip_code": "10001", "country": "US"}, {"lat": 35.68, "lon": 139.69}]}
+    """
+
+    semaphore = asyncio.Semaphore(config.WEATHER_BATCH_CONCURRENCY)
 
+    async def resolve(index: int, query: BatchLocationQuery) -> dict:
+        item = {"index": index, "query": query.model_dump(exclude_none=True)}
+        try:
+            # batch items yield to interactive requests when the quota runs short
+            with ratelimit.priority("batch"):
+                async with semaphore:
+                    item.update(await _resolve_current(client, query))
+        except HTTPException as e:
+            item["error"] = {"status_code": e.status_code, "detail": e.detail}
+        except Exception as e:
+            item["error"] = {"status_code": 500, "detail": str(e)}
+        return item
+
+    items = await asyncio.gather(*(resolve(i, q) for i, q in enumerate(body.queries)))
+    succeeded = [item for item in items if "error" not in item]
+
+    try:
+        if succeeded:
+            searched_at = datetime.now(timezone.utc).isoformat()
+
+            search_ids = await historyService.save_many([
+                {
+                    "search": {
+                        **item["location"],
+                        "zip_code": item["query"].get("zip_code"),
+                        "created_at": searched_at,
+                        "start_date": searched_at,
+                        "end_date": searched_at
+                    },
+                    "results": [{"forecast_datetime": searched_at, **item["weather"]}]
+                }
+                for item in succeeded
+            ])
+
+            for search_id, item in zip(search_ids, succeeded):
+                item["search_id"] = search_id
+
+    except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Transaction failed, rolled back: {str(e)}"
-        )
\ No newline at end of file
+            detail=f"Failed to save history: {str(e)}"
+        )
+
+    return {
+        "total": len(items),
+        "succeeded": len(succeeded),
+        "failed": len(items) - len(succeeded),
+        "results": items
+    }
@@ -1,92 +1,55 @@
-import os
 import httpx
-from fastapi import APIRouter, HTTPException
-from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, Query
+from app.http_clients import youtube_client
+from app.Services import youtubeService
+from app.Schemas.YoutubeSchemas import VideoSearchResponse
 
 router = APIRouter(prefix="/api/youtube", tags=["YouTube"])
-load_dotenv()
 
-YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
-@router.get("/search_locations")
-async def search_locations(query: str, max_results: int = 5):
+@router.get("/search_locations", response_model=VideoSearchResponse)
+async def search_locations(
+    query: str,
+    max_results: int = Query(5, ge=1, le=youtubeService.MAX_RESULTS),
+    client: httpx.AsyncClient = Depends(youtube_client)
+):
+    """
+    Travel videos about a place, cached per normalized query
 
-    query = f"{query} travel tourism places to visit" #to show only travel related videos
+    Exemple:
+    /api/youtube/search_locations?query=Paris&max_results=5
+    """
 
-    youtube_url = (
-        "https://www.googleapis.com/youtube/v3/search"
-        f"?part=snippet&q={query}&maxResults={max_results}&key={YOUTUBE_API_KEY}"
-    )
+    #to show only travel related videos
+    videos, cached = await youtubeService.search(client, "locations", query, max_results)
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.get(youtube_url)
+    return {
+        "total_results": len(videos),
+        "cached": cached,
+        "videos": videos
+    }
 
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail="YouTube API error"
-            )
 
-        data = response.json()
 
 
+@router.get("/search_weather", response_model=VideoSearchResponse)
+async def search_weather(
+    query: str,
+    max_results: int = Query(5, ge=1, le=youtubeService.MAX_RESULTS),
+    client: httpx.AsyncClient = Depends(youtube_client)
+):
+    """
+    Weather forecast videos about a place, cached per normalized query
 
-        videos = []
+    Exemple:
+    /api/youtube/search_weather?query=Paris&max_results=5
+    """
 
-        for item in data.get("items", []):
-            video_id = item["id"]["videoId"]
-            snippet = item["snippet"]
-            
-            videos.append({
-                "title": snippet["title"],
-                "description": snippet["description"],
-                "url": f"https://www.youtube.com/watch?v={video_id}"
-            })
-        
-        return {
-            "total_results": len(videos),
-            "videos": videos
-        }
-    
+    #to show only weather related videos
+    videos, cached = await youtubeService.search(client, "weather", query, max_results)
 
-
-
-@router.get("/search_weather")
-async def search_weather(query: str, max_results: int = 5):
-
-    query = f"{query} weather forecast" #to show only weather related videos
-
-    youtube_url = (
-        "https://www.googleapis.com/youtube/v3/search"
-        f"?part=snippet&q={query}&maxResults={max_results}&key={YOUTUBE_API_KEY}"
-    )
-
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.get(youtube_url)
-
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail="YouTube API error"
-            )
-
-        data = response.json()
-
-
-
-        videos = []
-
-        for item in data.get("items", []):
-            video_id = item["id"]["videoId"]
-            snippet = item["snippet"]
-            
-            videos.append({
-                "title": snippet["title"],
-                "description": snippet["description"],
-                "url": f"https://www.youtube.com/watch?v={video_id}"
-            })
-        
-        return {
-            "total_results": len(videos),
-            "videos": videos
-        }
\ No newline at end of file
+    return {
+        "total_results": len(videos),
+        "cached": cached,
+        "videos": videos
+    }
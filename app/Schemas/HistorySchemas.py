@@ -0,0 +1,113 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+
+
+# History endpoints are served with response_model_exclude_unset=True so that
+# a fields= projection only returns the selected columns.
+
+
+class WeatherResultRow(BaseModel):
+    """weather_results row, columns this model does not know are passed through"""
+    model_config = ConfigDict(extra="allow")
+
+    id: Optional[int] = None
+    search_id: Optional[int] = None
+    forecast_datetime: Optional[str] = None
+    temp: Optional[float] = None
+    feels_like: Optional[float] = None
+    humidity: Optional[int] = None
+    description: Optional[str] = None
+    wind_speed: Optional[float] = None
+    # daily aggregate rows only (granularity "daily")
+    temp_min: Optional[float] = None
+    temp_max: Optional[float] = None
+    humidity_min: Optional[int] = None
+    humidity_max: Optional[int] = None
+
+
+class WeatherSearchRow(BaseModel):
+    """Raw weather_searches row"""
+    model_config = ConfigDict(extra="allow")
+
+    id: int
+    city: Optional[str] = None
+    state: Optional[str] = None
+    country: Optional[str] = None
+    zip_code: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    created_at: Optional[str] = None
+    granularity: Optional[str] = None
+
+
+class Coordinates(BaseModel):
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+
+
+class HistorySearch(BaseModel):
+    id: int
+    city: Optional[str] = None
+    state: Optional[str] = None
+    country: Optional[str] = None
+    zip_code: Optional[str] = None
+    coordinates: Optional[Coordinates] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    created_at: Optional[str] = None
+    granularity: Optional[str] = None
+    weather_data: Optional[List[WeatherResultRow]] = None
+
+
+class HistoryPage(BaseModel):
+    total: int
+    next_cursor: Optional[str] = None
+    searches: List[HistorySearch]
+
+
+class FilteredHistoryPage(HistoryPage):
+    filter: dict[str, str]
+
+
+class RankedHistorySearch(HistorySearch):
+    rank: float
+
+
+class RankedHistoryPage(FilteredHistoryPage):
+    searches: List[RankedHistorySearch]
+
+
+class NearbyHistorySearch(HistorySearch):
+    distance_km: float
+
+
+class NearbyHistoryPage(BaseModel):
+    center: Coordinates
+    radius_km: Optional[float] = None
+    source: str  # "memory" (in-process KD-tree) | "database"
+    total: int
+    searches: List[NearbyHistorySearch]
+
+
+class DeletedSearch(BaseModel):
+    id: int
+    city: Optional[str] = None
+    country: Optional[str] = None
+    created_at: Optional[str] = None
+
+
+class DeleteHistoryResponse(BaseModel):
+    message: str
+    deleted_search: DeletedSearch
+
+
+class MessageResponse(BaseModel):
+    message: str
+
+
+class UpdateHistoryResponse(BaseModel):
+    message: str
+    updated_fields: List[str]
+    search: WeatherSearchRow
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class DescriptionResponse(BaseModel):
+    city: str
+    country: str
+    climate_description: str
+    provider: str
+    cached: bool
+
+
+class CacheInvalidationResponse(BaseModel):
+    message: str
+    deleted: int
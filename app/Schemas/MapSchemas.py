@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class CityCoordinates(BaseModel):
+    city: str
+    state: Optional[str] = None
+    country: str
+    lat: float
+    lon: float
+
+
+class CitySuggestion(CityCoordinates):
+    population: Optional[int] = None  # gazetteer matches only
+
+
+class CityAutocomplete(BaseModel):
+    query: str
+    source: str  # "gazetteer" | "openweather"
+    total: int
+    results: List[CitySuggestion]
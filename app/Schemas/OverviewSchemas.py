@@ -0,0 +1,42 @@
+from pydantic import BaseModel
+from typing import Generic, List, Optional, TypeVar, Union
+from app.Schemas.WeatherSchemas import Location, CurrentWeather, ForecastPoint, DailyForecast, BatchItemError
+from app.Schemas.YoutubeSchemas import VideoSearchResponse
+
+T = TypeVar("T")
+
+
+class OverviewSection(BaseModel, Generic[T]):
+    status: str  # "ok" | "error" | "timeout"
+    elapsed_ms: float
+    error: Optional[BatchItemError] = None
+    data: Optional[T] = None
+
+
+class CurrentSection(BaseModel):
+    search_id: Optional[int] = None  # None when the search was queued for the history writer
+    stale: bool = False
+    weather: CurrentWeather
+
+
+class ForecastSection(BaseModel):
+    granularity: str
+    count: int
+    stale: bool = False
+    data: List[Union[ForecastPoint, DailyForecast]]
+
+
+class DescriptionSection(BaseModel):
+    description: str
+    provider: str
+    cached: bool
+
+
+class OverviewResponse(BaseModel):
+    location: Location
+    elapsed_ms: float
+    current: Optional[OverviewSection[CurrentSection]] = None
+    forecast: Optional[OverviewSection[ForecastSection]] = None
+    climate: Optional[OverviewSection[DescriptionSection]] = None
+    places: Optional[OverviewSection[DescriptionSection]] = None
+    videos: Optional[OverviewSection[VideoSearchResponse]] = None
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, List, Optional, Union
 
 
 class WeatherSearchUpdate(BaseModel):
@@ -10,4 +10,97 @@ class WeatherSearchUpdate(BaseModel):
     lat: Optional[float] = None
     lon: Optional[float] = None
     start_date: Optional[str] = None  # ou date
-    end_date: Optional[str] = None    # ou date
\ No newline at end of file
+    end_date: Optional[str] = None    # ou date
+
+class BatchLocationQuery(BaseModel):
+    """One location of a batch: city + country, zip_code + country, or lat + lon"""
+    city: Optional[str] = None
+    state: Optional[str] = None
+    country: Optional[str] = None
+    zip_code: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+
+    @model_validator(mode="after")
+    def check_location(self):
+        if self.lat is not None and self.lon is not None:
+            return self
+        if (self.city or self.zip_code) and self.country:
+            return self
+        raise ValueError("each query needs city + country, zip_code + country, or lat + lon")
+
+
+class WeatherBatchRequest(BaseModel):
+    queries: List[BatchLocationQuery] = Field(..., min_length=1, max_length=500)
+
+
+# ==================== RESPONSES ====================
+class Location(BaseModel):
+    city: Optional[str] = None
+    state: Optional[str] = None
+    country: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+
+
+class CurrentWeather(BaseModel):
+    temp: float
+    feels_like: float
+    humidity: int
+    description: str
+    wind_speed: float
+
+
+class CurrentWeatherResponse(BaseModel):
+    search_id: Optional[int] = None  # None when the search was queued for the history writer
+    stale: bool = False  # served from cache past its TTL (OpenWeather unavailable or being refreshed)
+    location: Location
+    weather: CurrentWeather
+
+
+class ForecastPoint(CurrentWeather):
+    datetime: str
+
+
+class DailyForecast(BaseModel):
+    date: str
+    samples: int
+    temp_min: float
+    temp_max: float
+    temp_mean: float
+    feels_like_mean: float
+    humidity_min: int
+    humidity_max: int
+    humidity_mean: float
+    wind_speed_mean: float
+    wind_speed_max: float
+    description: str  # most frequent description of the day
+
+
+class ForecastRangeResponse(Location):
+    granularity: str = "3h"
+    count: int
+    stale: bool = False
+    data: List[Union[ForecastPoint, DailyForecast]]
+
+
+class BatchItemError(BaseModel):
+    status_code: int
+    detail: Any
+
+
+class BatchItem(BaseModel):
+    index: int
+    query: dict
+    search_id: Optional[int] = None
+    location: Optional[Location] = None
+    stale: Optional[bool] = None
+    weather: Optional[CurrentWeather] = None
+    error: Optional[BatchItemError] = None
+
+
+class WeatherBatchResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: List[BatchItem]
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class Video(BaseModel):
+    title: str
+    description: str
+    url: str
+
+
+class VideoSearchResponse(BaseModel):
+    total_results: int
+    cached: bool = False
+    videos: List[Video]
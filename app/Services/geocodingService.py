@@ -0,0 +1,152 @@
+import os
+import httpx
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from app import config, gazetteer, hedging, metrics
+from app.cache import TTLCache, SingleFlight, MISSING
+
+load_dotenv()
+
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+
+# normalized (city, state, country) -> first geo/1.0/direct match, or None for "City not found".
+# Expired matches stay GEOCODE_HINT_TTL longer as coordinate hints (see known_location).
+geocode_cache = TTLCache(
+    maxsize=config.GEOCODE_CACHE_SIZE,
+    ttl=config.GEOCODE_CACHE_TTL,
+    fallback_ttl=config.GEOCODE_HINT_TTL,
+)
+# autocomplete answers from OpenWeather: (query, country, limit) -> geo items
+suggest_cache = TTLCache(maxsize=config.SUGGEST_CACHE_SIZE, ttl=config.SUGGEST_CACHE_TTL)
+_inflight = SingleFlight()
+
+SOURCES = metrics.Counter(
+    "geocode_lookups_total",
+    "Forward geocodes by where they were answered",
+    ("source",),
+)
+
+
+def _normalize(value: str | None) -> str:
+    return " ".join(value.split()).lower() if value else ""
+
+
+def geocode_key(city: str, country: str, state: str | None = None) -> tuple[str, str, str]:
+    return (_normalize(city), _normalize(state), _normalize(country))
+
+
+async def _direct(client: httpx.AsyncClient, query: str, limit: int) -> list[dict]:
+    geo_url = (
+        "https://api.openweathermap.org/geo/1.0/direct"
+        f"?q={query}&limit={limit}&appid={OPENWEATHER_API_KEY}"
+    )
+
+    response = await hedging.hedged("openweather:geo", lambda: client.get(geo_url))
+
+    # upstream errors are raised, never cached
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail="Geocoding API error"
+        )
+
+    return response.json()
+
+
+async def _fetch(client: httpx.AsyncClient, city: str, country: str, state: str | None) -> dict | None:
+    geo_query = f"{city},{state},{country}" if state else f"{city},{country}"
+    data = await _direct(client, geo_query, 1)
+    return data[0] if data else None
+
+
+def peek(city: str, country: str, state: str | None = None):
+    """Gazetteer match or fresh cache entry (None = known unknown), MISSING when OpenWeather must be asked"""
+
+    if gazetteer.index is not None:
+        geo = gazetteer.index.lookup(city, country, state)
+        if geo is not None:
+            SOURCES.inc("gazetteer")
+            return geo
+
+    cached = geocode_cache.get(geocode_key(city, country, state))
+    if cached is not MISSING:
+        SOURCES.inc("cache")
+    return cached
+
+
+async def geocode(
+    client: httpx.AsyncClient,
+    city: str,
+    country: str,
+    state: str | None = None
+) -> dict | None:
+    """
+    Forward geocoding from the local gazetteer when one is loaded, else
+    cached OpenWeather. Returns the raw geo item ({"name", "state",
+    "country", "lat", "lon", ...}) or None when the city is unknown.
+    Concurrent misses for the same place share one upstream call.
+    """
+
+    cached = peek(city, country, state)
+    if cached is not MISSING:
+        return cached
+
+    return await refresh(client, city, country, state)
+
+
+async def refresh(
+    client: httpx.AsyncClient,
+    city: str,
+    country: str,
+    state: str | None = None
+) -> dict | None:
+    """Upstream geocode that skips the cache lookup but still fills it, coalesced like geocode()"""
+
+    key = geocode_key(city, country, state)
+
+    async def load():
+        SOURCES.inc("openweather")
+        geo = await _fetch(client, city, country, state)
+        geocode_cache.set(key, geo, ttl=None if geo else config.GEOCODE_NEGATIVE_TTL)
+        return geo
+
+    return await _inflight.do(key, load)
+
+
+def known_location(city: str, country: str, state: str | None = None) -> dict | None:
+    """Last geocode seen for the place, even expired (up to GEOCODE_HINT_TTL), None if never found"""
+
+    geo = geocode_cache.get_fallback(geocode_key(city, country, state))
+    return geo if geo is not MISSING else None
+
+
+async def suggest(
+    client: httpx.AsyncClient,
+    query: str,
+    country: str | None = None,
+    limit: int = 5
+) -> tuple[list[dict], str]:
+    """
+    (places, source) for a partial city name: gazetteer prefix matches,
+    most populated first, or OpenWeather exact-name matches (at most 5)
+    when there is no gazetteer or it knows nothing starting with `query`.
+    """
+
+    if gazetteer.index is not None:
+        places = gazetteer.index.prefix(query, country, limit)
+        if places:
+            return places, "gazetteer"
+
+    limit = min(limit, 5)  # geo/1.0/direct answers 5 places at most
+    key = ("suggest", _normalize(query), _normalize(country), limit)
+
+    cached = suggest_cache.get(key)
+    if cached is not MISSING:
+        return cached, "openweather"
+
+    async def load():
+        places = await _direct(client, f"{query},{country}" if country else query, limit)
+        suggest_cache.set(key, places)
+        return places
+
+    return await _inflight.do(key, load), "openweather"
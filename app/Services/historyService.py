@@ -0,0 +1,341 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from postgrest.exceptions import APIError
+from app import config
+from app.cache import SingleFlight
+from app.repository import execute
+from app.supabase import supabase
+
+logger = logging.getLogger(__name__)
+
+
+# A history record is {"search": weather_searches row, "results": [weather_results rows without search_id]}
+
+
+async def save_many_now(records: list[dict]) -> list[int]:
+    """
+    Insert searches and their results in one round trip through the
+    insert_weather_history Postgres function, which runs as a single
+    transaction. Returns the new search ids in input order.
+    """
+
+    if not records:
+        return []
+
+    response = await execute(supabase.rpc("insert_weather_history", {"records": records}))
+    return response.data
+
+
+async def save_now(search: dict, results: list[dict]) -> int:
+    search_ids = await save_many_now([{"search": search, "results": results}])
+    return search_ids[0]
+
+
+_inflight = SingleFlight()
+
+
+def _ilike_literal(value: str) -> str:
+    """
+    Escape the ilike wildcards so that user input only matches itself
+    (case-insensitively). PostgREST also reads * as %, with no escape:
+    callers skip the values that contain one.
+    """
+
+    return value.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def last_location(city: str, country: str, state: str | None = None) -> dict | None:
+    """{"lat", "lon"} of the latest search saved for this place, None when it was never searched"""
+
+    if "*" in f"{city}{country}{state or ''}":
+        return None
+
+    key = ("last_location", city.strip().lower(), country.strip().lower(), (state or "").strip().lower())
+
+    async def load():
+        query = (
+            supabase.table("weather_searches")
+            .select("lat, lon")
+            .ilike("city", _ilike_literal(city))
+            .ilike("country", _ilike_literal(country))
+        )
+        if state:
+            query = query.ilike("state", _ilike_literal(state))
+
+        response = await execute(query.order("created_at", desc=True).limit(1))
+        return response.data[0] if response.data else None
+
+    return await _inflight.do(key, load)
+
+
+def _process_path(path: str) -> str:
+    """history_spool.jsonl -> history_spool.<pid>.jsonl, one file per worker process"""
+
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{ext}"
+
+
+def _pid_alive(pid: int) -> bool:
+    # signal 0 only checks the pid on POSIX (on Windows it would send CTRL_C_EVENT)
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _append_records(path: str, records: list[dict]):
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def _take_records(path: str) -> list[dict]:
+    """Read and remove a JSON lines file, [] when it does not exist"""
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+    os.remove(path)
+    return records
+
+
+def _rejected(e: Exception) -> bool:
+    """The database refused the data (SQLSTATE class 22 data exception, 23 constraint violation), not a failure to reach it"""
+
+    return isinstance(e, APIError) and str(e.code or "")[:2] in ("22", "23")
+
+
+class HistoryWriter:
+    """
+    Write-behind pipeline for search history: records are queued in memory and
+    a background task flushes them with one insert_weather_history call every
+    HISTORY_BATCH_SIZE records or HISTORY_FLUSH_INTERVAL seconds.
+    A batch the database rejects is split in halves until the bad records are
+    isolated, those go to a dead letter file. Records that cannot be written
+    (DB down, full queue, shutdown) go to a JSON lines spool file that is
+    replayed on startup and after HISTORY_RETRY_INTERVAL. Both files get the
+    pid as suffix so workers never share one, and the spool of a process
+    that is gone is taken over on startup. A stop() that times out spools
+    the batch being flushed. Records still in memory are lost on a hard
+    crash.
+    """
+
+    def __init__(self, spool_path: str, dead_letter_path: str):
+        self.base_spool_path = spool_path
+        self.base_dead_letter_path = dead_letter_path
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._spool_lock: asyncio.Lock | None = None
+        self._stopping = False
+        self._last_failure = 0.0
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.spooled = 0
+        self.dead_lettered = 0
+
+    @property
+    def spool_path(self) -> str:
+        return _process_path(self.base_spool_path)
+
+    @property
+    def dead_letter_path(self) -> str:
+        return _process_path(self.base_dead_letter_path)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=config.HISTORY_QUEUE_SIZE)
+        self._spool_lock = asyncio.Lock()
+        self._stopping = False
+        await self._adopt_orphans()
+        await self._replay_spool()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._task, timeout=config.HISTORY_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+
+        await self._spool(self._drain())
+
+    async def enqueue(self, search: dict, results: list[dict]):
+        record = {"search": search, "results": results}
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            await self._spool([record])
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "flushed": self.flushed,
+            "failed_flushes": self.failed_flushes,
+            "spooled": self.spooled,
+            "dead_lettered": self.dead_lettered,
+            "spool_pending": os.path.exists(self.spool_path),
+        }
+
+    # ==================== WORKER ====================
+    async def _next_batch(self) -> list[dict]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.HISTORY_FLUSH_INTERVAL
+        batch = []
+
+        try:
+            while len(batch) < config.HISTORY_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            await self._spool(batch)
+            raise
+
+        return batch
+
+    async def _run(self):
+        while not self._stopping:
+            batch = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+            if time.monotonic() - self._last_failure > config.HISTORY_RETRY_INTERVAL:
+                await self._replay_spool()
+
+        # final drain while the event loop is still up
+        while not self._queue.empty():
+            await self._flush(self._drain(config.HISTORY_BATCH_SIZE))
+
+    async def _flush(self, batch: list[dict]):
+        # a cancellation (stop() past HISTORY_SHUTDOWN_TIMEOUT) spools the batch in
+        # flight; an insert that still commits in its thread is replayed as a duplicate
+        try:
+            await save_many_now(batch)
+            self.flushed += len(batch)
+            return
+        except asyncio.CancelledError:
+            await self._spool(batch)
+            raise
+        except Exception as e:
+            error = e
+
+        if not _rejected(error):
+            logger.warning("History flush of %d records failed, spooling: %s", len(batch), error)
+            self.failed_flushes += 1
+            self._last_failure = time.monotonic()
+            await self._spool(batch)
+            return
+
+        # insert_weather_history is all or nothing: bisect down to the bad records
+        if len(batch) == 1:
+            logger.error("History record rejected by the database, moved to %s: %s", self.dead_letter_path, error)
+            await asyncio.to_thread(_append_records, self.dead_letter_path, batch)
+            self.dead_lettered += 1
+            return
+
+        middle = len(batch) // 2
+        try:
+            await self._flush(batch[:middle])
+        except asyncio.CancelledError:
+            await self._spool(batch[middle:])
+            raise
+        await self._flush(batch[middle:])
+
+    def _drain(self, limit: int | None = None) -> list[dict]:
+        records = []
+        while not self._queue.empty() and (limit is None or len(records) < limit):
+            records.append(self._queue.get_nowait())
+        return records
+
+    # ==================== SPOOL ====================
+    async def _spool(self, records: list[dict]):
+        if not records:
+            return
+        async with self._spool_lock:
+            await asyncio.to_thread(_append_records, self.spool_path, records)
+        self.spooled += len(records)
+
+    async def _replay_spool(self):
+        """Move spooled records back onto the queue, what does not fit stays spooled"""
+
+        async with self._spool_lock:
+            records = await asyncio.to_thread(_take_records, self.spool_path)
+
+        for i, record in enumerate(records):
+            try:
+                self._queue.put_nowait(record)
+            except asyncio.QueueFull:
+                await self._spool(records[i:])
+                break
+
+    async def _adopt_orphans(self):
+        """Append the spool files of processes that are gone (previous workers) to ours"""
+
+        def adopt() -> int:
+            root, ext = os.path.splitext(self.base_spool_path)
+            directory = os.path.dirname(root) or "."
+            prefix = os.path.basename(root) + "."
+            adopted = 0
+
+            for name in os.listdir(directory):
+                pid = name[len(prefix):-len(ext) or None]
+                if not (name.startswith(prefix) and name.endswith(ext) and pid.isdigit()):
+                    continue
+                if int(pid) == os.getpid() or _pid_alive(int(pid)):
+                    continue
+                records = _take_records(os.path.join(directory, name))
+                _append_records(self.spool_path, records)
+                adopted += len(records)
+            return adopted
+
+        async with self._spool_lock:
+            adopted = await asyncio.to_thread(adopt)
+        if adopted:
+            logger.info("Took over %d spooled history records from stopped workers", adopted)
+
+
+history_writer = HistoryWriter(config.HISTORY_SPOOL_PATH, config.HISTORY_DEAD_LETTER_PATH)
+
+
+async def save(search: dict, results: list[dict]) -> int | None:
+    """
+    Persist one search with its results. Returns the new search id, or None
+    when the record was handed to the write-behind queue.
+    """
+
+    if config.HISTORY_WRITE_BEHIND and history_writer.running:
+        await history_writer.enqueue(search, results)
+        return None
+
+    return await save_now(search, results)
+
+
+async def save_many(records: list[dict]) -> list[int | None]:
+    if config.HISTORY_WRITE_BEHIND and history_writer.running:
+        for record in records:
+            await history_writer.enqueue(record["search"], record["results"])
+        return [None] * len(records)
+
+    return await save_many_now(records)
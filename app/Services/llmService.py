@@ -0,0 +1,305 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+import httpx
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from app import config
+from app.cache import TTLCache, SingleFlight, MISSING
+from app.repository import execute
+from app.supabase import supabase
+from app.Services.geocodingService import geocode_key
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "llama-3.3-70b-versatile"
+
+PROMPTS = {
+    "climate": {
+        "system": "You are a climate expert. Provide short, factual descriptions.",
+        "user": "Describe the climate of {city}, {country} ,{state} in under 3 sentences.",
+    },
+    "locations": {
+        "system": "You are a places expert. Provide short, factual descriptions.",
+        "user": "Describe the places of interest in {city}, {country} ,{state} in under 3 sentences.",
+    },
+}
+
+description_cache = TTLCache(maxsize=config.LLM_CACHE_SIZE, ttl=config.LLM_CACHE_TTL)
+_inflight = SingleFlight()
+
+
+def build_payload(kind: str, city: str, country: str, state: str | None = None) -> dict:
+    prompt = PROMPTS[kind]
+    return {
+        "messages": [
+            {
+                "role": "system",
+                "content": prompt["system"]
+            },
+            {
+                "role": "user",
+                "content": prompt["user"].format(city=city, country=country, state=state if state else '')
+            }
+        ],
+        "model": GROQ_MODEL,
+        "temperature": 0.7,
+        "max_tokens": 150
+    }
+
+
+def cache_key(kind: str, city: str, country: str, state: str | None = None) -> str:
+    """Hash of model + prompt template + normalized location, a prompt change is a new key"""
+
+    raw = json.dumps([GROQ_MODEL, PROMPTS[kind], geocode_key(city, country, state)])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def groq_headers() -> dict:
+    if not GROQ_API_KEY:
+        raise HTTPException(500, "Groq API key not configured")
+
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {GROQ_API_KEY}"
+    }
+
+
+# ==================== PERSISTENT TIER ====================
+async def _load_persisted(key: str) -> tuple[str, float] | None:
+    now = datetime.now(timezone.utc)
+    response = await execute(
+        supabase
+        .table("llm_cache")
+        .select("description, expires_at")
+        .eq("key", key)
+        .gt("expires_at", now.isoformat())
+    )
+    if not response.data:
+        return None
+
+    row = response.data[0]
+    remaining = (datetime.fromisoformat(row["expires_at"]) - now).total_seconds()
+    return row["description"], remaining
+
+
+async def _persist(key: str, kind: str, city: str, country: str, state: str | None, description: str):
+    city_key, state_key, country_key = geocode_key(city, country, state)
+    now = datetime.now(timezone.utc)
+    await execute(supabase.table("llm_cache").upsert({
+        "key": key,
+        "kind": kind,
+        "city": city_key,
+        "state": state_key,
+        "country": country_key,
+        "model": GROQ_MODEL,
+        "description": description,
+        "created_at": now.isoformat(),
+        "expires_at": (now + timedelta(seconds=config.LLM_CACHE_TTL)).isoformat()
+    }))
+
+
+async def get_cached(kind: str, city: str, country: str, state: str | None = None) -> str | None:
+    """Memory tier first, then the llm_cache table. A broken store is a miss, not an error."""
+
+    key = cache_key(kind, city, country, state)
+
+    # memory keys carry the kind so that invalidate() can drop one kind
+    description = description_cache.get((kind, key))
+    if description is not MISSING:
+        return description
+
+    if not config.LLM_CACHE_PERSIST:
+        return None
+
+    try:
+        persisted = await _load_persisted(key)
+    except Exception as e:
+        logger.warning("LLM cache lookup failed: %s", e)
+        return None
+
+    if persisted is None:
+        return None
+
+    description, remaining = persisted
+    description_cache.set((kind, key), description, ttl=remaining)
+    return description
+
+
+async def store(kind: str, city: str, country: str, state: str | None, description: str):
+    key = cache_key(kind, city, country, state)
+    description_cache.set((kind, key), description)
+
+    if not config.LLM_CACHE_PERSIST:
+        return
+
+    try:
+        await _persist(key, kind, city, country, state, description)
+    except Exception as e:
+        logger.warning("LLM cache write failed: %s", e)
+
+
+async def invalidate(
+    city: str | None = None,
+    country: str | None = None,
+    state: str | None = None,
+    kind: str | None = None
+) -> int:
+    """
+    Drop cached descriptions for one location (all kinds unless kind is given),
+    or everything when no city is given. Only this worker's memory tier is cleared.
+    """
+
+    kinds = [kind] if kind else list(PROMPTS)
+
+    if city is None and kind:
+        description_cache.delete_where(lambda key: key[0] == kind)
+        query = supabase.table("llm_cache").delete().eq("kind", kind)
+    elif city is None:
+        description_cache.clear()
+        query = supabase.table("llm_cache").delete().neq("key", "")
+    else:
+        keys = [cache_key(k, city, country, state) for k in kinds]
+        for k, key in zip(kinds, keys):
+            description_cache.delete((k, key))
+        query = supabase.table("llm_cache").delete().in_("key", keys)
+
+    if not config.LLM_CACHE_PERSIST:
+        return 0
+
+    response = await execute(query)
+    return len(response.data)
+
+
+# ==================== GROQ ====================
+async def _complete(client: httpx.AsyncClient, kind: str, city: str, country: str, state: str | None) -> str:
+    try:
+        response = await client.post(
+            GROQ_URL,
+            headers=groq_headers(),
+            json=build_payload(kind, city, country, state)
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Groq unreachable: {str(e)}")
+
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Groq error: {response.text}"
+        )
+
+    data = response.json()
+    return data["choices"][0]["message"]["content"].strip()
+
+
+async def describe(
+    client: httpx.AsyncClient,
+    kind: str,
+    city: str,
+    country: str,
+    state: str | None = None
+) -> tuple[str, bool]:
+    """(description, cached) for a location, calling Groq only on a cache miss"""
+
+    description = await get_cached(kind, city, country, state)
+    if description is not None:
+        return description, True
+
+    async def load():
+        description = await _complete(client, kind, city, country, state)
+        await store(kind, city, country, state, description)
+        return description
+
+    return await _inflight.do(cache_key(kind, city, country, state), load), False
+
+
+# ==================== STREAMING ====================
+class TokenStream:
+    """
+    Async iterator over description tokens. aclose() releases the streamed
+    Groq response, also when iteration never started (client gone before
+    the first byte), so callers must always call it.
+    """
+
+    def __init__(self, tokens: AsyncIterator[str], response: httpx.Response | None = None):
+        self._tokens = tokens
+        self._response = response
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._tokens
+
+    async def aclose(self):
+        await self._tokens.aclose()
+        if self._response is not None:
+            await self._response.aclose()
+
+
+async def _once(description: str) -> AsyncIterator[str]:
+    yield description
+
+
+async def stream_description(
+    client: httpx.AsyncClient,
+    kind: str,
+    city: str,
+    country: str,
+    state: str | None = None
+) -> tuple[TokenStream, bool]:
+    """
+    (token stream, cached) for a location. The Groq request is sent and its
+    status checked before returning, so errors still surface as HTTPException;
+    the full text is cached once the stream ends.
+    """
+
+    description = await get_cached(kind, city, country, state)
+    if description is not None:
+        return TokenStream(_once(description)), True
+
+    payload = build_payload(kind, city, country, state)
+    payload["stream"] = True
+
+    request = client.build_request("POST", GROQ_URL, headers=groq_headers(), json=payload)
+    try:
+        response = await client.send(request, stream=True)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Groq unreachable: {str(e)}")
+
+    if response.status_code != 200:
+        await response.aread()
+        await response.aclose()
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Groq error: {response.text}"
+        )
+
+    async def tokens():
+        parts = []
+        try:
+            # OpenAI style SSE: "data: {chunk}" lines, closed by "data: [DONE]"
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+
+                delta = json.loads(data)["choices"][0]["delta"].get("content")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            await response.aclose()
+
+        # only reached when the stream completed, a client disconnect never fills the cache
+        description = "".join(parts).strip()
+        if description:
+            await store(kind, city, country, state, description)
+
+    return TokenStream(tokens(), response), False
@@ -0,0 +1,247 @@
+import time
+import random
+import asyncio
+import logging
+from array import array
+from app import config
+from app.repository import execute
+from app.supabase import supabase
+from app.spatial import KDTree, haversine_km, scan_nearest, np
+
+logger = logging.getLogger(__name__)
+
+# weather_searches rows asked per query while (re)loading the index, PostgREST
+# may return fewer (db-max-rows, 1000 by default)
+INDEX_PAGE_SIZE = 1000
+
+
+async def _locations_after(after_id: int, limit: int = INDEX_PAGE_SIZE) -> list[dict]:
+    response = await execute(
+        supabase
+        .table("weather_searches")
+        .select("id, lat, lon")
+        .gt("id", after_id)
+        .order("id")
+        .limit(limit)
+    )
+    return response.data
+
+
+class TooManyRows(Exception):
+    pass
+
+
+async def _read_locations(after_id: int, ids: array, lat: array, lon: array, max_rows: int) -> int:
+    """
+    Append the located searches with id > after_id to the arrays, paging
+    until a page comes back empty. Returns the last id read; raises
+    TooManyRows once the arrays hold more than max_rows.
+    """
+
+    while True:
+        rows = await _locations_after(after_id)
+        if not rows:
+            return after_id
+
+        for row in rows:
+            if row["lat"] is not None and row["lon"] is not None:
+                ids.append(row["id"])
+                lat.append(row["lat"])
+                lon.append(row["lon"])
+        after_id = rows[-1]["id"]
+
+        if len(ids) > max_rows:
+            raise TooManyRows()
+
+
+class LocationIndex:
+    """
+    In-process KD-tree over the (id, lat, lon) of every search. The refresh
+    loop reads the searches saved since then into a delta buffer that
+    queries scan along with the tree; the tree is rebuilt once the buffer
+    holds NEARBY_INDEX_DELTA_MAX rows, and from scratch every
+    NEARBY_INDEX_RELOAD. A search shows up at most NEARBY_INDEX_REFRESH
+    seconds after it was saved; a deleted or moved one is only dropped at
+    the next full reload, callers re-check the rows they fetch. Each worker
+    reloads at a random point of [0.75, 1.25] * NEARBY_INDEX_RELOAD so the
+    reloads of a deployment do not hit the database together.
+    """
+
+    def __init__(self):
+        self.tree: KDTree | None = None
+        self.max_id = 0
+        # rows in the tree
+        self._ids = array("q")
+        self._lat = array("d")
+        self._lon = array("d")
+        # rows read since the tree was built, replaced (never mutated) by refresh()
+        self._delta: tuple[array, array, array] = (array("q"), array("d"), array("d"))
+        self._loaded_at = 0.0
+        self._reload_after = 0.0
+        self._task: asyncio.Task | None = None
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.failed_refreshes = 0
+        self.too_large = False
+
+    @property
+    def enabled(self) -> bool:
+        return config.NEARBY_INDEX_ENABLED and np is not None
+
+    async def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.failed_refreshes += 1
+                logger.warning("Nearby index refresh failed: %s", e)
+            await asyncio.sleep(config.NEARBY_INDEX_REFRESH)
+
+    def _too_large(self):
+        if not self.too_large:
+            logger.warning("History has more than %d located searches, nearby queries stay in the database", config.NEARBY_INDEX_MAX_ROWS)
+        self.too_large = True
+        self.tree = None
+        self._ids, self._lat, self._lon = array("q"), array("d"), array("d")
+        self._delta = (array("q"), array("d"), array("d"))
+
+    async def _build(self, ids: array, lat: array, lon: array, max_id: int):
+        tree = await asyncio.to_thread(
+            KDTree,
+            np.array(ids, dtype=np.int64),
+            np.array(lat, dtype=np.float64),
+            np.array(lon, dtype=np.float64),
+        )
+        self._ids, self._lat, self._lon = ids, lat, lon
+        self._delta = (array("q"), array("d"), array("d"))
+        self.tree = tree
+        self.max_id = max_id
+        self.too_large = False
+        self.rebuilds += 1
+
+    async def refresh(self):
+        """Read the searches saved since the last refresh; rebuild the tree on reload or when the delta is full"""
+
+        if self.tree is None or time.monotonic() - self._loaded_at > self._reload_after:
+            ids, lat, lon = array("q"), array("d"), array("d")
+            try:
+                max_id = await _read_locations(0, ids, lat, lon, config.NEARBY_INDEX_MAX_ROWS)
+            except TooManyRows:
+                self._too_large()
+                return
+            await self._build(ids, lat, lon, max_id)
+            self._loaded_at = time.monotonic()
+            self._reload_after = config.NEARBY_INDEX_RELOAD * random.uniform(0.75, 1.25)
+            self.refreshes += 1
+            return
+
+        delta_ids, delta_lat, delta_lon = (array(part.typecode, part) for part in self._delta)
+        try:
+            max_id = await _read_locations(
+                self.max_id, delta_ids, delta_lat, delta_lon, config.NEARBY_INDEX_MAX_ROWS - len(self._ids)
+            )
+        except TooManyRows:
+            self._too_large()
+            return
+        self.refreshes += 1
+        if max_id == self.max_id:
+            return
+
+        if len(delta_ids) > config.NEARBY_INDEX_DELTA_MAX:
+            await self._build(self._ids + delta_ids, self._lat + delta_lat, self._lon + delta_lon, max_id)
+        else:
+            self._delta = (delta_ids, delta_lat, delta_lon)
+            self.max_id = max_id
+
+    def nearest(self, lat: float, lon: float, k: int, radius_km: float | None = None) -> list[tuple[float, int]] | None:
+        """Up to k (distance_km, search id), closest first; None when the index is not available"""
+
+        tree, (delta_ids, delta_lat, delta_lon) = self.tree, self._delta
+        if tree is None:
+            return None
+
+        hits = tree.nearest(lat, lon, k, radius_km)
+        if delta_ids:
+            hits += scan_nearest(delta_ids, delta_lat, delta_lon, lat, lon, k, radius_km)
+            hits.sort()
+        return hits[:k]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "ready": self.tree is not None,
+            "size": len(self.tree) if self.tree is not None else 0,
+            "delta": len(self._delta[0]),
+            "max_id": self.max_id,
+            "too_large": self.too_large,
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+            "failed_refreshes": self.failed_refreshes,
+        }
+
+
+location_index = LocationIndex()
+
+
+async def _nearby_database(lat: float, lon: float, radius_km: float | None, limit: int) -> list[dict]:
+    response = await execute(supabase.rpc("nearby_weather_searches", {
+        "center_lat": lat,
+        "center_lon": lon,
+        "radius_km": radius_km,
+        "k": limit
+    }))
+    return response.data
+
+
+async def nearby(lat: float, lon: float, radius_km: float | None, limit: int, columns: list[str]) -> tuple[list[dict], str]:
+    """
+    (rows, source): weather_searches rows (`columns` + distance_km) closest
+    to the point first, within radius_km when given. source is "memory"
+    (KD-tree) or "database" (nearby_weather_searches function).
+
+    The tree can hold deleted or moved searches, so it is asked for
+    NEARBY_OVERFETCH * limit candidates that are re-checked against the
+    fetched rows. When the re-check leaves fewer than limit rows while the
+    tree had more candidates, the query goes to the database instead.
+    """
+
+    fetch = limit * config.NEARBY_OVERFETCH
+    hits = location_index.nearest(lat, lon, fetch, radius_km)
+
+    if hits is None:
+        return await _nearby_database(lat, lon, radius_km, limit), "database"
+
+    if not hits:
+        return [], "memory"
+
+    columns = list(dict.fromkeys([*columns, "id", "lat", "lon"]))
+    response = await execute(
+        supabase
+        .table("weather_searches")
+        .select(",".join(columns))
+        .in_("id", [search_id for _, search_id in hits])
+    )
+
+    rows = []
+    for row in response.data:
+        # the tree may predate an update of the coordinates
+        if row["lat"] is None or row["lon"] is None:
+            continue
+        distance = haversine_km(lat, lon, row["lat"], row["lon"])
+        if radius_km is None or distance <= radius_km:
+            rows.append({**row, "distance_km": distance})
+
+    if len(rows) < limit and len(hits) == fetch:
+        return await _nearby_database(lat, lon, radius_km, limit), "database"
+
+    rows.sort(key=lambda row: (row["distance_km"], row["id"]))
+    return rows[:limit], "memory"
@@ -0,0 +1,409 @@
+import os
+import time
+import asyncio
+import logging
+import weakref
+from collections import Counter
+from datetime import date
+import httpx
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from app import config, hedging, metrics, ratelimit
+from app.cache import TTLCache, SingleFlight, MicroBatcher, MISSING
+from app.Services import geocodingService, historyService
+
+# NumPy is optional, daily aggregation falls back to plain Python without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+
+current_cache = TTLCache(
+    maxsize=config.WEATHER_CACHE_SIZE,
+    ttl=config.CURRENT_WEATHER_TTL,
+    stale_ttl=config.WEATHER_STALE_TTL,
+    fallback_ttl=config.WEATHER_FALLBACK_TTL,
+)
+forecast_cache = TTLCache(
+    maxsize=config.WEATHER_CACHE_SIZE,
+    ttl=config.FORECAST_TTL,
+    stale_ttl=config.WEATHER_STALE_TTL,
+    fallback_ttl=config.WEATHER_FALLBACK_TTL,
+)
+_inflight = SingleFlight()
+_background: set[asyncio.Task] = set()
+
+
+def grid_key(lat: float, lon: float) -> tuple[int, int]:
+    """Snap coordinates to the cache grid, nearby points share one entry"""
+    step = config.WEATHER_GRID_STEP
+    return (round(lat / step), round(lon / step))
+
+
+async def _get_json(client: httpx.AsyncClient, url: str) -> dict:
+    # "openweather:weather", "openweather:forecast"
+    call = "openweather:" + url.split("?", 1)[0].rsplit("/", 1)[-1]
+    response = await hedging.hedged(call, lambda: client.get(url))
+
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail="Weather API error"
+        )
+
+    return response.json()
+
+
+async def _refresh(key, load):
+    try:
+        with ratelimit.priority("background"):
+            await _inflight.do(key, load)
+    except Exception as e:
+        logger.warning("Background weather refresh failed for %s: %s", key, e)
+
+
+def _upstream_down(e: Exception) -> bool:
+    """Timeouts, connection errors, 5xx, open circuit or exhausted rate limit"""
+    if isinstance(e, HTTPException):
+        return e.status_code >= 500
+    return isinstance(e, httpx.TransportError)
+
+
+async def _cached(cache: TTLCache, key, fetch) -> dict:
+    """
+    Fresh hit, stale hit + background revalidation, or coalesced upstream
+    fetch. When OpenWeather is down, the last value seen (up to
+    WEATHER_FALLBACK_TTL old) is served instead of the error.
+    Values past their TTL come back as a copy with "stale": True.
+    """
+
+    async def load():
+        value = await fetch()
+        cache.set(key, value)
+        return value
+
+    entry = cache.get_stale(key)
+    if entry is not MISSING:
+        value, stale = entry
+        if not stale:
+            return value
+        task = asyncio.ensure_future(_refresh(key, load))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+        return {**value, "stale": True}
+
+    try:
+        return await _inflight.do(key, load)
+    except Exception as e:
+        if not _upstream_down(e):
+            raise
+        value = cache.get_fallback(key)
+        if value is MISSING:
+            raise
+        logger.warning("OpenWeather unavailable, serving stale %s: %s", key, e)
+        return {**value, "stale": True}
+
+
+async def current_weather(client: httpx.AsyncClient, lat: float, lon: float) -> dict:
+    """OpenWeather current weather for a point, cached on the coordinate grid"""
+
+    return await _cached(current_cache, ("coords", *grid_key(lat, lon)), lambda: _current_at(client, lat, lon))
+
+
+async def current_weather_by_zip(client: httpx.AsyncClient, zip_code: str, country: str) -> dict:
+    """OpenWeather data/2.5/weather for a zip code, cached with the current weather TTL"""
+
+    url = (
+        "https://api.openweathermap.org/data/2.5/weather"
+        f"?zip={zip_code},{country}&appid={OPENWEATHER_API_KEY}&units=metric"
+    )
+
+    key = ("zip", zip_code.strip().lower(), country.strip().lower())
+    return await _cached(current_cache, key, lambda: _get_json(client, url))
+
+
+async def forecast(client: httpx.AsyncClient, lat: float, lon: float) -> dict:
+    """OpenWeather data/2.5/forecast (3-hourly, 5 days) for a point, cached on the coordinate grid"""
+
+    url = (
+        "https://api.openweathermap.org/data/2.5/forecast"
+        f"?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
+    )
+
+    return await _cached(forecast_cache, ("forecast", *grid_key(lat, lon)), lambda: _get_json(client, url))
+
+
+# ==================== GROUP CALLS ====================
+CURRENT_FETCHES = metrics.Counter(
+    "weather_current_fetch_total",
+    "Current weather fetched from OpenWeather for a point, by call (group or single)",
+    ("via",),
+)
+GROUP_SIZE = metrics.Histogram(
+    "openweather_group_size",
+    "City ids per data/2.5/group call",
+    buckets=(1, 2, 5, 10, 15, 20),
+)
+
+# grid cell -> OpenWeather city id, learned from data/2.5/weather answers
+city_ids = TTLCache(maxsize=config.WEATHER_CACHE_SIZE, ttl=config.CITY_ID_TTL)
+_batchers: "weakref.WeakKeyDictionary[httpx.AsyncClient, MicroBatcher]" = weakref.WeakKeyDictionary()
+# monotonic time until which the group endpoint is not tried (it answered 401/403/404)
+_group_disabled_until = 0.0
+
+
+async def _group(client: httpx.AsyncClient, ids: list[int]) -> dict[int, dict]:
+    """data/2.5/group for up to 20 city ids: {city id: same payload as data/2.5/weather}"""
+
+    global _group_disabled_until
+
+    url = (
+        "https://api.openweathermap.org/data/2.5/group"
+        f"?id={','.join(map(str, ids))}&appid={OPENWEATHER_API_KEY}&units=metric"
+    )
+    GROUP_SIZE.observe(len(ids))
+    response = await hedging.hedged("openweather:group", lambda: client.get(url))
+
+    if response.status_code in (401, 403, 404):
+        # not available with this key: every waiting caller falls back to its own call,
+        # and the endpoint is tried again after WEATHER_GROUP_RETRY
+        _group_disabled_until = time.monotonic() + config.WEATHER_GROUP_RETRY
+        logger.warning(
+            "OpenWeather group endpoint unavailable (%d), current weather fetched one point at a time for %.0fs",
+            response.status_code, config.WEATHER_GROUP_RETRY
+        )
+        return {}
+
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail="Weather API error"
+        )
+
+    return {item["id"]: item for item in response.json().get("list", [])}
+
+
+def _group_batcher(client: httpx.AsyncClient) -> MicroBatcher:
+    batcher = _batchers.get(client)
+    if batcher is None:
+        # the batcher must not keep its client alive
+        ref = weakref.ref(client)
+        batcher = _batchers[client] = MicroBatcher(
+            lambda ids: _group(ref(), ids),
+            window=config.WEATHER_GROUP_WINDOW,
+            max_size=config.WEATHER_GROUP_MAX,
+        )
+    return batcher
+
+
+async def _current_at(client: httpx.AsyncClient, lat: float, lon: float) -> dict:
+    """
+    One grid cell's current weather: through a group call shared with the
+    other misses of the next few ms when the cell's city id is known, else
+    (or when the group answer lacks it) a data/2.5/weather call.
+    """
+
+    cell = grid_key(lat, lon)
+
+    if config.WEATHER_GROUP_ENABLED and time.monotonic() >= _group_disabled_until:
+        city_id = city_ids.get(cell)
+        if city_id is not MISSING:
+            data = await _group_batcher(client).submit(city_id)
+            if data is not MISSING:
+                CURRENT_FETCHES.inc("group")
+                return data
+
+    url = (
+        "https://api.openweathermap.org/data/2.5/weather"
+        f"?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
+    )
+    data = await _get_json(client, url)
+    CURRENT_FETCHES.inc("single")
+
+    if data.get("id"):
+        city_ids.set(cell, data["id"])
+    return data
+
+
+# ==================== CITY LOOKUPS ====================
+SPECULATION = metrics.Counter(
+    "weather_speculative_fetch_total",
+    "City lookups that missed the geocode cache, by speculative weather fetch outcome",
+    ("outcome",),
+)
+
+
+async def _location_hint(city: str, country: str, state: str | None) -> dict | None:
+    """Coordinates the place had last time: expired geocode, else latest saved search"""
+
+    hint = geocodingService.known_location(city, country, state)
+    if hint:
+        return hint
+    try:
+        return await historyService.last_location(city, country, state)
+    except Exception as e:
+        logger.debug("No location hint for %s, %s: %s", city, country, e)
+        return None
+
+
+def _consume(task: asyncio.Task):
+    # dropped speculative work must not log "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+async def for_city(client: httpx.AsyncClient, city: str, country: str, state: str | None, fetch) -> tuple[dict | None, dict | None]:
+    """
+    Geocode a city and run fetch(client, lat, lon) (current_weather, forecast)
+    for it; (None, None) when the city is unknown. When neither the
+    gazetteer nor the geocode cache knows the city, the fetch starts from
+    the place's last known coordinates while geocoding runs, and is kept
+    when the confirmed coordinates fall in the same grid cell (same cache
+    entry), otherwise dropped and redone.
+    """
+
+    cached = geocodingService.peek(city, country, state)
+    if cached is not MISSING:
+        return cached, (await fetch(client, cached["lat"], cached["lon"]) if cached else None)
+
+    geo_task = asyncio.ensure_future(geocodingService.refresh(client, city, country, state))
+    hint_task = None
+    speculative = None
+    try:
+        if config.SPECULATIVE_FETCH_ENABLED:
+            hint_task = asyncio.ensure_future(_location_hint(city, country, state))
+            await asyncio.wait({geo_task, hint_task}, return_when=asyncio.FIRST_COMPLETED)
+
+            # not worth it once geocoding already answered
+            hint = hint_task.result() if hint_task.done() else None
+            if hint and not geo_task.done():
+                speculative = asyncio.ensure_future(fetch(client, hint["lat"], hint["lon"]))
+                speculative.add_done_callback(_consume)
+
+        geo = await geo_task
+
+        if speculative is not None:
+            if geo and grid_key(geo["lat"], geo["lon"]) == grid_key(hint["lat"], hint["lon"]):
+                SPECULATION.inc("hit")
+                return geo, await speculative
+            SPECULATION.inc("miss")
+        elif config.SPECULATIVE_FETCH_ENABLED:
+            SPECULATION.inc("no_hint")
+
+        return geo, (await fetch(client, geo["lat"], geo["lon"]) if geo else None)
+    finally:
+        for task in (geo_task, hint_task, speculative):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+# ==================== DAILY AGGREGATION ====================
+def _daily_numpy(days: list[date], items: list[dict]) -> list[dict]:
+    ordinals = np.fromiter((d.toordinal() for d in days), dtype=np.int64, count=len(days))
+    order = np.argsort(ordinals, kind="stable")
+    ordinals = ordinals[order]
+
+    def column(get, dtype=np.float64):
+        return np.fromiter((get(items[i]) for i in order), dtype=dtype, count=len(order))
+
+    temp = column(lambda item: item["main"]["temp"])
+    feels_like = column(lambda item: item["main"]["feels_like"])
+    humidity = column(lambda item: item["main"]["humidity"])
+    wind = column(lambda item: item["wind"]["speed"])
+
+    # one reduction per column over the contiguous runs of each day
+    keys, starts, counts = np.unique(ordinals, return_index=True, return_counts=True)
+    temp_min = np.minimum.reduceat(temp, starts)
+    temp_max = np.maximum.reduceat(temp, starts)
+    temp_mean = np.add.reduceat(temp, starts) / counts
+    feels_like_mean = np.add.reduceat(feels_like, starts) / counts
+    humidity_min = np.minimum.reduceat(humidity, starts)
+    humidity_max = np.maximum.reduceat(humidity, starts)
+    humidity_mean = np.add.reduceat(humidity, starts) / counts
+    wind_mean = np.add.reduceat(wind, starts) / counts
+    wind_max = np.maximum.reduceat(wind, starts)
+
+    descriptions = [items[i]["weather"][0]["description"] for i in order]
+
+    return [
+        {
+            "date": date.fromordinal(int(keys[g])).isoformat(),
+            "samples": int(counts[g]),
+            "temp_min": round(float(temp_min[g]), 2),
+            "temp_max": round(float(temp_max[g]), 2),
+            "temp_mean": round(float(temp_mean[g]), 2),
+            "feels_like_mean": round(float(feels_like_mean[g]), 2),
+            "humidity_min": int(humidity_min[g]),
+            "humidity_max": int(humidity_max[g]),
+            "humidity_mean": round(float(humidity_mean[g]), 1),
+            "wind_speed_mean": round(float(wind_mean[g]), 2),
+            "wind_speed_max": round(float(wind_max[g]), 2),
+            "description": Counter(descriptions[starts[g]:starts[g] + counts[g]]).most_common(1)[0][0],
+        }
+        for g in range(len(keys))
+    ]
+
+
+def _daily_python(days: list[date], items: list[dict]) -> list[dict]:
+    groups: dict[date, list[dict]] = {}
+    for day, item in zip(days, items):
+        groups.setdefault(day, []).append(item)
+
+    summary = []
+    for day in sorted(groups):
+        group = groups[day]
+        temp = [item["main"]["temp"] for item in group]
+        humidity = [item["main"]["humidity"] for item in group]
+        wind = [item["wind"]["speed"] for item in group]
+        summary.append({
+            "date": day.isoformat(),
+            "samples": len(group),
+            "temp_min": round(min(temp), 2),
+            "temp_max": round(max(temp), 2),
+            "temp_mean": round(sum(temp) / len(group), 2),
+            "feels_like_mean": round(sum(item["main"]["feels_like"] for item in group) / len(group), 2),
+            "humidity_min": int(min(humidity)),
+            "humidity_max": int(max(humidity)),
+            "humidity_mean": round(sum(humidity) / len(group), 1),
+            "wind_speed_mean": round(sum(wind) / len(group), 2),
+            "wind_speed_max": round(max(wind), 2),
+            "description": Counter(item["weather"][0]["description"] for item in group).most_common(1)[0][0],
+        })
+    return summary
+
+
+def aggregate_daily(days: list[date], items: list[dict]) -> list[dict]:
+    """
+    Per day min/max/mean of temperature and humidity, mean feels-like, mean
+    and max wind and the most frequent description, from OpenWeather forecast
+    items and the day each one belongs to. Days come out in order.
+    """
+
+    if not items:
+        return []
+    if np is None:
+        return _daily_python(days, items)
+    return _daily_numpy(days, items)
+
+
+def daily_history_row(day: dict) -> dict:
+    """weather_results row for one aggregated day (forecast_datetime is the day, values are daily means)"""
+
+    return {
+        "forecast_datetime": day["date"],
+        "temp": day["temp_mean"],
+        "feels_like": day["feels_like_mean"],
+        "humidity": round(day["humidity_mean"]),
+        "description": day["description"],
+        "wind_speed": day["wind_speed_mean"],
+        "temp_min": day["temp_min"],
+        "temp_max": day["temp_max"],
+        "humidity_min": day["humidity_min"],
+        "humidity_max": day["humidity_max"],
+    }
@@ -0,0 +1,187 @@
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+import httpx
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from app import config, metrics
+from app.cache import TTLCache, SingleFlight, MISSING
+from app.repository import execute
+from app.supabase import supabase
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+YOUTUBE_SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
+
+# search.list answers at most 50 items per call
+MAX_RESULTS = 50
+
+# topic -> query sent to YouTube, to only get videos about it
+TOPICS = {
+    "locations": "{query} travel tourism places to visit",
+    "weather": "{query} weather forecast",
+}
+
+# cache key -> {"videos": [...], "fetched": maxResults asked}; fewer videos than fetched means there are no more
+video_cache = TTLCache(maxsize=config.YOUTUBE_CACHE_SIZE, ttl=config.YOUTUBE_CACHE_TTL)
+_inflight = SingleFlight()
+
+QUOTA_UNITS = metrics.Counter(
+    "youtube_quota_units_total",
+    "YouTube Data API quota spent (search.list costs 100 units)",
+    ("topic",),
+)
+
+SEARCH_COST = 100
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).lower()
+
+
+def cache_key(topic: str, query: str) -> str:
+    return f"{topic}:{normalize_query(query)}"
+
+
+def _covers(entry: dict, max_results: int) -> bool:
+    videos = entry["videos"]
+    return len(videos) >= max_results or len(videos) < entry["fetched"]
+
+
+# ==================== PERSISTENT TIER ====================
+async def _load_persisted(key: str) -> tuple[dict, float] | None:
+    now = datetime.now(timezone.utc)
+    response = await execute(
+        supabase
+        .table("youtube_cache")
+        .select("videos, fetched, expires_at")
+        .eq("key", key)
+        .gt("expires_at", now.isoformat())
+    )
+    if not response.data:
+        return None
+
+    row = response.data[0]
+    remaining = (datetime.fromisoformat(row["expires_at"]) - now).total_seconds()
+    return {"videos": row["videos"], "fetched": row["fetched"]}, remaining
+
+
+async def _persist(key: str, topic: str, query: str, entry: dict):
+    now = datetime.now(timezone.utc)
+    await execute(supabase.table("youtube_cache").upsert({
+        "key": key,
+        "topic": topic,
+        "query": normalize_query(query),
+        "videos": entry["videos"],
+        "fetched": entry["fetched"],
+        "created_at": now.isoformat(),
+        "expires_at": (now + timedelta(seconds=config.YOUTUBE_CACHE_TTL)).isoformat()
+    }))
+
+
+async def get_cached(topic: str, query: str) -> dict | None:
+    """Memory tier first, then the youtube_cache table. A broken store is a miss, not an error."""
+
+    key = cache_key(topic, query)
+
+    entry = video_cache.get(key)
+    if entry is not MISSING:
+        return entry
+
+    if not config.YOUTUBE_CACHE_PERSIST:
+        return None
+
+    try:
+        persisted = await _load_persisted(key)
+    except Exception as e:
+        logger.warning("YouTube cache lookup failed: %s", e)
+        return None
+
+    if persisted is None:
+        return None
+
+    entry, remaining = persisted
+    video_cache.set(key, entry, ttl=remaining)
+    return entry
+
+
+async def store(topic: str, query: str, entry: dict):
+    key = cache_key(topic, query)
+    video_cache.set(key, entry)
+
+    if not config.YOUTUBE_CACHE_PERSIST:
+        return
+
+    try:
+        await _persist(key, topic, query, entry)
+    except Exception as e:
+        logger.warning("YouTube cache write failed: %s", e)
+
+
+# ==================== YOUTUBE ====================
+async def _fetch(client: httpx.AsyncClient, topic: str, query: str, count: int) -> dict:
+    try:
+        response = await client.get(
+            YOUTUBE_SEARCH_URL,
+            params={
+                "part": "snippet",
+                "type": "video",
+                "q": TOPICS[topic].format(query=normalize_query(query)),
+                "maxResults": count,
+                "key": YOUTUBE_API_KEY,
+            }
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"YouTube API unreachable: {str(e)}")
+
+    QUOTA_UNITS.inc(topic, amount=SEARCH_COST)
+
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail="YouTube API error"
+        )
+
+    videos = []
+    for item in response.json().get("items", []):
+        video_id = item["id"].get("videoId")
+        if not video_id:
+            continue
+        snippet = item["snippet"]
+        videos.append({
+            "title": snippet["title"],
+            "description": snippet["description"],
+            "url": f"https://www.youtube.com/watch?v={video_id}"
+        })
+
+    return {"videos": videos, "fetched": count}
+
+
+async def search(
+    client: httpx.AsyncClient,
+    topic: str,
+    query: str,
+    max_results: int
+) -> tuple[list[dict], bool]:
+    """
+    (videos, cached) for a query. One upstream search fetches
+    YOUTUBE_FETCH_SIZE videos (more if max_results asks for it) and every
+    request for the same normalized query is served a slice of them.
+    """
+
+    entry = await get_cached(topic, query)
+    if entry is not None and _covers(entry, max_results):
+        return entry["videos"][:max_results], True
+
+    count = min(MAX_RESULTS, max(max_results, config.YOUTUBE_FETCH_SIZE))
+
+    async def load():
+        entry = await _fetch(client, topic, query, count)
+        await store(topic, query, entry)
+        return entry
+
+    entry = await _inflight.do((cache_key(topic, query), count), load)
+    return entry["videos"][:max_results], False
@@ -0,0 +1,212 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    In-process LRU cache where every entry also expires after a TTL.
+    With stale_ttl > 0 expired entries are kept that much longer so callers
+    can serve them while revalidating (see get_stale), and with fallback_ttl
+    they stay available as a last resort when the source is down (see get_fallback).
+    """
+
+    def __init__(self, maxsize: int, ttl: float, stale_ttl: float = 0.0, fallback_ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.fallback_ttl = fallback_ttl
+        self._retention = max(stale_ttl, fallback_ttl)
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.fallback_hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: Hashable, grace: float | None = None) -> tuple[float, Any] | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if entry[0] + self._retention <= now:
+            del self._data[key]
+            return None
+        if entry[0] + (self.stale_ttl if grace is None else grace) <= now:
+            return None
+
+        self._data.move_to_end(key)
+        return entry
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        entry = self._lookup(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return entry[1]
+
+    def get_stale(self, key: Hashable) -> tuple[Any, bool] | Any:
+        """(value, is_stale) for fresh or stale-but-retained entries, MISSING otherwise"""
+
+        entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+
+        if entry[0] <= time.monotonic():
+            self.stale_hits += 1
+            return entry[1], True
+
+        self.hits += 1
+        return entry[1], False
+
+    def get_fallback(self, key: Hashable) -> Any:
+        """Value expired less than fallback_ttl ago, for when it cannot be refreshed; MISSING otherwise"""
+
+        entry = self._lookup(key, grace=self.fallback_ttl)
+        if entry is None:
+            return MISSING
+
+        self.fallback_hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]):
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "fallback_hits": self.fallback_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single upstream call"""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+
+        # shield: a cancelled caller must not cancel the call the others wait on
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved when every caller went away
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+class MicroBatcher:
+    """
+    Collect the keys submitted within `window` seconds (up to `max_size`
+    distinct keys) and resolve them with a single run(keys) call returning
+    {key: value}. Callers submitting the same key share its value, keys
+    missing from the result resolve to MISSING, and an exception from run()
+    is raised to every caller of the batch.
+    """
+
+    def __init__(self, run: Callable[[list], Awaitable[dict]], window: float, max_size: int):
+        self._run = run
+        self.window = window
+        self.max_size = max_size
+        self._pending: dict[Hashable, list[asyncio.Future]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.keys = 0
+
+    async def submit(self, key: Hashable) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        pending, self._pending = self._pending, {}
+        if pending:
+            task = asyncio.ensure_future(self._resolve(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, pending: dict[Hashable, list[asyncio.Future]]):
+        self.batches += 1
+        self.keys += len(pending)
+
+        try:
+            results = await self._run(list(pending))
+        except asyncio.CancelledError:
+            for futures in pending.values():
+                for future in futures:
+                    future.cancel()
+            raise
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for key, futures in pending.items():
+            value = results.get(key, MISSING)
+            for future in futures:
+                # callers that went away cancelled their future
+                if not future.done():
+                    future.set_result(value)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "keys": self.keys,
+            "keys_per_batch": self.keys / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,167 @@
+import time
+from collections import deque
+import httpx
+from fastapi import HTTPException
+from app import config, metrics
+
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(HTTPException):
+    """The provider circuit is open, the call was not attempted"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"{provider} is unavailable, retry later",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+
+REJECTED = metrics.Counter(
+    "circuit_rejected_total",
+    "Upstream calls failed fast because the provider circuit was open",
+    ("provider",),
+)
+TRANSITIONS = metrics.Counter(
+    "circuit_state_changes_total",
+    "Provider circuit state changes",
+    ("provider", "state"),
+)
+
+
+class CircuitBreaker:
+    """
+    Failure-rate breaker over the last `window` calls of one provider. A call
+    fails when it raises a transport error (timeout, connection), returns a
+    5xx, or takes longer than `slow_call_seconds`. Open rejects everything
+    for `open_seconds`, then half-open lets `half_open_probes` calls through:
+    one success closes the circuit, one failure opens it again.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        window: int,
+        min_calls: int,
+        failure_rate: float,
+        slow_call_seconds: float,
+        open_seconds: float,
+        half_open_probes: int,
+    ):
+        self.provider = provider
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._outcomes: deque[bool] = deque(maxlen=window)  # True = failed
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str):
+        self._state = state
+        self._probes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        else:
+            self._outcomes.clear()
+        TRANSITIONS.inc(self.provider, state)
+
+    def before_call(self):
+        """Raise CircuitOpen when the call must not be attempted"""
+
+        state = self.state
+        if state == CLOSED:
+            return
+
+        if state == HALF_OPEN and self._probes < self.half_open_probes:
+            self._probes += 1
+            return
+
+        self.rejected += 1
+        REJECTED.inc(self.provider)
+        retry_after = self.open_seconds - (time.monotonic() - self._opened_at) if state == OPEN else 1
+        raise CircuitOpen(self.provider, retry_after)
+
+    def record(self, failed: bool):
+        if self._state == HALF_OPEN:
+            self._transition(OPEN if failed else CLOSED)
+            return
+
+        if self._state == OPEN:
+            return  # late answer of a call started before the circuit opened
+
+        self._outcomes.append(failed)
+        calls = len(self._outcomes)
+        if calls >= self.min_calls and sum(self._outcomes) / calls >= self.failure_rate:
+            self._transition(OPEN)
+
+    def release(self):
+        """A half-open probe ended without an outcome (cancelled caller)"""
+        if self._state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def stats(self) -> dict:
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "calls": calls,
+            "failure_rate": sum(self._outcomes) / calls if calls else 0.0,
+            "rejected": self.rejected,
+        }
+
+
+breakers = {
+    provider: CircuitBreaker(
+        provider,
+        window=config.CIRCUIT_WINDOW,
+        min_calls=config.CIRCUIT_MIN_CALLS,
+        failure_rate=config.CIRCUIT_FAILURE_RATE,
+        slow_call_seconds=config.SLOW_CALL_SECONDS[provider],
+        open_seconds=config.CIRCUIT_OPEN_SECONDS,
+        half_open_probes=config.CIRCUIT_HALF_OPEN_PROBES,
+    )
+    for provider in config.PROVIDER_POOLS
+}
+
+
+class CircuitBreakerTransport(httpx.AsyncBaseTransport):
+    """Wraps a provider transport: fails fast while the circuit is open, records every call outcome"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, breaker: CircuitBreaker):
+        self.transport = transport
+        self.breaker = breaker
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.breaker.before_call()
+
+        started = time.perf_counter()
+        recorded = False
+        try:
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError:
+                self.breaker.record(failed=True)
+                recorded = True
+                raise
+
+            slow = time.perf_counter() - started > self.breaker.slow_call_seconds
+            self.breaker.record(failed=response.status_code >= 500 or slow)
+            recorded = True
+            return response
+        finally:
+            if not recorded:
+                self.breaker.release()
+
+    async def aclose(self):
+        await self.transport.aclose()
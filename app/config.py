@@ -0,0 +1,227 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# ==================== OUTBOUND HTTP ====================
+HTTP_TIMEOUT = _env_float("HTTP_TIMEOUT", 30)
+HTTP_CONNECT_TIMEOUT = _env_float("HTTP_CONNECT_TIMEOUT", 5)
+HTTP_POOL_TIMEOUT = _env_float("HTTP_POOL_TIMEOUT", 5)
+HTTP_MAX_CONNECTIONS = _env_int("HTTP_MAX_CONNECTIONS", 100)
+HTTP_MAX_KEEPALIVE = _env_int("HTTP_MAX_KEEPALIVE", 20)
+HTTP_KEEPALIVE_EXPIRY = _env_float("HTTP_KEEPALIVE_EXPIRY", 30)
+HTTP2_ENABLED = _env_bool("HTTP2_ENABLED", True)
+
+
+def _provider_pool(prefix: str, timeout: float = HTTP_TIMEOUT) -> dict:
+    """Pool settings for one provider, each overridable with a PREFIX_ env var."""
+    return {
+        "timeout": _env_float(f"{prefix}_TIMEOUT", timeout),
+        "max_connections": _env_int(f"{prefix}_MAX_CONNECTIONS", HTTP_MAX_CONNECTIONS),
+        "max_keepalive": _env_int(f"{prefix}_MAX_KEEPALIVE", HTTP_MAX_KEEPALIVE),
+    }
+
+
+# OpenWeather and YouTube answer in well under a second, do not hold a worker
+# for HTTP_TIMEOUT when they hang; LLM completions legitimately take longer
+PROVIDER_POOLS = {
+    "openweather": _provider_pool("OPENWEATHER", timeout=10),
+    "youtube": _provider_pool("YOUTUBE", timeout=10),
+    "groq": _provider_pool("GROQ"),
+}
+
+
+# ==================== RATE LIMITS ====================
+# Client side throttling is opt-in: set PREFIX_RATE_LIMIT to the plan quota
+# (OpenWeather free plan 60 calls/min, Groq free plan 30 requests/min).
+# Buckets live in each process: the quota and burst are split across
+# RATE_LIMIT_WORKERS processes (uvicorn/gunicorn WEB_CONCURRENCY by default)
+# so that all workers together stay within it. YouTube quota is counted in
+# daily units, not calls per minute, the search cache is what protects it.
+RATE_LIMIT_WORKERS = max(1, _env_int("RATE_LIMIT_WORKERS", _env_int("WEB_CONCURRENCY", 1)))
+
+
+def _rate_limit(prefix: str, burst: int) -> dict:
+    """Token bucket for one provider: PREFIX_RATE_LIMIT requests per minute (0 = unlimited), PREFIX_RATE_BURST tokens, for this worker"""
+    return {
+        "per_minute": _env_float(f"{prefix}_RATE_LIMIT", 0) / RATE_LIMIT_WORKERS,
+        "burst": max(1, _env_int(f"{prefix}_RATE_BURST", burst) // RATE_LIMIT_WORKERS),
+    }
+
+
+RATE_LIMITS = {
+    "openweather": _rate_limit("OPENWEATHER", 10),
+    "youtube": _rate_limit("YOUTUBE", 5),
+    "groq": _rate_limit("GROQ", 5),
+}
+# calls waiting for a token per provider, more are rejected right away
+RATE_LIMIT_QUEUE_SIZE = _env_int("RATE_LIMIT_QUEUE_SIZE", 200)
+# longest a call may wait for a token, per priority class
+RATE_LIMIT_MAX_WAIT = {
+    "interactive": _env_float("RATE_LIMIT_INTERACTIVE_WAIT", 5),
+    "batch": _env_float("RATE_LIMIT_BATCH_WAIT", 20),
+    "background": _env_float("RATE_LIMIT_BACKGROUND_WAIT", 60),
+}
+# upstream 429s: retries, and the jittered exponential backoff used without a Retry-After header
+RATE_LIMIT_MAX_RETRIES = _env_int("RATE_LIMIT_MAX_RETRIES", 3)
+RATE_LIMIT_BACKOFF_BASE = _env_float("RATE_LIMIT_BACKOFF_BASE", 0.5)
+RATE_LIMIT_BACKOFF_MAX = _env_float("RATE_LIMIT_BACKOFF_MAX", 30)
+
+
+# ==================== CIRCUIT BREAKERS ====================
+# A provider circuit opens when, over its last CIRCUIT_WINDOW calls (at least
+# CIRCUIT_MIN_CALLS), CIRCUIT_FAILURE_RATE of them failed: transport error,
+# 5xx, or slower than PREFIX_SLOW_CALL_SECONDS. It stays open
+# CIRCUIT_OPEN_SECONDS, then lets CIRCUIT_HALF_OPEN_PROBES calls through to test it.
+CIRCUIT_WINDOW = _env_int("CIRCUIT_WINDOW", 20)
+CIRCUIT_MIN_CALLS = _env_int("CIRCUIT_MIN_CALLS", 10)
+CIRCUIT_FAILURE_RATE = _env_float("CIRCUIT_FAILURE_RATE", 0.5)
+CIRCUIT_OPEN_SECONDS = _env_float("CIRCUIT_OPEN_SECONDS", 30)
+CIRCUIT_HALF_OPEN_PROBES = _env_int("CIRCUIT_HALF_OPEN_PROBES", 1)
+
+SLOW_CALL_SECONDS = {
+    "openweather": _env_float("OPENWEATHER_SLOW_CALL_SECONDS", 3),
+    "youtube": _env_float("YOUTUBE_SLOW_CALL_SECONDS", 3),
+    "groq": _env_float("GROQ_SLOW_CALL_SECONDS", 15),
+}
+
+
+# ==================== LATENCY ====================
+# City lookups start the weather fetch from the last known coordinates
+# (expired geocode cache entry or search history) while geocoding confirms them.
+SPECULATIVE_FETCH_ENABLED = _env_bool("SPECULATIVE_FETCH_ENABLED", True)
+# Hedged OpenWeather GETs: a duplicate is sent when the first one is slower
+# than the HEDGE_QUANTILE of the last HEDGE_WINDOW calls (never before
+# HEDGE_MIN_DELAY, and only after HEDGE_MIN_SAMPLES calls). Costs quota, off by default.
+HEDGE_ENABLED = _env_bool("HEDGE_ENABLED", False)
+HEDGE_QUANTILE = _env_float("HEDGE_QUANTILE", 0.95)
+HEDGE_WINDOW = _env_int("HEDGE_WINDOW", 200)
+HEDGE_MIN_SAMPLES = _env_int("HEDGE_MIN_SAMPLES", 20)
+HEDGE_MIN_DELAY = _env_float("HEDGE_MIN_DELAY", 0.05)
+
+
+# ==================== DATABASE ====================
+# supabase-py is synchronous, queries run on this many worker threads
+DB_MAX_WORKERS = _env_int("DB_MAX_WORKERS", 20)
+
+
+# ==================== CACHES ====================
+GEOCODE_CACHE_SIZE = _env_int("GEOCODE_CACHE_SIZE", 10000)
+GEOCODE_CACHE_TTL = _env_float("GEOCODE_CACHE_TTL", 7 * 24 * 3600)
+GEOCODE_NEGATIVE_TTL = _env_float("GEOCODE_NEGATIVE_TTL", 3600)
+# expired geocodes are kept this long as coordinate hints for speculative weather fetches
+GEOCODE_HINT_TTL = _env_float("GEOCODE_HINT_TTL", 30 * 24 * 3600)
+
+# Optional offline gazetteer: a GeoNames cities dump (cities500.txt / cities15000.zip ...)
+# answers forward geocoding and autocomplete locally, OpenWeather is only asked on a miss.
+# admin1CodesASCII.txt turns admin1 codes into state names, as OpenWeather returns them.
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH")
+GAZETTEER_ADMIN1_PATH = os.getenv("GAZETTEER_ADMIN1_PATH")
+GAZETTEER_MIN_POPULATION = _env_int("GAZETTEER_MIN_POPULATION", 0)
+# autocomplete answers from OpenWeather (no gazetteer loaded, or no local match)
+SUGGEST_CACHE_SIZE = _env_int("SUGGEST_CACHE_SIZE", 5000)
+SUGGEST_CACHE_TTL = _env_float("SUGGEST_CACHE_TTL", 24 * 3600)
+
+# current weather / forecast, keyed on lat/lon snapped to a WEATHER_GRID_STEP degree grid
+WEATHER_GRID_STEP = _env_float("WEATHER_GRID_STEP", 0.01)
+WEATHER_CACHE_SIZE = _env_int("WEATHER_CACHE_SIZE", 5000)
+CURRENT_WEATHER_TTL = _env_float("CURRENT_WEATHER_TTL", 600)
+FORECAST_TTL = _env_float("FORECAST_TTL", 3600)
+# how long an expired entry may still be served while it is refreshed in the background
+WEATHER_STALE_TTL = _env_float("WEATHER_STALE_TTL", 1800)
+# while OpenWeather is down, expired entries up to this old are served (marked stale)
+WEATHER_FALLBACK_TTL = _env_float("WEATHER_FALLBACK_TTL", 6 * 3600)
+
+# LLM descriptions: in-process LRU in front of the llm_cache Supabase table
+LLM_CACHE_SIZE = _env_int("LLM_CACHE_SIZE", 2000)
+LLM_CACHE_TTL = _env_float("LLM_CACHE_TTL", 30 * 24 * 3600)
+LLM_CACHE_PERSIST = _env_bool("LLM_CACHE_PERSIST", True)
+
+# YouTube searches cost 100 quota units each whatever maxResults is: one call fetches
+# YOUTUBE_FETCH_SIZE videos per normalized query, kept in an in-process LRU in front
+# of the youtube_cache Supabase table, and requests are served a slice of it
+YOUTUBE_CACHE_SIZE = _env_int("YOUTUBE_CACHE_SIZE", 2000)
+YOUTUBE_CACHE_TTL = _env_float("YOUTUBE_CACHE_TTL", 3 * 24 * 3600)
+YOUTUBE_CACHE_PERSIST = _env_bool("YOUTUBE_CACHE_PERSIST", True)
+YOUTUBE_FETCH_SIZE = _env_int("YOUTUBE_FETCH_SIZE", 25)
+
+
+# ==================== BATCH ====================
+# max upstream lookups in flight for one POST /api/weather/batch
+WEATHER_BATCH_CONCURRENCY = _env_int("WEATHER_BATCH_CONCURRENCY", 20)
+# Current weather cache misses for places whose OpenWeather city id is known
+# (learned from earlier answers, kept CITY_ID_TTL) are collected for
+# WEATHER_GROUP_WINDOW seconds and fetched together with data/2.5/group,
+# WEATHER_GROUP_MAX ids per call (20 is the OpenWeather limit)
+WEATHER_GROUP_ENABLED = _env_bool("WEATHER_GROUP_ENABLED", True)
+WEATHER_GROUP_WINDOW = _env_float("WEATHER_GROUP_WINDOW", 0.005)
+WEATHER_GROUP_MAX = min(_env_int("WEATHER_GROUP_MAX", 20), 20)
+CITY_ID_TTL = _env_float("CITY_ID_TTL", 30 * 24 * 3600)
+# after a 401/403/404 from data/2.5/group (not in the plan), single calls only for this long
+WEATHER_GROUP_RETRY = _env_float("WEATHER_GROUP_RETRY", 600)
+
+
+# ==================== OVERVIEW ====================
+# GET /api/overview answers within OVERVIEW_BUDGET seconds (geocoding included),
+# each section also gives up after its own timeout and is reported as "timeout"
+OVERVIEW_BUDGET = _env_float("OVERVIEW_BUDGET", 3)
+OVERVIEW_TIMEOUTS = {
+    "current": _env_float("OVERVIEW_CURRENT_TIMEOUT", 2),
+    "forecast": _env_float("OVERVIEW_FORECAST_TIMEOUT", 2),
+    "climate": _env_float("OVERVIEW_CLIMATE_TIMEOUT", 3),
+    "places": _env_float("OVERVIEW_PLACES_TIMEOUT", 3),
+    "videos": _env_float("OVERVIEW_VIDEOS_TIMEOUT", 2),
+}
+OVERVIEW_VIDEOS = _env_int("OVERVIEW_VIDEOS", 5)
+
+
+# ==================== NEARBY ====================
+# GET /history/nearby is answered from an in-process KD-tree over the (id, lat, lon)
+# of the history (needs NumPy). Searches saved since the tree was built are read every
+# NEARBY_INDEX_REFRESH seconds into a delta buffer scanned along with the tree, the
+# tree is rebuilt when the buffer passes NEARBY_INDEX_DELTA_MAX rows, and from scratch
+# every NEARBY_INDEX_RELOAD seconds (+-25% per worker) to drop deleted or moved searches.
+# A reload reads the whole history 1000 rows per query (db-max-rows): every worker runs
+# up to NEARBY_INDEX_MAX_ROWS / 1000 sequential queries per reload, ~2000 at the default
+# cap, raise NEARBY_INDEX_RELOAD on large histories. Queries ask the tree for
+# NEARBY_OVERFETCH times the requested rows so that stale entries can be dropped
+# without returning short. Without NumPy, or above NEARBY_INDEX_MAX_ROWS, queries go
+# to the nearby_weather_searches SQL function (earthdistance GiST index).
+NEARBY_INDEX_ENABLED = _env_bool("NEARBY_INDEX_ENABLED", True)
+NEARBY_INDEX_REFRESH = _env_float("NEARBY_INDEX_REFRESH", 30)
+NEARBY_INDEX_RELOAD = _env_float("NEARBY_INDEX_RELOAD", 3600)
+NEARBY_INDEX_DELTA_MAX = _env_int("NEARBY_INDEX_DELTA_MAX", 20000)
+NEARBY_INDEX_MAX_ROWS = _env_int("NEARBY_INDEX_MAX_ROWS", 2_000_000)
+NEARBY_OVERFETCH = _env_int("NEARBY_OVERFETCH", 2)
+
+
+# ==================== HISTORY WRITE-BEHIND ====================
+# when enabled, weather endpoints queue history rows instead of waiting for the inserts
+HISTORY_WRITE_BEHIND = _env_bool("HISTORY_WRITE_BEHIND", True)
+HISTORY_QUEUE_SIZE = _env_int("HISTORY_QUEUE_SIZE", 10000)
+HISTORY_BATCH_SIZE = _env_int("HISTORY_BATCH_SIZE", 200)
+HISTORY_FLUSH_INTERVAL = _env_float("HISTORY_FLUSH_INTERVAL", 1.0)
+HISTORY_RETRY_INTERVAL = _env_float("HISTORY_RETRY_INTERVAL", 30)
+HISTORY_SHUTDOWN_TIMEOUT = _env_float("HISTORY_SHUTDOWN_TIMEOUT", 10)
+# records the DB could not take are spooled there and replayed, records it rejected
+# (bad data) go to the dead letter file; the pid is added to both names, one file per worker
+HISTORY_SPOOL_PATH = os.getenv("HISTORY_SPOOL_PATH", "history_spool.jsonl")
+HISTORY_DEAD_LETTER_PATH = os.getenv("HISTORY_DEAD_LETTER_PATH", "history_dead_letter.jsonl")
+
+
+# ==================== OBSERVABILITY ====================
+# add a Server-Timing header with the per-stage breakdown to every response
+SERVER_TIMING_ENABLED = _env_bool("SERVER_TIMING_ENABLED", False)
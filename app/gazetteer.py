@@ -0,0 +1,213 @@
+import io
+import sys
+import time
+import heapq
+import bisect
+import logging
+import zipfile
+import unicodedata
+from array import array
+from typing import Iterator
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(value: str | None) -> str:
+    """Case, accents, hyphens and extra spaces do not matter: "Saint-Étienne" -> "saint etienne" """
+
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return " ".join(value.replace("-", " ").casefold().split())
+
+
+class Gazetteer:
+    """
+    Read-only city index. Row attributes live in parallel arrays (numbers
+    in array.array, repeated strings interned) and a sorted list of
+    normalized names points into them, so exact and prefix lookups are a
+    bisect plus a short scan.
+    """
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.countries: list[str] = []
+        self.states: list[str] = []       # admin1 name, "" when unknown
+        self.state_codes: list[str] = []  # admin1 code ("TX", "11", ...)
+        self.lat = array("d")
+        self.lon = array("d")
+        self.population = array("q")
+        self._keys: list[str] = []
+        self._rows = array("I")
+        self._pending: list[tuple[str, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str, aliases: tuple, country: str, state: str, state_code: str, lat: float, lon: float, population: int):
+        row = len(self.names)
+        self.names.append(name)
+        self.countries.append(sys.intern(country))
+        self.states.append(sys.intern(state))
+        self.state_codes.append(sys.intern(state_code))
+        self.lat.append(lat)
+        self.lon.append(lon)
+        self.population.append(population)
+
+        for key in {normalize(name), *(normalize(alias) for alias in aliases)}:
+            if key:
+                self._pending.append((key, row))
+
+    def build(self):
+        """Sort the name keys, call once after the last add()"""
+
+        self._pending.extend(zip(self._keys, self._rows))
+        self._pending.sort()
+        self._keys = [key for key, _ in self._pending]
+        self._rows = array("I", (row for _, row in self._pending))
+        self._pending = []
+
+    def item(self, row: int) -> dict:
+        """Row shaped like an OpenWeather geo/1.0/direct item"""
+
+        item = {
+            "name": self.names[row],
+            "lat": self.lat[row],
+            "lon": self.lon[row],
+            "country": self.countries[row],
+            "population": self.population[row],
+        }
+        if self.states[row]:
+            item["state"] = self.states[row]
+        return item
+
+    def _matches_state(self, row: int, state_key: str) -> bool:
+        return state_key in (normalize(self.states[row]), self.state_codes[row].lower())
+
+    def lookup(self, city: str, country: str, state: str | None = None) -> dict | None:
+        """Most populated place with exactly this name in the country (and state), None when unknown"""
+
+        key = normalize(city)
+        country = country.strip().upper()
+        state_key = normalize(state)
+
+        best = None
+        i = bisect.bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i] == key:
+            row = self._rows[i]
+            i += 1
+            if self.countries[row] != country:
+                continue
+            if state_key and not self._matches_state(row, state_key):
+                continue
+            if best is None or self.population[row] > self.population[best]:
+                best = row
+
+        return self.item(best) if best is not None else None
+
+    def prefix(self, prefix: str, country: str | None = None, limit: int = 10) -> list[dict]:
+        """Places whose name starts with `prefix`, most populated first"""
+
+        key = normalize(prefix)
+        if not key:
+            return []
+        country = country.strip().upper() if country else None
+
+        rows = set()
+        i = bisect.bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i].startswith(key):
+            row = self._rows[i]
+            i += 1
+            if country is None or self.countries[row] == country:
+                rows.add(row)
+
+        return [self.item(row) for row in heapq.nlargest(limit, rows, key=self.population.__getitem__)]
+
+
+# ==================== GEONAMES ====================
+def _lines(path: str) -> Iterator[str]:
+    """Lines of a GeoNames .txt dump, or of the .txt inside its .zip"""
+
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            member = next((name for name in archive.namelist() if name.endswith(".txt")), None)
+            if member is None:
+                raise ValueError(f"no .txt file in {path}")
+            with archive.open(member) as raw:
+                yield from io.TextIOWrapper(raw, encoding="utf-8")
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield from f
+
+
+def _admin1_names(path: str | None) -> dict[str, str]:
+    """admin1CodesASCII.txt: "FR.11" -> "Île-de-France" """
+
+    if not path:
+        return {}
+
+    names = {}
+    for line in _lines(path):
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) >= 2:
+            names[fields[0]] = fields[1]
+    return names
+
+
+def load(path: str, admin1_path: str | None = None, min_population: int = 0) -> Gazetteer:
+    """
+    Index of a GeoNames cities dump (tab separated: geonameid, name,
+    asciiname, alternatenames, latitude, longitude, feature class, feature
+    code, country code, cc2, admin1 code, ..., population, ...).
+    Names and ASCII names are indexed, not the alternate names.
+    """
+
+    admin1 = _admin1_names(admin1_path)
+    index = Gazetteer()
+
+    for line in _lines(path):
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) < 15:
+            continue
+
+        population = int(fields[14] or 0)
+        if population < min_population:
+            continue
+
+        country, state_code = fields[8], fields[10]
+        index.add(
+            name=fields[1],
+            aliases=(fields[2],),
+            country=country,
+            state=admin1.get(f"{country}.{state_code}", ""),
+            state_code=state_code,
+            lat=float(fields[4]),
+            lon=float(fields[5]),
+            population=population,
+        )
+
+    index.build()
+    return index
+
+
+index: Gazetteer | None = None
+
+
+def load_configured():
+    """Load GAZETTEER_PATH into `index`. Without it, or when it cannot be read, geocoding stays upstream only."""
+
+    global index
+
+    if not config.GAZETTEER_PATH:
+        return
+
+    started = time.perf_counter()
+    try:
+        index = load(config.GAZETTEER_PATH, config.GAZETTEER_ADMIN1_PATH, config.GAZETTEER_MIN_POPULATION)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        logger.error("Gazetteer %s not loaded, geocoding through OpenWeather only: %s", config.GAZETTEER_PATH, e)
+        return
+
+    logger.info("Gazetteer loaded: %d places in %.1fs", len(index), time.perf_counter() - started)
@@ -0,0 +1,87 @@
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable
+from app import config, metrics
+
+
+HEDGED = metrics.Counter(
+    "upstream_hedged_total",
+    "Upstream calls that were duplicated because the first attempt was slower than the hedge delay",
+    ("call",),
+)
+HEDGE_WINS = metrics.Counter(
+    "upstream_hedge_wins_total",
+    "Hedged upstream calls where the duplicate answered first",
+    ("call",),
+)
+
+
+class LatencyWindow:
+    """Last `size` latencies of one call, for its hedge delay"""
+
+    def __init__(self, size: int):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        if len(self._samples) < config.HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_windows: dict[str, LatencyWindow] = {}
+
+
+def hedge_delay(call: str) -> float | None:
+    """HEDGE_QUANTILE latency of `call` (at least HEDGE_MIN_DELAY), None until enough samples"""
+
+    window = _windows.get(call)
+    delay = window.quantile(config.HEDGE_QUANTILE) if window else None
+    return None if delay is None else max(delay, config.HEDGE_MIN_DELAY)
+
+
+async def hedged(call: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run fn(). With HEDGE_ENABLED, when it has not answered after the usual
+    HEDGE_QUANTILE latency of `call`, run a second fn() and keep whichever
+    succeeds first; the other one is cancelled. Only for idempotent calls.
+    """
+
+    window = _windows.setdefault(call, LatencyWindow(config.HEDGE_WINDOW))
+    delay = hedge_delay(call) if config.HEDGE_ENABLED else None
+    started = time.perf_counter()
+
+    if delay is None:
+        result = await fn()
+        window.observe(time.perf_counter() - started)
+        return result
+
+    primary = asyncio.ensure_future(fn())
+    pending = {primary}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            HEDGED.inc(call)
+            hedge = asyncio.ensure_future(fn())
+            pending.add(hedge)
+
+        failed = []
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        HEDGE_WINS.inc(call)
+                    window.observe(time.perf_counter() - started)
+                    return task.result()
+                failed.append(task)
+
+            if not pending:
+                raise failed[0].exception()
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in pending:
+            task.cancel()
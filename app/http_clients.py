@@ -0,0 +1,144 @@
+import importlib.util
+from collections import Counter
+import httpx
+from fastapi import Request
+from app import config, metrics
+from app.ratelimit import RateLimitedTransport, limiters
+from app.circuit import CircuitBreakerTransport, breakers
+
+
+# HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# provider -> extra transport kwargs (Groq has always been called with verify=False)
+PROVIDER_OPTIONS = {
+    "openweather": {},
+    "youtube": {},
+    "groq": {"verify": False},
+}
+
+_request_counts: Counter = Counter()
+_status_counts: Counter = Counter()
+
+
+def _hooks(provider: str) -> dict:
+
+    async def on_request(request: httpx.Request):
+        _request_counts[provider] += 1
+
+    async def on_response(response: httpx.Response):
+        _status_counts[(provider, response.status_code)] += 1
+        metrics.UPSTREAM_RESPONSES.inc(provider, response.status_code)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+class TimedTransport(httpx.AsyncBaseTransport):
+    """
+    Records the time to response headers of every call as a stage, e.g.
+    "openweather:forecast", "groq:completions". Unlike a response hook it
+    also sees the calls that never get a response (errors, cancelled callers).
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, provider: str):
+        self.transport = transport
+        self.provider = provider
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = request.url.path.rsplit("/", 1)[-1]
+        with metrics.span(f"{self.provider}:{endpoint}"):
+            return await self.transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def create_client(provider: str, transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    """
+    Pooled client for one provider, every call is timed, then goes through
+    the provider rate limiter, then its circuit breaker. `transport` replaces the network
+    (benchmarks use fakes).
+    """
+
+    pool = config.PROVIDER_POOLS[provider]
+
+    if transport is None:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=pool["max_connections"],
+                max_keepalive_connections=pool["max_keepalive"],
+                keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            http2=config.HTTP2_ENABLED and HTTP2_AVAILABLE,
+            **PROVIDER_OPTIONS[provider],
+        )
+
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            pool["timeout"],
+            connect=config.HTTP_CONNECT_TIMEOUT,
+            pool=config.HTTP_POOL_TIMEOUT,
+        ),
+        transport=TimedTransport(
+            RateLimitedTransport(
+                CircuitBreakerTransport(transport, breakers[provider]),
+                limiters[provider],
+            ),
+            provider,
+        ),
+        event_hooks=_hooks(provider),
+    )
+
+
+def create_clients() -> dict[str, httpx.AsyncClient]:
+    return {provider: create_client(provider) for provider in config.PROVIDER_POOLS}
+
+
+async def close_clients(clients: dict[str, httpx.AsyncClient]):
+    for client in clients.values():
+        await client.aclose()
+
+
+def _open_connections(client: httpx.AsyncClient) -> int | None:
+    # httpcore does not expose pool usage publicly, read it best-effort
+    transport = getattr(client, "_transport", None)
+    while hasattr(transport, "transport"):  # unwrap rate limiter / circuit breaker
+        transport = transport.transport
+    pool = getattr(transport, "_pool", None)
+    connections = getattr(pool, "connections", None)
+    return len(connections) if connections is not None else None
+
+
+def pool_metrics(clients: dict[str, httpx.AsyncClient]) -> dict:
+    metrics = {}
+    for provider, client in clients.items():
+        pool = config.PROVIDER_POOLS[provider]
+        metrics[provider] = {
+            "http2": config.HTTP2_ENABLED and HTTP2_AVAILABLE,
+            "timeout": pool["timeout"],
+            "max_connections": pool["max_connections"],
+            "max_keepalive": pool["max_keepalive"],
+            "open_connections": _open_connections(client),
+            "rate_limit": limiters[provider].stats(),
+            "circuit": breakers[provider].stats(),
+            "requests_total": _request_counts[provider],
+            "responses_by_status": {
+                str(status): count
+                for (name, status), count in _status_counts.items()
+                if name == provider
+            },
+        }
+    return metrics
+
+
+# ==================== DEPENDENCIES ====================
+def openweather_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_clients["openweather"]
+
+
+def youtube_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_clients["youtube"]
+
+
+def groq_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_clients["groq"]
@@ -1,21 +1,143 @@
-from fastapi import FastAPI
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from app.http_clients import create_clients, close_clients, pool_metrics
+from app.responses import TimedJSONResponse
+from app import repository, metrics, config, gazetteer
+from app.Services.geocodingService import geocode_cache, suggest_cache
+from app.Services import weatherService, llmService, youtubeService
+from app.Services.historyService import history_writer
+from app.Services.nearbyService import location_index
 from app.Routers import weatherCrudRouter
 from app.Routers.weatherRouter import router as weather_router
 from app.Routers.mapsRouter import router as maps_router
 from app.Routers.llmRouter import router as llm_router
 from app.Routers.youtubeRouter import router as youtube_router
+from app.Routers.overviewRouter import router as overview_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one pooled client per provider, shared by every request
+    app.state.http_clients = create_clients()
+    # optional offline geocoding, parsing the dump takes a few seconds
+    await asyncio.to_thread(gazetteer.load_configured)
+    await history_writer.start()
+    await location_index.start()
+    yield
+    await location_index.stop()
+    await history_writer.stop()
+    await close_clients(app.state.http_clients)
+    repository.shutdown()
+
+
+app = FastAPI(title="Weather API", lifespan=lifespan, default_response_class=TimedJSONResponse)
+
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    timings = metrics.start_request()
+    started = time.perf_counter()
+
+    response = await call_next(request)
+
+    elapsed = time.perf_counter() - started
+    # route template, not the raw path, to keep label cardinality bounded
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    metrics.REQUEST_DURATION.observe(elapsed, request.method, route, response.status_code)
+
+    if config.SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = metrics.server_timing(timings, elapsed)
+
+    return response
 
-app = FastAPI(title="Weather API")
 
 @app.get("/")
 def read_root():
     return {"message": "Weather API is running!"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/http-clients")
+def http_client_metrics():
+    return pool_metrics(app.state.http_clients)
+
+
+@app.get("/metrics/history-writer")
+def history_writer_metrics():
+    return history_writer.stats()
+
+
+@app.get("/metrics/nearby-index")
+def nearby_index_metrics():
+    return location_index.stats()
+
+
+@app.get("/metrics/caches")
+def cache_metrics():
+    return {
+        "geocode": geocode_cache.stats(),
+        "suggest": suggest_cache.stats(),
+        "current_weather": weatherService.current_cache.stats(),
+        "forecast": weatherService.forecast_cache.stats(),
+        "city_ids": weatherService.city_ids.stats(),
+        "llm": llmService.description_cache.stats(),
+        "youtube": youtubeService.video_cache.stats(),
+    }
+
+
+def _collect_app_metrics() -> list[tuple]:
+    caches = cache_metrics()
+    pools = pool_metrics(app.state.http_clients) if hasattr(app.state, "http_clients") else {}
+    writer = history_writer.stats()
+
+    return [
+        ("cache_hits_total", "Cache lookups served fresh", "counter",
+         [({"cache": name}, stats["hits"]) for name, stats in caches.items()]),
+        ("cache_stale_hits_total", "Cache lookups served stale", "counter",
+         [({"cache": name}, stats["stale_hits"]) for name, stats in caches.items()]),
+        ("cache_fallback_hits_total", "Expired entries served because the source was down", "counter",
+         [({"cache": name}, stats["fallback_hits"]) for name, stats in caches.items()]),
+        ("cache_misses_total", "Cache lookups that missed", "counter",
+         [({"cache": name}, stats["misses"]) for name, stats in caches.items()]),
+        ("cache_entries", "Entries currently cached", "gauge",
+         [({"cache": name}, stats["size"]) for name, stats in caches.items()]),
+        ("http_pool_open_connections", "Open connections in the provider pool", "gauge",
+         [({"provider": name}, pool["open_connections"]) for name, pool in pools.items()]),
+        ("http_pool_max_connections", "Configured provider pool size", "gauge",
+         [({"provider": name}, pool["max_connections"]) for name, pool in pools.items()]),
+        ("upstream_rate_limit_queue_depth", "Upstream calls waiting for a rate limiter token", "gauge",
+         [({"provider": name}, pool["rate_limit"]["queued"]) for name, pool in pools.items()]),
+        ("circuit_open", "1 while the provider circuit is open, 0.5 half-open, 0 closed", "gauge",
+         [({"provider": name}, {"closed": 0, "half_open": 0.5, "open": 1}[pool["circuit"]["state"]])
+          for name, pool in pools.items()]),
+        ("upstream_rate_limit_tokens", "Tokens left in the provider bucket", "gauge",
+         [({"provider": name}, pool["rate_limit"]["tokens"]) for name, pool in pools.items()]),
+        ("history_queue_depth", "History records waiting to be written", "gauge",
+         [({}, writer["queued"])]),
+        ("history_records_flushed_total", "History records written by the write-behind worker", "counter",
+         [({}, writer["flushed"])]),
+        ("history_records_spooled_total", "History records written to the spool file", "counter",
+         [({}, writer["spooled"])]),
+        ("history_records_dead_lettered_total", "History records the database rejected, moved to the dead letter file", "counter",
+         [({}, writer["dead_lettered"])]),
+        ("nearby_index_size", "Located searches in the in-process nearby index", "gauge",
+         [({}, location_index.stats()["size"])]),
+    ]
+
+
+metrics.register_collector(_collect_app_metrics)
 
 
 app.include_router(weather_router)
 app.include_router(maps_router)
 app.include_router(llm_router)
 app.include_router(youtube_router)
+app.include_router(overview_router)
 app.include_router(weatherCrudRouter.router)
\ No newline at end of file
@@ -0,0 +1,181 @@
+import re
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+
+# Minimal Prometheus text exposition (format 0.0.4), enough for counters and
+# histograms with labels, without pulling in prometheus_client.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_metrics: list = []
+_collectors: list[Callable[[], list[tuple]]] = []
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"'.replace("\n", " ") for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in self._values.items():
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, state in self._values.items():
+                for bound, count in zip(self.buckets, state):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {state[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {state[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {state[-1]}")
+        return lines
+
+
+def register_collector(collector: Callable[[], list[tuple]]):
+    """
+    collector() is called at scrape time and returns
+    [(name, help, type, [(labels dict, value), ...]), ...]
+    for values that already live elsewhere (cache stats, pool sizes, ...)
+    """
+    _collectors.append(collector)
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+
+    for collector in _collectors:
+        for name, help, kind, samples in collector():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {float(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+# ==================== APP METRICS ====================
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests",
+    ("method", "route", "status"),
+)
+STAGE_DURATION = Histogram(
+    "request_stage_duration_seconds",
+    "Time spent in one stage of a request (upstream call, DB query, serialization), by outcome (ok, error, cancelled)",
+    ("stage", "outcome"),
+)
+UPSTREAM_RESPONSES = Counter(
+    "upstream_responses_total",
+    "Responses received from upstream providers",
+    ("provider", "status"),
+)
+
+
+# ==================== SPANS ====================
+# (stage, seconds) recorded while handling the current request, for Server-Timing
+_request_timings: ContextVar[list | None] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> list:
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def record(stage: str, seconds: float, outcome: str = "ok"):
+    STAGE_DURATION.observe(seconds, stage, outcome)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Time the block as `stage`. A block that ends in CancelledError (hedge
+    loser, overview section past its budget) is recorded as cancelled
+    rather than dropped, so the slow calls stay in the histogram.
+    """
+
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        record(stage, time.perf_counter() - started, outcome)
+
+
+def server_timing(timings: list, total: float | None = None) -> str:
+    """Server-Timing header value, repeated stages are summed"""
+
+    durations: dict[str, float] = {}
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    if total is not None:
+        durations["total"] = total
+
+    entries = []
+    for stage, seconds in durations.items():
+        token = re.sub(r"[^A-Za-z0-9_.-]", "_", stage)
+        entries.append(f'{token};dur={seconds * 1000:.1f};desc="{stage}"')
+    return ", ".join(entries)
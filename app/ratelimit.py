@@ -0,0 +1,247 @@
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+import httpx
+from fastapi import HTTPException
+from app import config, metrics
+
+
+# Priority classes, lower goes first. Requests are interactive unless the
+# code path says otherwise (batch endpoint, background cache refresh, ...).
+PRIORITIES = {"interactive": 0, "batch": 1, "background": 2}
+
+_priority: ContextVar[str] = ContextVar("upstream_priority", default="interactive")
+
+
+@contextmanager
+def priority(name: str):
+    """Run the upstream calls made inside the block with this priority class"""
+
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class UpstreamRateLimited(HTTPException):
+    """The call could not get a slot within its deadline (or the provider kept answering 429)"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"{provider} rate limit reached, retry later",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+
+WAIT_DURATION = metrics.Histogram(
+    "upstream_rate_limit_wait_seconds",
+    "Time upstream calls waited for a rate limiter token",
+    ("provider", "priority"),
+)
+THROTTLED = metrics.Counter(
+    "upstream_throttled_total",
+    "Upstream calls rejected by the rate limiter",
+    ("provider", "reason"),
+)
+RETRIES = metrics.Counter(
+    "upstream_retries_total",
+    "Upstream calls retried after a 429",
+    ("provider",),
+)
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every call to one provider. When no token is free,
+    callers queue by (priority, arrival) up to RATE_LIMIT_QUEUE_SIZE and give
+    up as soon as their deadline cannot be met. pause() empties the bucket
+    for a while, after the provider answered 429.
+    """
+
+    def __init__(self, provider: str, per_minute: float, burst: int, max_queue: int):
+        self.provider = provider
+        self.rate = per_minute / 60
+        self.burst = max(1, burst)
+        self.max_queue = max_queue
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: list[list] = []  # heap of [priority, seq]
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+        self.acquired = 0
+        self.throttled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float):
+        if now < self._paused_until:
+            return
+        elapsed = now - max(self._updated, self._paused_until)
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def _ready_at(self, now: float) -> float:
+        """When the next token is available"""
+        missing = max(0.0, 1 - self._tokens)
+        return max(now, self._paused_until) + missing / self.rate
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _reject(self, reason: str, retry_after: float):
+        self.throttled += 1
+        THROTTLED.inc(self.provider, reason)
+        raise UpstreamRateLimited(self.provider, retry_after)
+
+    async def acquire(self, priority: str, deadline: float) -> float:
+        """Take one token, waiting until `deadline` (monotonic) at most. Returns the time waited"""
+
+        if not self.enabled:
+            return 0.0
+
+        started = now = time.monotonic()
+        self._refill(now)
+
+        if not self._waiters and self._tokens >= 1 and now >= self._paused_until:
+            self._tokens -= 1
+            self.acquired += 1
+            return 0.0
+
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full", self._ready_at(now) - now + len(self._waiters) / self.rate)
+
+        entry = [PRIORITIES[priority], next(self._seq)]
+        heapq.heappush(self._waiters, entry)
+
+        try:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                # calls queued ahead of this one each need a token first
+                ahead = sum(1 for waiter in self._waiters if waiter < entry)
+                ready_at = self._ready_at(now) + ahead / self.rate
+
+                if ready_at > deadline:
+                    self._reject("deadline", ready_at - now)
+
+                if ahead == 0 and ready_at <= now:
+                    heapq.heappop(self._waiters)
+                    self._tokens -= 1
+                    self.acquired += 1
+                    return now - started
+
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(changed.wait(), ready_at - now)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            self._wake()
+
+    def pause(self, seconds: float):
+        """The provider said slow down: no token for `seconds`, then refill from empty"""
+
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens = min(self._tokens, 0.0)
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._wake()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            "enabled": self.enabled,
+            "per_minute": self.rate * 60,
+            "burst": self.burst,
+            "tokens": round(self._tokens, 2),
+            "queued": len(self._waiters),
+            "paused_for": round(max(0.0, self._paused_until - now), 2),
+            "acquired": self.acquired,
+            "throttled": self.throttled,
+        }
+
+
+limiters = {
+    provider: RateLimiter(provider, limit["per_minute"], limit["burst"], config.RATE_LIMIT_QUEUE_SIZE)
+    for provider, limit in config.RATE_LIMITS.items()
+}
+
+
+# ==================== TRANSPORT ====================
+def retry_after(response: httpx.Response, attempt: int) -> float:
+    """Retry-After (seconds or HTTP date) when the provider sent one, else full-jitter exponential backoff"""
+
+    header = response.headers.get("Retry-After")
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    ceiling = min(config.RATE_LIMIT_BACKOFF_MAX, config.RATE_LIMIT_BACKOFF_BASE * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps a provider transport: every request takes a token from the
+    provider limiter first, and 429 answers are retried after Retry-After or
+    a jittered backoff, as long as the caller's deadline allows it.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: RateLimiter):
+        self.transport = transport
+        self.limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        priority_class = _priority.get()
+        deadline = time.monotonic() + config.RATE_LIMIT_MAX_WAIT[priority_class]
+        provider = self.limiter.provider
+
+        attempt = 0
+        while True:
+            waited = await self.limiter.acquire(priority_class, deadline)
+            if self.limiter.enabled:
+                WAIT_DURATION.observe(waited, provider, priority_class)
+
+            response = await self.transport.handle_async_request(request)
+            if response.status_code != 429:
+                return response
+
+            delay = retry_after(response, attempt)
+            await response.aclose()
+            self.limiter.pause(delay)
+
+            attempt += 1
+            if attempt > config.RATE_LIMIT_MAX_RETRIES or time.monotonic() + delay > deadline:
+                self.limiter.throttled += 1
+                THROTTLED.inc(provider, "upstream_429")
+                raise UpstreamRateLimited(provider, delay)
+
+            RETRIES.inc(provider)
+            # the pause holds everyone back; unlimited providers have no bucket to wait on
+            if not self.limiter.enabled:
+                await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -0,0 +1,47 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from app import config, metrics
+
+
+# supabase-py only ships a synchronous PostgREST client here, so every
+# .execute() is pushed onto a bounded pool instead of blocking the event loop
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=config.DB_MAX_WORKERS,
+            thread_name_prefix="supabase",
+        )
+    return _executor
+
+
+async def execute(query):
+    """Run a supabase query builder off the event loop and return its response
+
+    Exemple:
+    response = await execute(supabase.table("weather_searches").select("*").eq("id", 1))
+    """
+
+    loop = asyncio.get_running_loop()
+    with metrics.span(_stage(query)):
+        return await loop.run_in_executor(_get_executor(), query.execute)
+
+
+def _stage(query) -> str:
+    """Metric stage of a query, e.g. db:GET weather_searches or db:POST rpc/insert_weather_history"""
+
+    request = getattr(query, "request", None)
+    path = str(getattr(request, "path", ""))
+    if "/rest/v1/" not in path:
+        return "db"
+    return f"db:{request.http_method} {path.split('/rest/v1/', 1)[1]}"
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
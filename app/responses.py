@@ -0,0 +1,37 @@
+import json
+from typing import Any
+from fastapi.responses import JSONResponse
+from app import metrics
+
+# orjson is optional, without it responses are encoded with the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON bytes, with orjson when available"""
+
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class TimedJSONResponse(JSONResponse):
+    """
+    Default response class: encodes with orjson when installed and reports
+    the encoding time as the "serialize" stage.
+
+    Endpoints declare a response_model, so FastAPI hands this class content
+    already validated and converted to JSON types by pydantic-core, and the
+    slow jsonable_encoder walk is skipped. The history page endpoints, whose
+    bodies are plain DB rows already in the model shape, return it directly
+    so pages of thousands of rows are encoded without building models.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with metrics.span("serialize"):
+            if orjson is None:
+                return super().render(content)
+            return dumps(content)
@@ -0,0 +1,140 @@
+import math
+import heapq
+
+# NumPy is optional, without it nearby queries are left to the database
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EARTH_RADIUS_KM = 6371.0088
+LEAF_SIZE = 64
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# Points are unit vectors: the straight-line (chord) distance between two of
+# them grows with the great-circle distance, so a plain 3D tree answers
+# radius and nearest queries on the sphere without any lon wrap-around case.
+def _unit_vectors(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)), axis=-1)
+
+
+def _km_to_chord(km: float) -> float:
+    return 2 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2)
+
+
+def _chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def scan_nearest(ids, lat, lon, query_lat: float, query_lon: float, k: int, radius_km: float | None = None) -> list[tuple[float, int]]:
+    """Same answer as KDTree.nearest by checking every point, for small unindexed sets"""
+
+    if not len(ids) or k <= 0:
+        return []
+
+    ids = np.asarray(ids, dtype=np.int64)
+    chords = np.sqrt(((_unit_vectors(lat, lon).reshape(-1, 3) - _unit_vectors(query_lat, query_lon)) ** 2).sum(axis=1))
+    if radius_km is not None:
+        keep = np.flatnonzero(chords <= _km_to_chord(radius_km))
+        ids, chords = ids[keep], chords[keep]
+    if len(chords) > k:
+        keep = np.argpartition(chords, k)[:k]
+        ids, chords = ids[keep], chords[keep]
+
+    return sorted((_chord_to_km(float(chord)), int(search_id)) for chord, search_id in zip(chords, ids))
+
+
+class KDTree:
+    """
+    Static KD-tree over (id, lat, lon) points, built with NumPy. Leaves
+    hold up to LEAF_SIZE points, contiguous in `_points`, and are scanned
+    vectorized; inner nodes only keep their bounding box for pruning.
+    """
+
+    def __init__(self, ids, lat, lon):
+        points = _unit_vectors(lat, lon).reshape(-1, 3)
+        self._ids = np.asarray(ids, dtype=np.int64)
+        self._order = np.empty(len(points), dtype=np.int64)
+        # node -> (box_min, box_max, left, right) for inner nodes, (box_min, box_max, start, end) for leaves
+        self._nodes: list[tuple] = []
+        self._leaf: list[bool] = []
+
+        if len(points):
+            self._build(points, np.arange(len(points)), 0)
+        self._points = points[self._order]
+        self._ids = self._ids[self._order]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _build(self, points, index, start: int) -> int:
+        node = len(self._nodes)
+        box = points[index]
+        box_min, box_max = box.min(axis=0), box.max(axis=0)
+        self._nodes.append(None)
+
+        if len(index) <= LEAF_SIZE:
+            self._order[start:start + len(index)] = index
+            self._nodes[node] = (box_min, box_max, start, start + len(index))
+            self._leaf.append(True)
+            return node
+
+        self._leaf.append(False)
+        axis = int(np.argmax(box_max - box_min))
+        mid = len(index) // 2
+        split = np.argpartition(box[:, axis], mid)
+        left = self._build(points, index[split[:mid]], start)
+        right = self._build(points, index[split[mid:]], start + mid)
+        self._nodes[node] = (box_min, box_max, left, right)
+        return node
+
+    @staticmethod
+    def _box_distance(query, box_min, box_max) -> float:
+        gap = np.maximum(np.maximum(box_min - query, query - box_max), 0.0)
+        return float(np.sqrt(gap @ gap))
+
+    def nearest(self, lat: float, lon: float, k: int, radius_km: float | None = None) -> list[tuple[float, int]]:
+        """Up to k (distance_km, id) closest to the point, within radius_km when given, closest first"""
+
+        if not len(self) or k <= 0:
+            return []
+
+        query = _unit_vectors(lat, lon)
+        bound = _km_to_chord(radius_km) if radius_km is not None else math.inf
+
+        best: list[tuple[float, int]] = []  # max-heap of (-chord, id), k entries at most
+        frontier = [(self._box_distance(query, *self._nodes[0][:2]), 0)]
+
+        while frontier:
+            distance, node = heapq.heappop(frontier)
+            limit = -best[0][0] if len(best) == k else bound
+            if distance > limit:
+                break
+
+            box_min, box_max, a, b = self._nodes[node]
+            if not self._leaf[node]:
+                for child in (a, b):
+                    heapq.heappush(frontier, (self._box_distance(query, *self._nodes[child][:2]), child))
+                continue
+
+            chords = np.sqrt(((self._points[a:b] - query) ** 2).sum(axis=1))
+            for i in np.flatnonzero(chords <= limit):
+                item = (-float(chords[i]), int(self._ids[a + i]))
+                if len(best) < k:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+                limit = -best[0][0] if len(best) == k else bound
+
+        return sorted((_chord_to_km(-chord), search_id) for chord, search_id in best)
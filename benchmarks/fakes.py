@@ -0,0 +1,485 @@
+"""
+In-process stand-ins for every backend the API talks to, with injectable latency.
+
+- FakeUpstreams: async httpx transport answering OpenWeather geo/weather/group/forecast,
+  Groq chat completions (plain and streamed) and YouTube search.
+- FakePostgrest: sync httpx transport answering the PostgREST calls supabase-py
+  makes, backed by in-memory tables (select/insert/update/delete with the
+  eq/neq/in/ilike/is/lt/gt/gte/lte filters, or/and groups, order, offset/limit
+  (selects capped at max_rows like PostgREST's db-max-rows), and the
+  insert_weather_history / search_weather_history / nearby_weather_searches RPCs).
+
+Both count calls per upstream endpoint so a run can report upstream calls per request.
+write_gazetteer() writes a GeoNames-style cities dump for the offline gazetteer.
+"""
+
+import json
+import math
+import time
+import operator
+import random
+import asyncio
+import hashlib
+import threading
+from collections import Counter, defaultdict
+from urllib.parse import parse_qsl
+import httpx
+
+
+class Latency:
+    """Fixed base delay plus uniform jitter, and `tail_ms` more on a `tail_rate` fraction of calls, in milliseconds"""
+
+    def __init__(self, base_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0, tail_ms: float = 0.0, tail_rate: float = 0.0):
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+        self.tail_ms = tail_ms
+        self.tail_rate = tail_rate
+        self._random = random.Random(seed)
+
+    def seconds(self) -> float:
+        delay = self.base_ms + self._random.uniform(0, self.jitter_ms)
+        if self.tail_rate and self._random.random() < self.tail_rate:
+            delay += self.tail_ms
+        return delay / 1000
+
+
+DESCRIPTIONS = ["clear sky", "few clouds", "light rain", "overcast clouds"]
+
+
+def _stable_float(text: str, low: float, high: float) -> float:
+    digest = hashlib.sha256(text.encode()).digest()
+    return low + (int.from_bytes(digest[:4], "big") / 2**32) * (high - low)
+
+
+# ==================== PROVIDERS ====================
+class FakeUpstreams(httpx.AsyncBaseTransport):
+    """
+    quota_per_minute > 0 makes every host answer 429 + Retry-After once its own quota is used up.
+    outage ("error" or "timeout") starts after `outage_after` calls: every call then takes
+    outage_ms and answers 502, or raises httpx.ReadTimeout.
+    """
+
+    def __init__(
+        self,
+        latency: Latency,
+        llm_tokens: int = 40,
+        quota_per_minute: float = 0,
+        outage: str | None = None,
+        outage_after: int = 0,
+        outage_ms: float = 0,
+    ):
+        self.latency = latency
+        self.llm_tokens = llm_tokens
+        self.quota_per_minute = quota_per_minute
+        self.outage = outage
+        self.outage_after = outage_after
+        self.outage_ms = outage_ms
+        self.calls: Counter = Counter()
+        self._cities: dict[int, tuple[float, float]] = {}  # city id -> coordinates, for group calls
+        self._quota: dict[str, list[float]] = {}  # host -> [tokens, updated]
+
+    def _over_quota(self, host: str) -> float:
+        """0 if the call fits in the host quota, else the seconds until it would"""
+
+        if self.quota_per_minute <= 0:
+            return 0.0
+
+        rate = self.quota_per_minute / 60
+        now = time.monotonic()
+        tokens, updated = self._quota.get(host, [rate, now])  # one second worth of burst
+        tokens = min(max(rate, 1.0), tokens + (now - updated) * rate)
+        if tokens < 1:
+            self._quota[host] = [tokens, now]
+            return (1 - tokens) / rate
+        self._quota[host] = [tokens - 1, now]
+        return 0.0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.outage and sum(self.calls.values()) >= self.outage_after:
+            self.calls["outage"] += 1
+            await asyncio.sleep(self.outage_ms / 1000)
+            if self.outage == "timeout":
+                raise httpx.ReadTimeout("fake upstream timed out", request=request)
+            return httpx.Response(502, json={"message": "fake outage"})
+
+        await asyncio.sleep(self.latency.seconds())
+
+        host, path = request.url.host, request.url.path
+
+        wait = self._over_quota(host)
+        if wait:
+            self.calls[f"{host}:429"] += 1
+            return httpx.Response(429, headers={"Retry-After": f"{wait:.3f}"}, json={"message": "quota exceeded"})
+        params = dict(request.url.params)
+
+        if host == "api.openweathermap.org" and path == "/geo/1.0/direct":
+            self.calls["openweather:geo"] += 1
+            return httpx.Response(200, json=self._geo(params["q"]))
+
+        if host == "api.openweathermap.org" and path == "/data/2.5/weather":
+            self.calls["openweather:weather"] += 1
+            return httpx.Response(200, json=self._weather(params))
+
+        if host == "api.openweathermap.org" and path == "/data/2.5/group":
+            self.calls["openweather:group"] += 1
+            return httpx.Response(200, json=self._group(params["id"]))
+
+        if host == "api.openweathermap.org" and path == "/data/2.5/forecast":
+            self.calls["openweather:forecast"] += 1
+            return httpx.Response(200, json=self._forecast(params))
+
+        if host == "api.groq.com":
+            self.calls["groq:chat"] += 1
+            return self._groq(json.loads(request.content))
+
+        if host == "www.googleapis.com":
+            self.calls["youtube:search"] += 1
+            return httpx.Response(200, json=self._youtube(params))
+
+        self.calls["unknown"] += 1
+        return httpx.Response(404, json={"message": f"no fake for {request.url}"})
+
+    def _geo(self, query: str) -> list:
+        parts = query.split(",")
+        if parts[0].lower().startswith("nowhere"):
+            return []
+        return [{
+            "name": parts[0].strip().title(),
+            "state": parts[1].strip() if len(parts) == 3 else None,
+            "country": parts[-1].strip().upper(),
+            "lat": round(_stable_float(query + "lat", -60, 70), 4),
+            "lon": round(_stable_float(query + "lon", -180, 180), 4),
+        }]
+
+    def _point(self, lat: float, lon: float, dt: int) -> dict:
+        seed = f"{lat:.2f},{lon:.2f},{dt // 3600}"
+        return {
+            "dt": dt,
+            "main": {
+                "temp": round(_stable_float(seed + "t", -10, 35), 2),
+                "feels_like": round(_stable_float(seed + "f", -15, 38), 2),
+                "humidity": int(_stable_float(seed + "h", 10, 100)),
+            },
+            "weather": [{"description": DESCRIPTIONS[int(_stable_float(seed + "d", 0, len(DESCRIPTIONS)))]}],
+            "wind": {"speed": round(_stable_float(seed + "w", 0, 15), 2)},
+        }
+
+    def _coords(self, params: dict) -> tuple[float, float]:
+        if "zip" in params:
+            return _stable_float(params["zip"] + "lat", -60, 70), _stable_float(params["zip"] + "lon", -180, 180)
+        return float(params["lat"]), float(params["lon"])
+
+    def _weather(self, params: dict) -> dict:
+        lat, lon = self._coords(params)
+        # one fake city per 0.01 degree cell
+        city_id = int(_stable_float(f"{lat:.2f},{lon:.2f}", 1, 10**7))
+        self._cities[city_id] = (lat, lon)
+        return {
+            **self._point(lat, lon, int(time.time())),
+            "id": city_id,
+            "name": "Fakeville",
+            "coord": {"lat": lat, "lon": lon},
+            "sys": {"country": "FK"},
+        }
+
+    def _group(self, ids: str) -> dict:
+        items = []
+        for city_id in map(int, ids.split(",")):
+            if city_id in self._cities:
+                lat, lon = self._cities[city_id]
+                items.append(self._weather({"lat": lat, "lon": lon}))
+        return {"cnt": len(items), "list": items}
+
+    def _forecast(self, params: dict) -> dict:
+        lat, lon = self._coords(params)
+        start = int(time.time()) // 10800 * 10800
+        items = []
+        for i in range(40):
+            dt = start + i * 10800
+            point = self._point(lat, lon, dt)
+            point["dt_txt"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(dt))
+            items.append(point)
+        return {"cnt": len(items), "list": items}
+
+    def _groq(self, payload: dict) -> httpx.Response:
+        words = [f"word{i} " for i in range(self.llm_tokens)]
+
+        if payload.get("stream"):
+            chunks = "".join(
+                f"data: {json.dumps({'choices': [{'delta': {'content': w}}]})}\n\n" for w in words
+            ) + "data: [DONE]\n\n"
+            return httpx.Response(200, content=chunks.encode(), headers={"content-type": "text/event-stream"})
+
+        return httpx.Response(200, json={"choices": [{"message": {"content": "".join(words)}}]})
+
+    def _youtube(self, params: dict) -> dict:
+        count = int(params.get("maxResults", 5))
+        return {
+            "items": [
+                {
+                    "id": {"videoId": f"vid{i}"},
+                    "snippet": {"title": f"{params.get('q')} #{i}", "description": "fake video"},
+                }
+                for i in range(count)
+            ]
+        }
+
+
+# ==================== SUPABASE ====================
+COMPARISONS = {"lt": operator.lt, "gt": operator.gt, "gte": operator.ge, "lte": operator.le}
+
+
+def _compare(value, text: str, cmp) -> bool:
+    """Numeric columns compare as numbers (id.gt.99), the rest as text (ISO timestamps)"""
+
+    if value is None:
+        return False
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return cmp(value, float(text))
+        except ValueError:
+            pass
+    return cmp(str(value), text)
+
+
+def _sort_key(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value, "")
+    return (1, 0, str(value))
+
+
+
+class FakePostgrest(httpx.BaseTransport):
+    """Called from the repository thread pool, so it sleeps and locks like a real blocking client"""
+
+    def __init__(self, latency: Latency, max_rows: int = 1000):
+        self.latency = latency
+        self.max_rows = max_rows  # PostgREST db-max-rows: longer selects are cut silently
+        self.calls: Counter = Counter()
+        self.tables: dict[str, list[dict]] = defaultdict(list)
+        self._ids: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self.latency.seconds())
+
+        path = request.url.path.split("/rest/v1/", 1)[-1]
+        params = parse_qsl(request.url.query.decode(), keep_blank_values=True)
+        body = json.loads(request.content) if request.content else None
+
+        with self._lock:
+            if path.startswith("rpc/"):
+                self.calls[f"supabase:{path}"] += 1
+                return self._rpc(path[len("rpc/"):], body)
+
+            self.calls[f"supabase:{request.method} {path}"] += 1
+            table = self.tables[path]
+
+            if request.method == "POST":
+                rows = body if isinstance(body, list) else [body]
+                return httpx.Response(201, json=[self._insert(path, row) for row in rows])
+
+            predicate = self._filter(params)
+            matched = [row for row in table if predicate(row)]
+
+            if request.method == "GET":
+                return httpx.Response(200, json=self._shape(matched, params)[:self.max_rows])
+
+            if request.method == "PATCH":
+                for row in matched:
+                    row.update(body)
+                return httpx.Response(200, json=matched)
+
+            if request.method == "DELETE":
+                self.tables[path] = [row for row in table if not predicate(row)]
+                return httpx.Response(200, json=matched)
+
+        return httpx.Response(405, json={"message": "method not supported by the fake"})
+
+    def _insert(self, table: str, row: dict) -> dict:
+        row = dict(row)
+        if "key" in row:  # cache tables are upserted on their key
+            self.tables[table] = [other for other in self.tables[table] if other.get("key") != row["key"]]
+        elif "id" not in row:
+            self._ids[table] += 1
+            row["id"] = self._ids[table]
+        self.tables[table].append(row)
+        return row
+
+    def _rpc(self, function: str, body: dict) -> httpx.Response:
+        if function == "search_weather_history":
+            return httpx.Response(200, json=self._search(body))
+        if function == "nearby_weather_searches":
+            return httpx.Response(200, json=self._nearby(body))
+        if function != "insert_weather_history":
+            return httpx.Response(404, json={"message": f"no fake rpc {function}"})
+
+        ids = []
+        for record in body["records"]:
+            search = self._insert("weather_searches", record["search"])
+            for result in record["results"]:
+                self._insert("weather_results", {"search_id": search["id"], **result})
+            ids.append(search["id"])
+        return httpx.Response(200, json=ids)
+
+    def _nearby(self, body: dict) -> list[dict]:
+        """nearby_weather_searches as a full scan"""
+
+        lat1, lon1 = math.radians(body["center_lat"]), math.radians(body["center_lon"])
+        radius_km = body.get("radius_km")
+        matches = []
+        for row in self.tables["weather_searches"]:
+            if row.get("lat") is None or row.get("lon") is None:
+                continue
+            lat2, lon2 = math.radians(row["lat"]), math.radians(row["lon"])
+            a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+            distance = 2 * 6371.0088 * math.asin(min(1.0, math.sqrt(a)))
+            if radius_km is None or distance <= radius_km:
+                matches.append({**row, "distance_km": distance})
+        matches.sort(key=lambda row: row["distance_km"])
+        return matches[:body.get("k", 50)]
+
+    def _search(self, body: dict) -> list[dict]:
+        """search_weather_history with substring matching standing in for trigram similarity"""
+
+        def score(value, term) -> float | None:
+            value, term = str(value or "").lower(), term.lower()
+            return len(term) / len(value) if term and term in value else None
+
+        fields = {"city_term": "city", "state_term": "state", "zip_term": "zip_code"}
+        matches = []
+        for row in self.tables["weather_searches"]:
+            text = " ".join(str(row.get(c) or "") for c in ("city", "state", "country", "zip_code"))
+            scores = [score(text, body["q"])] if body.get("q") else []
+            scores += [score(row.get(column), body[term]) for term, column in fields.items() if body.get(term)]
+            if body.get("country_term"):
+                scores.append(1.0 if str(row.get("country") or "").lower() == body["country_term"].lower() else None)
+            if None in scores:
+                continue
+
+            rank = round(sum(scores), 6)
+            if body.get("after_rank") is not None and (rank, row["id"]) >= (body["after_rank"], body["after_id"]):
+                continue
+            matches.append({**row, "rank": rank})
+
+        matches.sort(key=lambda r: (r["rank"], r["id"]), reverse=True)
+        return matches[:body.get("page_size", 50)]
+
+    @staticmethod
+    def _filter(params: list[tuple[str, str]]):
+        """Compile the PostgREST filters of a request into one row predicate"""
+
+        checks = []
+        for column, condition in params:
+            if column in ("or", "and"):
+                # or=(...): drop the outer parentheses only, nested and(...) keep theirs
+                checks.append(FakePostgrest._logic(column, condition[1:-1]))
+                continue
+            if column in ("select", "order", "limit", "offset", "columns", "on_conflict"):
+                continue
+
+            op, _, value = condition.partition(".")
+            if op in ("eq", "neq") or op in COMPARISONS:
+                value = value.strip('"')
+
+            if op == "eq":
+                checks.append(lambda row, c=column, v=value: str(row.get(c)) == v)
+            elif op == "neq":
+                checks.append(lambda row, c=column, v=value: str(row.get(c)) != v)
+            elif op == "in":
+                allowed = set(value.strip("()").split(","))
+                checks.append(lambda row, c=column, a=allowed: str(row.get(c)) in a)
+            elif op == "is":
+                checks.append(lambda row, c=column: row.get(c) is None)
+            elif op == "ilike":
+                needle = value.replace("*", "").replace("%", "").lower()
+                checks.append(lambda row, c=column, n=needle: n in str(row.get(c) or "").lower())
+            elif op in COMPARISONS:
+                checks.append(lambda row, c=column, v=value, cmp=COMPARISONS[op]: _compare(row.get(c), v, cmp))
+
+        return lambda row: all(check(row) for check in checks)
+
+    @staticmethod
+    def _logic(operator: str, body: str):
+        """or=(a.lt.1,and(b.eq.2,c.gt.3)) style filters, as used by keyset cursors"""
+
+        parts, depth, quoted, current = [], 0, False, ""
+        for char in body:
+            if char == '"':
+                quoted = not quoted
+            elif not quoted and char == "(":
+                depth += 1
+            elif not quoted and char == ")":
+                depth -= 1
+            elif not quoted and depth == 0 and char == ",":
+                parts.append(current)
+                current = ""
+                continue
+            current += char
+        parts.append(current)
+
+        predicates = []
+        for part in parts:
+            name, _, rest = part.partition("(")
+            if name in ("or", "and") and rest:
+                predicates.append(FakePostgrest._logic(name, rest[:-1]))
+            else:
+                column, _, condition = part.partition(".")
+                predicates.append(FakePostgrest._filter([(column, condition)]))
+
+        combine = any if operator == "or" else all
+        return lambda row: combine(predicate(row) for predicate in predicates)
+
+    @staticmethod
+    def _shape(rows: list[dict], params: list[tuple[str, str]]) -> list[dict]:
+        options = dict(params)
+
+        for order in reversed(options.get("order", "").split(",")):
+            if order:
+                column, _, direction = order.partition(".")
+                rows = sorted(rows, key=lambda r: _sort_key(r.get(column)), reverse=direction.startswith("desc"))
+
+        if "offset" in options:
+            rows = rows[int(options["offset"]):]
+        if "limit" in options:
+            rows = rows[:int(options["limit"])]
+
+        select = options.get("select", "*")
+        if select != "*":
+            columns = [c.strip() for c in select.split(",")]
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+
+        return rows
+
+
+# ==================== GAZETTEER ====================
+SYLLABLES = ["ba", "lo", "ri", "sa", "ne", "to", "ka", "mi", "por", "vil", "san", "ber", "gor", "lin", "ta", "du"]
+
+
+def write_gazetteer(path: str, cities: list[tuple[str, str]], rows: int, seed: int = 0):
+    """
+    GeoNames cities dump with `cities` (same coordinates as the fake geocoder)
+    plus `rows` made-up places, tab separated with the 19 GeoNames columns.
+    """
+
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        places = [(name, country, 1_000_000) for name, country in cities]
+        places += [
+            (
+                "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title(),
+                rng.choice(cities)[1],
+                int(rng.paretovariate(1.2) * 500),
+            )
+            for _ in range(rows)
+        ]
+
+        for geonameid, (name, country, population) in enumerate(places, 1):
+            query = f"{name},{country}"
+            lat = round(_stable_float(query + "lat", -60, 70), 4)
+            lon = round(_stable_float(query + "lon", -180, 180), 4)
+            fields = [
+                str(geonameid), name, name, "", str(lat), str(lon), "P", "PPL", country, "",
+                "01", "", "", "", str(population), "", "", "UTC", "2026-01-01",
+            ]
+            f.write("\t".join(fields) + "\n")
@@ -0,0 +1,229 @@
+"""
+Offline load test of the API against the fake backends in benchmarks/fakes.py.
+
+Drives app.main:app in-process through httpx.ASGITransport (lifespan included)
+at each concurrency level and reports, per scenario: throughput, p50/p95/p99
+latency, errors and upstream calls per request.
+
+Exemple:
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios by-city,city-range --concurrency 1,16,64 --requests 400 \
+        --upstream-latency-ms 80 --db-latency-ms 15 --distinct 20
+    # providers capped at 600 calls/min, with and without the app rate limiter
+    python -m benchmarks.run --scenarios by-coords --distinct 1000 --upstream-quota 600 --rate-limit 0
+    python -m benchmarks.run --scenarios by-coords --distinct 1000 --upstream-quota 600 --rate-limit 600
+    # OpenWeather starts timing out after 20 calls (short TTLs so the cache has to fall back)
+    CURRENT_WEATHER_TTL=0.1 WEATHER_STALE_TTL=0 python -m benchmarks.run --scenarios by-coords --warm \
+        --outage timeout --outage-after 20 --outage-ms 2000
+    # 5% of upstream calls take 500ms more, with and without hedged requests
+    python -m benchmarks.run --scenarios by-coords --concurrency 1 --requests 1000 --distinct 1000 \
+        --tail-ms 500 --tail-rate 0.05 --hedge
+    # geocoding from an offline gazetteer of 200k places instead of OpenWeather
+    python -m benchmarks.run --scenarios coords-by-city,autocomplete --gazetteer-rows 200000
+    # current weather misses grouped into data/2.5/group calls (city ids are learned
+    # on the first concurrency level, caches are emptied before the next ones)
+    python -m benchmarks.run --scenarios by-coords --concurrency 64,64 --requests 2000 --distinct 2000
+    python -m benchmarks.run --scenarios by-coords --concurrency 64,64 --requests 2000 --distinct 2000 --no-group
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from collections import Counter
+
+# the app reads these at import time, the fakes never look at them
+os.environ.setdefault("SUPABASE_URL", "http://supabase.fake")
+os.environ.setdefault("SUPABASE_KEY", "fake-key")
+os.environ.setdefault("OPENWEATHER_API_KEY", "fake")
+os.environ.setdefault("GROQ_API_KEY", "fake")
+os.environ.setdefault("YOUTUBE_API_KEY", "fake")
+os.environ.setdefault("HISTORY_SPOOL_PATH", os.path.join(tempfile.gettempdir(), "bench_history_spool.jsonl"))
+os.environ.setdefault("HISTORY_DEAD_LETTER_PATH", os.path.join(tempfile.gettempdir(), "bench_history_dead_letter.jsonl"))
+
+import httpx
+from app.main import app
+from app.http_clients import create_client
+from app import config, ratelimit
+from app.supabase import supabase
+from app.cache import TTLCache
+from app.Services import geocodingService, weatherService, llmService, youtubeService
+from benchmarks.fakes import FakeUpstreams, FakePostgrest, Latency, write_gazetteer
+
+
+CITIES = [
+    ("Paris", "FR"), ("London", "GB"), ("Tokyo", "JP"), ("Algiers", "DZ"), ("Lagos", "NG"),
+    ("Lima", "PE"), ("Oslo", "NO"), ("Cairo", "EG"), ("Seoul", "KR"), ("Austin", "US"),
+    ("Perth", "AU"), ("Quito", "EC"), ("Hanoi", "VN"), ("Dakar", "SN"), ("Porto", "PT"),
+    ("Turin", "IT"), ("Delhi", "IN"), ("Sofia", "BG"), ("Minsk", "BY"), ("Accra", "GH"),
+]
+
+
+def _city(rng: random.Random, distinct: int) -> tuple[str, str]:
+    name, country = CITIES[rng.randrange(min(distinct, len(CITIES)))]
+    return name, country
+
+
+# scenario -> (method, path, params factory)
+SCENARIOS = {
+    "by-city": lambda rng, d: ("GET", "/api/weather/search/by-city", dict(zip(("city", "country"), _city(rng, d)))),
+    "by-coords": lambda rng, d: ("GET", "/api/weather/search/by-coords", {"lat": 48.85 + rng.randrange(d) * 0.5, "lon": 2.35}),
+    "by-zip": lambda rng, d: ("GET", "/api/weather/search/by-zip", {"zip_code": str(75000 + rng.randrange(d)), "country": "FR"}),
+    "city-range": lambda rng, d: ("GET", "/api/weather/weather/by-city-range", dict(zip(("city", "country"), _city(rng, d)))),
+    "coords-by-city": lambda rng, d: ("GET", "/api/map/search/coords/by-city", dict(zip(("city", "country"), _city(rng, d)))),
+    "llm-climate": lambda rng, d: ("POST", "/api/llm/desc_climate", dict(zip(("city", "country"), _city(rng, d)))),
+    "youtube": lambda rng, d: ("GET", "/api/youtube/search_locations", {"query": _city(rng, d)[0]}),
+    "autocomplete": lambda rng, d: ("GET", "/api/map/autocomplete", {"q": _city(rng, d)[0][:3], "limit": 10}),
+    "overview": lambda rng, d: ("GET", "/api/overview", dict(zip(("city", "country"), _city(rng, d)))),
+    "history": lambda rng, d: ("GET", "/api/weather/crud/history", {"limit": 50}),
+    "history-search": lambda rng, d: ("GET", "/api/weather/crud/history/search", {"q": _city(rng, d)[0][:4], "limit": 50}),
+}
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def reset_caches():
+    for value in (
+        geocodingService.geocode_cache,
+        weatherService.current_cache,
+        weatherService.forecast_cache,
+        llmService.description_cache,
+        youtubeService.video_cache,
+    ):
+        if isinstance(value, TTLCache):
+            value.clear()
+
+
+def install_fakes(upstreams: FakeUpstreams, postgrest: FakePostgrest):
+    for provider in list(app.state.http_clients):
+        app.state.http_clients[provider] = create_client(provider, transport=upstreams)
+    supabase.postgrest.session = httpx.Client(transport=postgrest)
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, concurrency: int, total: int, distinct: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    requests = [SCENARIOS[name](rng, distinct) for _ in range(total)]
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    queue = iter(requests)
+
+    async def worker():
+        for method, path, params in queue:
+            started = time.perf_counter()
+            response = await client.request(method, path, params=params)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+    }
+
+
+def _print_row(row: dict, upstream: Counter):
+    per_request = ", ".join(
+        f"{name}={count / row['requests']:.2f}" for name, count in sorted(upstream.items())
+    ) or "-"
+    print(
+        f"{row['scenario']:<15} c={row['concurrency']:<4} n={row['requests']:<5} "
+        f"{row['rps']:>9.1f} req/s  p50={row['p50_ms']:>8.1f}ms  p95={row['p95_ms']:>8.1f}ms  "
+        f"p99={row['p99_ms']:>8.1f}ms  err={row['errors']:<4} upstream/req: {per_request}"
+    )
+
+
+async def main(args) -> int:
+    upstreams = FakeUpstreams(
+        Latency(args.upstream_latency_ms, args.jitter_ms, args.seed, args.tail_ms, args.tail_rate),
+        quota_per_minute=args.upstream_quota,
+        outage=args.outage,
+        outage_after=args.outage_after,
+        outage_ms=args.outage_ms,
+    )
+    if args.rate_limit is not None:
+        for provider in ratelimit.limiters:
+            ratelimit.limiters[provider] = ratelimit.RateLimiter(
+                provider, args.rate_limit, config.RATE_LIMITS[provider]["burst"], config.RATE_LIMIT_QUEUE_SIZE
+            )
+    postgrest = FakePostgrest(Latency(args.db_latency_ms, args.jitter_ms / 4, args.seed))
+    config.HEDGE_ENABLED = args.hedge
+    if args.gazetteer_rows is not None:
+        config.GAZETTEER_PATH = os.path.join(tempfile.gettempdir(), "bench_gazetteer.txt")
+        write_gazetteer(config.GAZETTEER_PATH, CITIES, args.gazetteer_rows, args.seed)
+    config.SPECULATIVE_FETCH_ENABLED = not args.no_speculation
+    config.WEATHER_GROUP_ENABLED = not args.no_group
+
+    failures = 0
+
+    async with app.router.lifespan_context(app):
+        install_fakes(upstreams, postgrest)
+
+        # unhandled errors become 500s (counted as errors) instead of aborting the run
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    if not args.warm:
+                        reset_caches()
+                    upstreams.calls.clear()
+                    postgrest.calls.clear()
+
+                    row = await run_scenario(client, name, concurrency, args.requests, args.distinct, args.seed)
+                    _print_row(row, upstreams.calls + postgrest.calls)
+                    failures += row["errors"]
+
+    return 1 if failures and args.fail_on_error else 0
+
+
+def parse_args(argv: list[str]):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), type=lambda v: v.split(","))
+    parser.add_argument("--concurrency", default="1,8,32", type=lambda v: [int(c) for c in v.split(",")])
+    parser.add_argument("--requests", default=200, type=int, help="requests per scenario and concurrency level")
+    parser.add_argument("--distinct", default=10, type=int, help="distinct locations, lower means more cache hits")
+    parser.add_argument("--upstream-latency-ms", default=50.0, type=float)
+    parser.add_argument("--db-latency-ms", default=10.0, type=float)
+    parser.add_argument("--jitter-ms", default=20.0, type=float)
+    parser.add_argument("--tail-ms", default=0.0, type=float, help="extra upstream latency on --tail-rate of the calls")
+    parser.add_argument("--tail-rate", default=0.0, type=float)
+    parser.add_argument("--hedge", action="store_true", help="enable hedged OpenWeather requests")
+    parser.add_argument("--gazetteer-rows", default=None, type=int, help="load an offline gazetteer with the test cities plus this many made-up places")
+    parser.add_argument("--no-speculation", action="store_true", help="disable speculative weather fetches on city lookups")
+    parser.add_argument("--no-group", action="store_true", help="disable OpenWeather group calls for concurrent current weather misses")
+    parser.add_argument("--seed", default=1, type=int)
+    parser.add_argument("--upstream-quota", default=0.0, type=float, help="fake providers answer 429 above this many calls/min per host")
+    parser.add_argument("--outage", choices=("error", "timeout"), help="fake providers fail after --outage-after calls")
+    parser.add_argument("--outage-after", default=0, type=int)
+    parser.add_argument("--outage-ms", default=0.0, type=float, help="time each failing call takes")
+    parser.add_argument("--rate-limit", default=None, type=float, help="app rate limit in calls/min per provider (0 = off)")
+    parser.add_argument("--warm", action="store_true", help="keep caches warm between runs")
+    parser.add_argument("--fail-on-error", action="store_true", help="exit 1 if any request failed")
+
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (known: {', '.join(SCENARIOS)})")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args(sys.argv[1:]))))
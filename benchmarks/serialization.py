@@ -0,0 +1,134 @@
+"""
+Micro-benchmark of response serialization on a large history payload.
+
+Compares, for the same /api/weather/crud/history body:
+- before: FastAPI without response_model (jsonable_encoder + stdlib json)
+- model: HistoryPage response_model (pydantic-core validate + serialize) + TimedJSONResponse (orjson)
+- after: the body dict straight into TimedJSONResponse (orjson), what the history endpoints return
+- dump_json: pydantic-core validate + straight to JSON bytes
+
+Exemple:
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --rows 10000 --results-per-search 8 --repeat 10
+"""
+
+import sys
+import time
+import argparse
+import statistics
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from app.responses import TimedJSONResponse, orjson
+from app.Schemas.HistorySchemas import HistoryPage
+
+
+def history_payload(rows: int, results_per_search: int) -> dict:
+    """Body shaped like _history_page() output with `rows` weather_data rows in total"""
+
+    searches = []
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    for search_id in range(1, rows // results_per_search + 1):
+        created_at = (start + timedelta(minutes=search_id)).isoformat()
+        searches.append({
+            "id": search_id,
+            "city": f"City {search_id % 500}",
+            "state": None,
+            "country": "FR",
+            "coordinates": {"lat": 48.8566 + search_id / 1e4, "lon": 2.3522 - search_id / 1e4},
+            "start_date": created_at[:10],
+            "end_date": created_at[:10],
+            "created_at": created_at,
+            "weather_data": [
+                {
+                    "id": search_id * results_per_search + i,
+                    "search_id": search_id,
+                    "forecast_datetime": (start + timedelta(hours=3 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+                    "temp": 12.5 + i / 10,
+                    "feels_like": 11.25 + i / 10,
+                    "humidity": 60 + i,
+                    "description": "light rain",
+                    "wind_speed": 3.6,
+                    "created_at": created_at,
+                }
+                for i in range(results_per_search)
+            ],
+        })
+
+    return {"total": len(searches), "next_cursor": None, "searches": searches}
+
+
+# ==================== PATHS ====================
+ADAPTER = TypeAdapter(HistoryPage)
+
+
+def before(payload: dict) -> bytes:
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def model(payload: dict) -> bytes:
+    # what FastAPI does with response_model + response_model_exclude_unset
+    value = ADAPTER.validate_python(payload)
+    return TimedJSONResponse(ADAPTER.dump_python(value, mode="json", exclude_unset=True)).body
+
+
+def after(payload: dict) -> bytes:
+    # a Response returned by the handler skips the response_model
+    return TimedJSONResponse(payload).body
+
+
+def dump_json(payload: dict) -> bytes:
+    return ADAPTER.dump_json(ADAPTER.validate_python(payload), exclude_unset=True)
+
+
+PATHS = {"before": before, "model": model, "after": after, "dump_json": dump_json}
+
+
+def measure(fn, payload: dict, repeat: int) -> dict:
+    fn(payload)  # warm up
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn(payload)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"median_ms": statistics.median(timings) * 1000, "peak_mib": peak / 2**20, "bytes": len(body)}
+
+
+def main(args) -> int:
+    payload = history_payload(args.rows, args.results_per_search)
+    print(
+        f"{len(payload['searches'])} searches, {args.rows} weather_data rows, "
+        f"orjson {'on' if orjson is not None else 'not installed'}"
+    )
+
+    results = {name: measure(fn, payload, args.repeat) for name, fn in PATHS.items()}
+    baseline = results["before"]["median_ms"]
+
+    for name, row in results.items():
+        print(
+            f"{name:<10} median={row['median_ms']:>8.1f}ms  x{baseline / row['median_ms']:>5.1f}  "
+            f"peak={row['peak_mib']:>7.1f}MiB  body={row['bytes'] / 2**20:.1f}MiB"
+        )
+    return 0
+
+
+def parse_args(argv: list[str]):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default=10000, type=int, help="weather_data rows in the payload")
+    parser.add_argument("--results-per-search", default=1, type=int)
+    parser.add_argument("--repeat", default=5, type=int)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args(sys.argv[1:])))
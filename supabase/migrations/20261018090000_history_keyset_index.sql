@@ -0,0 +1,7 @@
+-- Keyset pagination of the history endpoints: ORDER BY created_at DESC, id DESC
+create index if not exists weather_searches_created_at_id_idx
+    on public.weather_searches (created_at desc, id desc);
+
+-- Batched weather_results loading: WHERE search_id IN (...)
+create index if not exists weather_results_search_id_idx
+    on public.weather_results (search_id);
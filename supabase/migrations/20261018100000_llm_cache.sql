@@ -0,0 +1,15 @@
+-- Persistent tier of the LLM description cache (app/Services/llmService.py)
+create table if not exists public.llm_cache (
+    key         text primary key,             -- sha256(model, prompt template, location)
+    kind        text not null,                -- "climate" | "locations"
+    city        text not null,                -- normalized (lower-cased, trimmed)
+    state       text not null default '',
+    country     text not null,
+    model       text not null,
+    description text not null,
+    created_at  timestamptz not null default now(),
+    expires_at  timestamptz not null
+);
+
+create index if not exists llm_cache_location_idx
+    on public.llm_cache (city, country, state);
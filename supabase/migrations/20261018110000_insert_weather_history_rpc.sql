@@ -0,0 +1,33 @@
+-- Atomic history insert used by app/Services/historyService.py through supabase.rpc.
+-- records: [{"search": {weather_searches columns}, "results": [{weather_results columns}]}, ...]
+-- Returns the new weather_searches ids in input order. The whole call is one
+-- transaction, so a failure leaves neither searches nor results behind.
+create or replace function public.insert_weather_history(records jsonb)
+returns bigint[]
+language plpgsql
+as $$
+declare
+    rec    jsonb;
+    new_id bigint;
+    ids    bigint[] := '{}';
+begin
+    for rec in select value from jsonb_array_elements(records)
+    loop
+        insert into public.weather_searches
+            (city, state, country, zip_code, lat, lon, start_date, end_date, created_at)
+        select s.city, s.state, s.country, s.zip_code, s.lat, s.lon, s.start_date, s.end_date,
+               coalesce(s.created_at, now())
+        from jsonb_populate_record(null::public.weather_searches, rec->'search') as s
+        returning id into new_id;
+
+        insert into public.weather_results
+            (search_id, forecast_datetime, temp, feels_like, humidity, description, wind_speed)
+        select new_id, r.forecast_datetime, r.temp, r.feels_like, r.humidity, r.description, r.wind_speed
+        from jsonb_populate_recordset(null::public.weather_results, coalesce(rec->'results', '[]'::jsonb)) as r;
+
+        ids := ids || new_id;
+    end loop;
+
+    return ids;
+end;
+$$;
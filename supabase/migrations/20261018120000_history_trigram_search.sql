@@ -0,0 +1,75 @@
+-- Fuzzy location search over the history (GET /api/weather/crud/history/search).
+-- Trigram GIN indexes serve both similarity operators and ILIKE '%term%', so
+-- the older /history/search/<field> endpoints stop scanning the table as well
+-- (for terms of 3 characters or more).
+create extension if not exists pg_trgm;
+
+-- Everything a free text query is matched against, lower-cased
+create or replace function public.weather_search_text(city text, state text, country text, zip_code text)
+returns text
+language sql
+immutable
+parallel safe
+as $$
+    select lower(coalesce(city, '') || ' ' || coalesce(state, '') || ' ' || coalesce(country, '') || ' ' || coalesce(zip_code, ''))
+$$;
+
+create index if not exists weather_searches_search_text_trgm_idx
+    on public.weather_searches using gin (public.weather_search_text(city, state, country, zip_code) gin_trgm_ops);
+
+create index if not exists weather_searches_city_trgm_idx
+    on public.weather_searches using gin (city gin_trgm_ops);
+
+create index if not exists weather_searches_state_trgm_idx
+    on public.weather_searches using gin (state gin_trgm_ops);
+
+create index if not exists weather_searches_zip_code_trgm_idx
+    on public.weather_searches using gin (zip_code gin_trgm_ops);
+
+-- Country codes are 2 letters, too short for trigrams: exact match instead
+create index if not exists weather_searches_country_lower_idx
+    on public.weather_searches (lower(country));
+
+
+-- Ranked search. Every non null term must match (substring or trigram
+-- similarity); rank is the summed similarity of the matched terms.
+-- Pagination is keyset on (rank desc, id desc): pass the rank and id of the
+-- last row of the previous page as after_rank / after_id.
+-- Rows are returned as jsonb (weather_searches columns + rank).
+create or replace function public.search_weather_history(
+    q            text   default null,
+    city_term    text   default null,
+    state_term   text   default null,
+    country_term text   default null,
+    zip_term     text   default null,
+    page_size    int    default 50,
+    after_rank   real   default null,
+    after_id     bigint default null
+)
+returns setof jsonb
+language sql
+stable
+as $$
+    with matches as (
+        select s.*,
+               (  coalesce(word_similarity(lower(q), public.weather_search_text(s.city, s.state, s.country, s.zip_code)), 0)
+                + coalesce(similarity(s.city, city_term), 0)
+                + coalesce(similarity(s.state, state_term), 0)
+                + case when lower(s.country) = lower(country_term) then 1 else 0 end
+                + coalesce(similarity(s.zip_code, zip_term), 0)
+               )::real as rank
+        from public.weather_searches s
+        where (q is null
+               or lower(q) <% public.weather_search_text(s.city, s.state, s.country, s.zip_code)
+               or public.weather_search_text(s.city, s.state, s.country, s.zip_code) like '%' || lower(q) || '%')
+          and (city_term is null or s.city ilike '%' || city_term || '%' or s.city % city_term)
+          and (state_term is null or s.state ilike '%' || state_term || '%' or s.state % state_term)
+          and (country_term is null or lower(s.country) = lower(country_term))
+          and (zip_term is null or s.zip_code ilike '%' || zip_term || '%' or s.zip_code % zip_term)
+    )
+    select to_jsonb(m)
+    from matches m
+    where after_rank is null or (m.rank, m.id) < (after_rank, after_id)
+    order by m.rank desc, m.id desc
+    limit page_size
+$$;
@@ -0,0 +1,45 @@
+-- Daily aggregated forecasts (weather/by-city-range?store_daily=true): one
+-- weather_results row per day, temp/feels_like/humidity/wind_speed hold the
+-- daily means and the new columns the extremes. Raw 3-hourly rows leave them null.
+alter table public.weather_results
+    add column if not exists temp_min     double precision,
+    add column if not exists temp_max     double precision,
+    add column if not exists humidity_min integer,
+    add column if not exists humidity_max integer;
+
+-- '3h' for raw forecast items, 'daily' for aggregated rows
+alter table public.weather_searches
+    add column if not exists granularity text not null default '3h';
+
+-- Same as 20261018110000_insert_weather_history_rpc.sql, with the new columns
+create or replace function public.insert_weather_history(records jsonb)
+returns bigint[]
+language plpgsql
+as $$
+declare
+    rec    jsonb;
+    new_id bigint;
+    ids    bigint[] := '{}';
+begin
+    for rec in select value from jsonb_array_elements(records)
+    loop
+        insert into public.weather_searches
+            (city, state, country, zip_code, lat, lon, start_date, end_date, created_at, granularity)
+        select s.city, s.state, s.country, s.zip_code, s.lat, s.lon, s.start_date, s.end_date,
+               coalesce(s.created_at, now()), coalesce(s.granularity, '3h')
+        from jsonb_populate_record(null::public.weather_searches, rec->'search') as s
+        returning id into new_id;
+
+        insert into public.weather_results
+            (search_id, forecast_datetime, temp, feels_like, humidity, description, wind_speed,
+             temp_min, temp_max, humidity_min, humidity_max)
+        select new_id, r.forecast_datetime, r.temp, r.feels_like, r.humidity, r.description, r.wind_speed,
+               r.temp_min, r.temp_max, r.humidity_min, r.humidity_max
+        from jsonb_populate_recordset(null::public.weather_results, coalesce(rec->'results', '[]'::jsonb)) as r;
+
+        ids := ids || new_id;
+    end loop;
+
+    return ids;
+end;
+$$;
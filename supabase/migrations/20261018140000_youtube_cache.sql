@@ -0,0 +1,13 @@
+-- Persistent tier of the YouTube search cache (app/Services/youtubeService.py)
+create table if not exists public.youtube_cache (
+    key         text primary key,             -- "<topic>:<normalized query>"
+    topic       text not null,                -- "locations" | "weather"
+    query       text not null,                -- normalized (lower-cased, single spaces)
+    videos      jsonb not null,               -- [{"title", "description", "url"}, ...]
+    fetched     integer not null,             -- maxResults asked, more videos than returned means none left
+    created_at  timestamptz not null default now(),
+    expires_at  timestamptz not null
+);
+
+create index if not exists youtube_cache_expires_idx
+    on public.youtube_cache (expires_at);
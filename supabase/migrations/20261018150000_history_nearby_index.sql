@@ -0,0 +1,35 @@
+-- Nearby searches (GET /api/weather/crud/history/nearby): GiST index on the
+-- earth position of every located search, for radius (earth_box) and
+-- k-nearest (<-> ordering) queries without scanning the table.
+create extension if not exists cube;
+create extension if not exists earthdistance;
+
+create index if not exists weather_searches_earth_idx
+    on public.weather_searches using gist (ll_to_earth(lat, lon))
+    where lat is not null and lon is not null;
+
+
+-- Up to k searches closest to the point, within radius_km when given,
+-- closest first. Rows are returned as jsonb (weather_searches columns + distance_km).
+create or replace function public.nearby_weather_searches(
+    center_lat double precision,
+    center_lon double precision,
+    radius_km  double precision default null,
+    k          int              default 50
+)
+returns setof jsonb
+language sql
+stable
+set search_path = public, extensions
+as $$
+    select to_jsonb(s) || jsonb_build_object(
+               'distance_km', earth_distance(ll_to_earth(center_lat, center_lon), ll_to_earth(s.lat, s.lon)) / 1000
+           )
+    from public.weather_searches s
+    where s.lat is not null and s.lon is not null
+      and (radius_km is null
+           or (earth_box(ll_to_earth(center_lat, center_lon), radius_km * 1000) @> ll_to_earth(s.lat, s.lon)
+               and earth_distance(ll_to_earth(center_lat, center_lon), ll_to_earth(s.lat, s.lon)) <= radius_km * 1000))
+    order by ll_to_earth(s.lat, s.lon) <-> ll_to_earth(center_lat, center_lon)
+    limit k
+$$;
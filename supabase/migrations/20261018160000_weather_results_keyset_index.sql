@@ -0,0 +1,7 @@
+-- Batched weather_results loading reads keyset pages:
+-- WHERE search_id IN (...) AND (search_id, id) > (X, Y) ORDER BY search_id, id
+create index if not exists weather_results_search_id_id_idx
+    on public.weather_results (search_id, id);
+
+-- covered by the index above
+drop index if exists public.weather_results_search_id_idx;
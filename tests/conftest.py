@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# the app reads these at import time, tests never reach the real services
+os.environ.setdefault("SUPABASE_URL", "http://supabase.fake")
+os.environ.setdefault("SUPABASE_KEY", "fake-key")
+os.environ.setdefault("OPENWEATHER_API_KEY", "fake")
+os.environ.setdefault("GROQ_API_KEY", "fake")
+os.environ.setdefault("YOUTUBE_API_KEY", "fake")
+os.environ.setdefault("HISTORY_SPOOL_PATH", os.path.join(tempfile.gettempdir(), "test_history_spool.jsonl"))
+os.environ.setdefault("HISTORY_DEAD_LETTER_PATH", os.path.join(tempfile.gettempdir(), "test_history_dead_letter.jsonl"))
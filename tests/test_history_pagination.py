@@ -0,0 +1,49 @@
+from urllib.parse import parse_qsl
+from app.Routers.weatherCrudRouter import _searches_query
+
+
+def _params(query) -> dict:
+    return dict(parse_qsl(str(query.request.params)))
+
+
+def test_first_page_has_no_keyset_filter():
+    params = _params(_searches_query({"columns": ["id", "created_at"], "cursor": None, "limit": 50}))
+
+    assert "created_at" not in params
+    assert "or" not in params
+    assert params["order"] == "created_at.desc,id.desc"
+    assert params["limit"] == "51"
+
+
+def test_next_page_carries_an_index_bound():
+    cursor = ("2026-01-01T00:00:00+00:00", 42)
+    params = _params(_searches_query({"columns": ["id", "created_at"], "cursor": cursor, "limit": 50}))
+
+    # a plain column bound Postgres can seek the (created_at desc, id desc) index on
+    assert params["created_at"] == "lte.2026-01-01T00:00:00+00:00"
+    # the OR only breaks ties on created_at
+    assert params["or"] == (
+        '(created_at.lt."2026-01-01T00:00:00+00:00",'
+        'and(created_at.eq."2026-01-01T00:00:00+00:00",id.lt.42))'
+    )
+
+
+def test_results_are_read_in_keyset_pages(monkeypatch):
+    import asyncio
+    import httpx
+    from app.supabase import supabase
+    from app.Routers import weatherCrudRouter
+    from benchmarks.fakes import FakePostgrest, Latency
+
+    postgrest = FakePostgrest(Latency(), max_rows=7)
+    for search_id in (1, 2, 3):
+        for _ in range(5):
+            postgrest._insert("weather_results", {"search_id": search_id, "temp": 1.0})
+    monkeypatch.setattr(supabase.postgrest, "session", httpx.Client(transport=postgrest))
+    monkeypatch.setattr(weatherCrudRouter, "RESULTS_PAGE_SIZE", 7)
+
+    grouped = asyncio.run(weatherCrudRouter._load_results([1, 2, 3]))
+
+    assert {search_id: len(rows) for search_id, rows in grouped.items()} == {1: 5, 2: 5, 3: 5}
+    # 15 rows in pages of 7: the third page is short, no extra empty round trip
+    assert postgrest.calls["supabase:GET weather_results"] == 3
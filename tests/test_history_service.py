@@ -0,0 +1,69 @@
+import asyncio
+from urllib.parse import parse_qsl
+
+from app import config
+from app.Services import historyService
+
+
+class _Response:
+    data = [{"lat": 48.85, "lon": 2.35}]
+
+
+def _capture(monkeypatch):
+    queries = []
+
+    async def execute(query):
+        queries.append(dict(parse_qsl(str(query.request.params))))
+        await asyncio.sleep(0.01)
+        return _Response()
+
+    monkeypatch.setattr(historyService, "execute", execute)
+    return queries
+
+
+def test_last_location_escapes_ilike_wildcards(monkeypatch):
+    queries = _capture(monkeypatch)
+
+    asyncio.run(historyService.last_location(" 100%_\\x ", "FR"))
+
+    assert queries[0]["city"] == "ilike.100\\%\\_\\\\x"
+    assert queries[0]["country"] == "ilike.FR"
+
+
+def test_last_location_is_single_flighted(monkeypatch):
+    queries = _capture(monkeypatch)
+
+    async def run():
+        return await asyncio.gather(*(historyService.last_location("Paris", "FR") for _ in range(5)))
+
+    locations = asyncio.run(run())
+
+    assert len(queries) == 1
+    assert locations == [{"lat": 48.85, "lon": 2.35}] * 5
+
+
+def test_stop_during_a_slow_insert_spools_the_batch(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "HISTORY_FLUSH_INTERVAL", 0.01)
+    monkeypatch.setattr(config, "HISTORY_SHUTDOWN_TIMEOUT", 0.1)
+    inserting = []
+
+    async def save_many_now(records):
+        inserting.append(len(records))
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(historyService, "save_many_now", save_many_now)
+    writer = historyService.HistoryWriter(str(tmp_path / "spool.jsonl"), str(tmp_path / "dead.jsonl"))
+
+    async def run():
+        await writer.start()
+        for i in range(3):
+            await writer.enqueue({"city": f"c{i}"}, [])
+        while not inserting:
+            await asyncio.sleep(0.01)
+        await writer.stop()
+
+    asyncio.run(run())
+
+    assert inserting == [3]
+    spooled = historyService._take_records(writer.spool_path)
+    assert [record["search"]["city"] for record in spooled] == ["c0", "c1", "c2"]
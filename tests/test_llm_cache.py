@@ -0,0 +1,35 @@
+import asyncio
+
+from app import config
+from app.Services import llmService
+
+
+def test_invalidating_a_kind_keeps_the_other_kinds(monkeypatch):
+    monkeypatch.setattr(config, "LLM_CACHE_PERSIST", False)
+    llmService.description_cache.clear()
+
+    async def run():
+        await llmService.store("climate", "Paris", "FR", None, "mild")
+        await llmService.store("locations", "Paris", "FR", None, "Louvre")
+        await llmService.store("climate", "Oslo", "NO", None, "cold")
+        await llmService.invalidate(kind="climate")
+        return (
+            await llmService.get_cached("climate", "Paris", "FR"),
+            await llmService.get_cached("climate", "Oslo", "NO"),
+            await llmService.get_cached("locations", "Paris", "FR"),
+        )
+
+    assert asyncio.run(run()) == (None, None, "Louvre")
+
+
+def test_invalidating_everything_clears_the_memory_tier(monkeypatch):
+    monkeypatch.setattr(config, "LLM_CACHE_PERSIST", False)
+    llmService.description_cache.clear()
+
+    async def run():
+        await llmService.store("locations", "Paris", "FR", None, "Louvre")
+        await llmService.invalidate()
+
+    asyncio.run(run())
+
+    assert len(llmService.description_cache) == 0
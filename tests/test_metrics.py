@@ -0,0 +1,43 @@
+import asyncio
+
+import httpx
+
+from app import metrics
+from app.http_clients import TimedTransport
+
+
+def _count(stage: str, outcome: str) -> int:
+    state = metrics.STAGE_DURATION._values.get((stage, outcome))
+    return state[-1] if state else 0
+
+
+class _SlowTransport(httpx.AsyncBaseTransport):
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(10)
+        return httpx.Response(200)
+
+
+def test_span_records_errors():
+    try:
+        with metrics.span("test:error"):
+            raise ValueError()
+    except ValueError:
+        pass
+
+    assert _count("test:error", "error") == 1
+
+
+def test_cancelled_upstream_call_is_recorded():
+    before = _count("test:slow", "cancelled")
+
+    async def run():
+        async with httpx.AsyncClient(transport=TimedTransport(_SlowTransport(), "test")) as client:
+            try:
+                await asyncio.wait_for(client.get("http://upstream.fake/data/slow"), 0.05)
+            except asyncio.TimeoutError:
+                pass
+
+    asyncio.run(run())
+
+    assert _count("test:slow", "cancelled") == before + 1
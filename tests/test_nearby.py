@@ -0,0 +1,42 @@
+import asyncio
+
+import httpx
+
+from app.supabase import supabase
+from app.Services import nearbyService
+from benchmarks.fakes import FakePostgrest, Latency
+
+
+def _index(monkeypatch, points):
+    postgrest = FakePostgrest(Latency())
+    for lat, lon in points:
+        postgrest._insert("weather_searches", {"city": "x", "lat": lat, "lon": lon})
+    monkeypatch.setattr(supabase.postgrest, "session", httpx.Client(transport=postgrest))
+
+    index = nearbyService.LocationIndex()
+    monkeypatch.setattr(nearbyService, "location_index", index)
+    asyncio.run(index.refresh())
+    return postgrest
+
+
+def test_stale_rows_are_replaced_from_the_overfetch(monkeypatch):
+    postgrest = _index(monkeypatch, [(48.0 + i / 100, 2.0) for i in range(10)])
+    # the closest search is deleted after the tree was built
+    postgrest.tables["weather_searches"] = postgrest.tables["weather_searches"][1:]
+
+    rows, source = asyncio.run(nearbyService.nearby(48.0, 2.0, None, 3, ["id"]))
+
+    assert source == "memory"
+    assert [row["id"] for row in rows] == [2, 3, 4]
+
+
+def test_falls_back_to_the_database_when_the_recheck_runs_short(monkeypatch):
+    postgrest = _index(monkeypatch, [(48.0 + i / 100, 2.0) for i in range(10)])
+    # the four closest searches moved away
+    for row in postgrest.tables["weather_searches"][:4]:
+        row["lat"] = -10.0
+
+    rows, source = asyncio.run(nearbyService.nearby(48.0, 2.0, 50, 2, ["id"]))
+
+    assert source == "database"
+    assert [row["id"] for row in rows] == [5, 6]